@@ -24,6 +24,24 @@ Attributes:
     DanaRetriever (class): A class for querying dana-8 group and subgroup data.
     StrunzRetriever (class): A class for querying different types of nickel-strunz-10 data.
     PhotoCountRetriever(class): A class to facilitate the retrieval of photo count data from the Mindat API.
+    MindatSession (class): A pooled, keep-alive HTTP client shared by all retrievers.
+    AsyncMindatApi (class): The asyncio counterpart of MindatApi, used by the retrievers' aget_dict() and asaveto().
+    AsyncMindatSession (class): A pooled asyncio HTTP client used by AsyncMindatApi.
+    load_mindat_json (function): Loads a saved json or ndjson file, gzip- or zstd-compressed or not.
+    iter_saved_records (function): Streams the records of a saved file.
+    ResponseCache (class): An opt-in, persistent SQLite cache of API responses with TTL and LRU eviction.
+    set_default_cache (function): Enables a response cache for every retriever.
+    RetryPolicy (class): Configures retries, backoff and timeouts of the requests to the Mindat API.
+    RateLimiter (class): A token-bucket rate limiter shared across threads, and optionally processes.
+    PageSizeController (class): Tunes and remembers the page size per endpoint from latency, payload size and errors.
+    SingleFlight (class): Coalesces identical API requests that are in flight at the same time.
+    LocalStore (class): A local SQLite mirror of Mindat tables, kept up to date by the retrievers' incremental sync().
+    GeomaterialQueryEngine (class): Evaluates GeomaterialRetriever queries against the local geomaterials mirror.
+    LocalitiesQueryEngine (class): Evaluates LocalitiesRetriever queries, and spatial queries, against the local localities mirror.
+    DanaTree (class): The cached Dana-8 classification tree returned by DanaRetriever.get_tree().
+    StrunzTree (class): The cached Nickel-Strunz-10 classification tree returned by StrunzRetriever.get_tree().
+    GeomaterialSearchEngine (class): A full-text index of the local geomaterials mirror answering GeomaterialSearchRetriever searches.
+    GeoRegionIndex (class): Assigns batches of coordinates to the georegion polygons of GeoRegionRetriever.
 
 
 Todo:
@@ -57,6 +75,20 @@ Press q to quit.
 """
 
 from .mindat_api import MindatApi, MindatApiKeyManager
+from .session import MindatSession, get_default_session, set_default_session
+from .session import AsyncMindatSession, get_default_async_session
+from .async_api import AsyncMindatApi
+from .writers import load_mindat_json, iter_saved_records
+from .cache import ResponseCache, get_default_cache, set_default_cache
+from .retry import RetryPolicy
+from .rate_limit import RateLimiter, get_default_rate_limiter, set_default_rate_limiter
+from .page_size import PageSizeController, get_default_page_size_controller, set_default_page_size_controller
+from .single_flight import SingleFlight, get_default_single_flight
+from .sync import LocalStore
+from .local_query import GeomaterialQueryEngine, LocalitiesQueryEngine
+from .local_search import GeomaterialSearchEngine
+from .classification import DanaTree, StrunzTree
+from .georegions import GeoRegionIndex
 from .minerals_ima import MineralsIMARetriever
 from .minerals_ima import MineralsIdRetriever
 from .geomaterials_search import GeomaterialSearchRetriever
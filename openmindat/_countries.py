@@ -1,7 +1,8 @@
 from . import mindat_api
+from .retriever_mixin import RetrieverMixin
 
 
-class CountriesListRetriever:
+class CountriesListRetriever(RetrieverMixin):
     """
     A class to facilitate the retrieval of country data from the Mindat API using by page.
     For more information visit: https://api.mindat.org/schema/redoc/#tag/countries/operation/countries_list
@@ -20,7 +21,8 @@ class CountriesListRetriever:
 
     BASE_ENDPOINT = 'countries'
     
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = self.BASE_ENDPOINT
         self.verbose_flag = 2
         
@@ -104,34 +106,6 @@ class CountriesListRetriever:
         
         return self
     
-    def saveto(self, OUTDIR = '', FILE_NAME = ''):
-        '''
-            Executes the query to retrieve the countries with keywords and saves the results to a specified directory.
-
-            Args:
-                OUTDIR (str): The directory path where the retrieved countries will be saved. If not provided, the current directory will be used.
-                FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-            Returns:
-                None
-
-            Example:
-                >>> cr = CountriesListRetriever()
-                >>> cr.page(2).saveto("/path/to/directory")
-        '''
-
-        params = self._params
-        outdir = OUTDIR
-        end_point = self.end_point
-        file_name = FILE_NAME
-        verbose = self.verbose_flag
-        
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # Reset the query parameters in case the user wants to make another query.
-        self._init_params()
-    
     def save(self, FILE_NAME = ''):
         '''
             Executes the query to retrieve the country data and saves the results to the current directory.
@@ -164,10 +138,10 @@ class CountriesListRetriever:
         '''
        
         params = self._params
-        end_point = self.end_point
+        end_point = self._get_end_point()
         verbose = self.verbose_flag
         
-        ma = mindat_api.MindatApi()        
+        ma = self._mindat_api()        
         #clears params for next get statement     
 
         results = ma.get_mindat_json(params, end_point, verbose)
@@ -178,7 +152,7 @@ class CountriesListRetriever:
             
         
 
-class CountriesIdRetriever:
+class CountriesIdRetriever(RetrieverMixin):
     """
     A class to facilitate the retrieval of country data from the Mindat API using an id.
     For more information visit: https://api.mindat.org/schema/redoc/#tag/countries/operation/countries_retrieve
@@ -195,7 +169,8 @@ class CountriesIdRetriever:
     Press q to quit.
     """
     BASE_ENDPOINT = 'countries' 
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = self.BASE_ENDPOINT
         self.verbose_flag = 2
         
@@ -282,34 +257,6 @@ class CountriesIdRetriever:
         
         return self
     
-    def saveto(self, OUTDIR = '', FILE_NAME = ''):
-        '''
-            Executes the query to retrieve the countries with keywords and saves the results to a specified directory.
-
-            Args:
-                OUTDIR (str): The directory path where the retrieved countries will be saved. If not provided, the current directory will be used.
-                FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-            Returns:
-                None
-
-            Example:
-                >>> cidr = CountriesIdRetriever()
-                >>> cidr.id(2).saveto("/path/to/directory")
-        '''
-
-        params = self._params
-        outdir = OUTDIR
-        end_point = self.end_point
-        file_name = FILE_NAME
-        verbose = self.verbose_flag
-        
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # Reset the query parameters in case the user wants to make another query.
-        self._init_params()
-    
     def save(self, FILE_NAME = ''):
         '''
             Executes the query to retrieve the list of country data and saves the results to the current directory.
@@ -342,10 +289,10 @@ class CountriesIdRetriever:
         '''
        
         params = self._params
-        end_point = self.end_point   
+        end_point = self._get_end_point()
         verbose = self.verbose_flag 
         
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
         
         self._init_params()
@@ -1,13 +1,18 @@
+from pathlib import Path
+
 from . import mindat_api
+from .retriever_mixin import RetrieverMixin
+from .georegions import GeoRegionIndex
 
 
-class GeoRegionRetriever:
+class GeoRegionRetriever(RetrieverMixin):
     """
     A class to facilitate the retrieval of locality geoRegion data from the Mindat API filtered by page.
     for more information visit: https://api.mindat.org/schema/redoc/#tag/locgeoregion2
 
     Methods:
         page(INT): returns a page of localities.
+        get_index(CACHE_PATH, REFRESH): Returns a GeoRegionIndex of the georegion polygons for point-in-polygon lookups.
         saveto(OUTDIR, FILENAME): Executes the search query and saves the data to a specified directory.
         save(FILENAME): Executes the search query and saves the data to the current directory.
 
@@ -20,7 +25,8 @@ class GeoRegionRetriever:
 
     BASE_ENDPOINT = 'locgeoregion2'
 
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = self.BASE_ENDPOINT
         self.verbose_flag = 2
         
@@ -103,39 +109,6 @@ class GeoRegionRetriever:
         
         return self
     
-    def saveto(self, OUTDIR = '', FILE_NAME = ''):
-        '''
-            Executes the query to retrieve the localities with keywords and saves the results to a specified directory.
-
-            Args:
-                OUTDIR (str): The directory path where the retrieved localities will be saved. If not provided, the current directory will be used.
-                FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-            Returns:
-                None
-
-            Example:
-                >>> grr = GeoRegionRetriever()
-                >>> grr.saveto("/path/to/directory")
-        '''
-
-        params = self._params
-        outdir = OUTDIR
-        end_point = self.end_point
-        file_name = FILE_NAME
-        verbose = self.verbose_flag
-        
-        ma = mindat_api.MindatApi()
-        
-        if "page" in params:
-            ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-        else:
-            ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-            
-
-        # Reset the query parameters in case the user wants to make another query.
-        self._init_params()
-    
     def save(self, FILE_NAME = ''):
         '''
             Executes the query to retrieve the list of locality data and saves the results to the current directory.
@@ -168,14 +141,43 @@ class GeoRegionRetriever:
        
         params = self._params
         verbose = self.verbose_flag
-        end_point = self.end_point
+        end_point = self._get_end_point()
         
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
             
         self._init_params()
         return results
     
+    def get_index(self, CACHE_PATH = GeoRegionIndex.DEFAULT_PATH, REFRESH = False):
+        '''
+        Returns a GeoRegionIndex of the georegion polygons, to assign batches of coordinates to georegions.
+        The index is loaded from CACHE_PATH when it was saved there before; otherwise the georegions are
+        downloaded, compiled and saved to CACHE_PATH. Requires numpy (pip install openmindat[geo]).
+
+        Args:
+            CACHE_PATH (str): The .npz file caching the compiled polygons.
+            REFRESH (bool): If True, the georegions are downloaded and compiled again.
+
+        Returns:
+            GeoRegionIndex
+
+        Example:
+            >>> grr = GeoRegionRetriever()
+            >>> index = grr.get_index()
+            >>> index.assign([45.5, 48.85], [-73.6, 2.35])
+        '''
+        if not REFRESH and Path(CACHE_PATH).exists():
+            self._init_params()
+            return GeoRegionIndex.load(CACHE_PATH)
+
+        params, end_point, verbose = self._take_query()
+
+        ma = self._mindat_api()
+        index = GeoRegionIndex.from_features(ma.iter_records(params, end_point, verbose))
+        index.save(CACHE_PATH)
+        return index
+
     def available_methods(self):
         '''
         Prints the available methods of the class.
@@ -1,7 +1,8 @@
 from . import mindat_api
+from .retriever_mixin import RetrieverMixin
 
 
-class LocobjectRetriever:
+class LocobjectRetriever(RetrieverMixin):
     """
     A class to facilitate the retrieval of loc object data from the Mindat API using an id
     For more information visit: https://api.mindat.org/schema/redoc/#tag/locobject
@@ -20,7 +21,8 @@ class LocobjectRetriever:
 
     BASE_ENDPOINT = 'locobject'
     
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = self.BASE_ENDPOINT 
         self.verbose_flag = 2
         self.sub_endpoint = ''
@@ -86,33 +88,8 @@ class LocobjectRetriever:
         
         return self
     
-    def saveto(self, OUTDIR = '', FILE_NAME = ''):
-        '''
-            Executes the query to retrieve the loc object with keywords and saves the results to a specified directory.
-
-            Args:
-                OUTDIR (str): The directory path where the retrieved loc object will be saved. If not provided, the current directory will be used.
-                FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-            Returns:
-                None
-
-            Example:
-                >>> lor = LocobjectRetriever()
-                >>> lor.saveto("/path/to/directory")
-        '''
-
-        params = self._params
-        outdir = OUTDIR
-        end_point =  '/'.join([self.end_point, self.sub_endpoint])
-        file_name = FILE_NAME
-        verbose = self.verbose_flag
-        
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # Reset the query parameters in case the user wants to make another query.
-        self._init_params()
+    def _get_end_point(self):
+        return '/'.join([self.end_point, self.sub_endpoint])
     
     def save(self, FILE_NAME = ''):
         '''
@@ -148,9 +125,9 @@ class LocobjectRetriever:
        
         params = self._params
         verbose = self.verbose_flag
-        end_point = '/'.join([self.end_point, self.sub_endpoint])
+        end_point = self._get_end_point()
         
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
         
         self._init_params()
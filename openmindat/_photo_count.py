@@ -1,6 +1,7 @@
 from . import mindat_api
+from .retriever_mixin import RetrieverMixin
 
-class PhotoCountRetriever:
+class PhotoCountRetriever(RetrieverMixin):
     """
     A class to facilitate the retrieval of photo count data from the Mindat API.
     For more information visit: https://api.mindat.org/schema/redoc/#tag/photocount
@@ -16,7 +17,8 @@ class PhotoCountRetriever:
     Press q to quit.
     """
     
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = 'photocount'
         self.verbose_flag = 2 
         
@@ -77,34 +79,6 @@ class PhotoCountRetriever:
         return self
     
     #when fixed check if this needs get item or get list
-    def saveto(self, OUTDIR = '', FILE_NAME = ''):
-        '''
-            Executes the query to retrieve the photo count with keywords and saves the results to a specified directory.
-
-            Args:
-                OUTDIR (str): The directory path where the retrieved localities will be saved. If not provided, the current directory will be used.
-                FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-            Returns:
-                None
-
-            Example:
-                >>> pcr = PhotoCountRetriever()
-                >>> pcr.saveto("/path/to/directory")
-        '''
-
-        params = self._params
-        outdir = OUTDIR
-        end_point = self.end_point
-        verbose = self.verbose_flag
-        file_name = FILE_NAME
-        
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # Reset the query parameters in case the user wants to make another query.
-        self._init_params()
-    
     def save(self, FILE_NAME = ''):
         '''
             Executes the query to retrieve the list of photo count data and saves the results to the current directory.
@@ -138,9 +112,9 @@ class PhotoCountRetriever:
        
         params = self._params
         verbose = self.verbose_flag
-        end_point = self.end_point
+        end_point = self._get_end_point()
         
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
         
         self._init_params()
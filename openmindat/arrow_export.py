@@ -0,0 +1,256 @@
+import json
+from pathlib import Path
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise ImportError("Arrow and Parquet export require pyarrow. Install it with: pip install openmindat[parquet]")
+
+
+def page_records(PAGE):
+    '''
+        Returns the records of a page; the GeoJSON results of locgeoregion2 are a dict of features.
+    '''
+    if isinstance(PAGE, dict):
+        return PAGE.get("features", [])
+    return PAGE
+
+
+class ArrowBatchBuilder:
+    '''
+    Converts pages of records into Arrow record batches, widening one schema as the pages arrive.
+
+    The types of each page are inferred column by column and merged into the schema of the earlier pages:
+    a key first seen on a later page adds a column, integers and floats merge into floats, nested objects
+    become struct columns whose fields are merged the same way, and arrays such as `elements` become list
+    columns. Values whose types cannot be merged, e.g. a number on one page and text on another, turn the
+    column into a string column holding their json text, so no value is lost. Batches built before the
+    schema was widened are converted to it with conform(); to_table() does so for all of them.
+
+    Once freeze() is called, the schema stops widening and later pages are cast to it instead.
+    '''
+
+    def __init__(self):
+        self.pa = _import_pyarrow()
+        self.schema = None
+        self.frozen = False
+        self._warned_columns = set()
+
+    def _infer_type(self, VALUES):
+        pa = self.pa
+        try:
+            return pa.array(VALUES).type
+        except (pa.ArrowException, TypeError, ValueError, OverflowError):
+            return pa.string()
+
+    def _merge_type(self, OLD, NEW):
+        pa = self.pa
+        if OLD.equals(NEW) or pa.types.is_null(NEW):
+            return OLD
+        if pa.types.is_null(OLD):
+            return NEW
+        if pa.types.is_integer(OLD) and pa.types.is_integer(NEW):
+            return pa.int64()
+        if (pa.types.is_integer(OLD) or pa.types.is_floating(OLD)) and (pa.types.is_integer(NEW) or pa.types.is_floating(NEW)):
+            return pa.float64()
+        if pa.types.is_list(OLD) and pa.types.is_list(NEW):
+            return pa.list_(self._merge_type(OLD.value_type, NEW.value_type))
+        if pa.types.is_struct(OLD) and pa.types.is_struct(NEW):
+            fields = {field.name: field.type for field in OLD}
+            for field in NEW:
+                fields[field.name] = self._merge_type(fields[field.name], field.type) if field.name in fields else field.type
+            return pa.struct([pa.field(name, type) for name, type in fields.items()])
+        return pa.string()
+
+    def _widen_unknown(self, TYPE):
+        # Columns only seen empty so far hold json text, which can store any later value
+        pa = self.pa
+        if pa.types.is_null(TYPE):
+            return pa.string()
+        if pa.types.is_list(TYPE):
+            return pa.list_(self._widen_unknown(TYPE.value_type))
+        if pa.types.is_struct(TYPE):
+            return pa.struct([pa.field(field.name, self._widen_unknown(field.type)) for field in TYPE])
+        return TYPE
+
+    def freeze(self):
+        '''
+            Fixes the schema inferred so far, with the columns that only held nulls widened to strings.
+            Later pages are cast to it; keys it does not have are dropped with a warning.
+        '''
+        pa = self.pa
+        if self.schema is not None:
+            self.schema = pa.schema([pa.field(field.name, self._widen_unknown(field.type)) for field in self.schema])
+        self.frozen = True
+        return self.schema
+
+    def merge_schema(self, RECORDS):
+        '''
+            Widens the schema with the columns and types of a page of records. Returns True if the schema changed.
+        '''
+        pa = self.pa
+        names = list(dict.fromkeys(key for record in RECORDS for key in record))
+        fields = {field.name: field.type for field in self.schema} if self.schema is not None else {}
+        for name in names:
+            type = self._infer_type([record.get(name) for record in RECORDS])
+            fields[name] = self._merge_type(fields[name], type) if name in fields else type
+
+        schema = pa.schema([pa.field(name, type) for name, type in fields.items()])
+        changed = self.schema is None or not schema.equals(self.schema)
+        self.schema = schema
+        return changed
+
+    def _coerce(self, VALUE, TYPE):
+        pa = self.pa
+        if VALUE is None:
+            return None
+        try:
+            if pa.types.is_string(TYPE):
+                return VALUE if isinstance(VALUE, str) else json.dumps(VALUE)
+            if pa.types.is_boolean(TYPE):
+                return bool(VALUE)
+            if pa.types.is_integer(TYPE):
+                # A fractional number does not fit an integer column; it is not truncated
+                return int(VALUE) if int(VALUE) == float(VALUE) else None
+            if pa.types.is_floating(TYPE):
+                return float(VALUE)
+            if pa.types.is_list(TYPE) and isinstance(VALUE, list):
+                return [self._coerce(item, TYPE.value_type) for item in VALUE]
+            if pa.types.is_struct(TYPE) and isinstance(VALUE, dict):
+                return {field.name: self._coerce(VALUE.get(field.name), field.type) for field in TYPE}
+        except (TypeError, ValueError, OverflowError):
+            pass
+        return None
+
+    def _column(self, VALUES, FIELD):
+        pa = self.pa
+        # pyarrow truncates fractional floats in an integer column instead of failing
+        if not (pa.types.is_integer(FIELD.type) and any(isinstance(value, float) and not value.is_integer() for value in VALUES)):
+            try:
+                return pa.array(VALUES, type=FIELD.type)
+            except (pa.ArrowException, TypeError, ValueError, OverflowError):
+                pass
+
+        values = [self._coerce(value, FIELD.type) for value in VALUES]
+        if FIELD.name not in self._warned_columns and any(value is not None and coerced is None for value, coerced in zip(VALUES, values)):
+            self._warned_columns.add(FIELD.name)
+            print(f"Column '{FIELD.name}' has values that cannot be stored as {FIELD.type}; they are written as null.")
+        return pa.array(values, type=FIELD.type)
+
+    def to_batch(self, PAGE):
+        '''
+            Converts one page of records to a RecordBatch with the schema widened by the page,
+            or returns None for an empty page that arrives before the schema is known.
+        '''
+        records = page_records(PAGE)
+        if records and not self.frozen:
+            self.merge_schema(records)
+        if self.schema is None:
+            return None
+        if self.frozen:
+            self._warn_unknown_keys(records)
+
+        columns = [self._column([record.get(field.name) for record in records], field) for field in self.schema]
+        return self.pa.RecordBatch.from_arrays(columns, schema=self.schema)
+
+    def _warn_unknown_keys(self, RECORDS):
+        names = set(self.schema.names)
+        unknown = list(dict.fromkeys(key for record in RECORDS for key in record if key not in names and key not in self._warned_columns))
+        if unknown:
+            self._warned_columns.update(unknown)
+            print("Column(s) " + ", ".join(unknown) + " first appear after the schema was fixed; they are not written. "
+                  "Select them with fields() or use to_arrow() to keep them.")
+
+    def conform(self, BATCH):
+        '''
+            Returns a batch built before the schema was widened, converted to the current schema.
+        '''
+        pa = self.pa
+        if BATCH.schema.equals(self.schema):
+            return BATCH
+
+        columns = []
+        for field in self.schema:
+            index = BATCH.schema.get_field_index(field.name)
+            if index < 0:
+                columns.append(pa.nulls(BATCH.num_rows, field.type))
+                continue
+            column = BATCH.column(index)
+            try:
+                columns.append(column if column.type.equals(field.type) else column.cast(field.type))
+            except (pa.ArrowException, TypeError, ValueError):
+                # e.g. a struct or list column that became a json text column
+                columns.append(self._column(column.to_pylist(), field))
+        return pa.RecordBatch.from_arrays(columns, schema=self.schema)
+
+    def to_table(self, BATCHES):
+        batches = [self.conform(batch) for batch in BATCHES if batch is not None]
+        schema = self.schema if self.schema is not None else self.pa.schema([])
+        return self.pa.Table.from_batches(batches, schema=schema)
+
+
+class ParquetResultsWriter:
+    '''
+    Writes pages to a Parquet file as they arrive, one row group per page.
+    COMPRESSION ('gzip', 'zstd' or None for snappy) is applied inside the Parquet file.
+
+    The schema of a Parquet file cannot change once it is written, so the first BUFFER_ROWS records are held
+    back and the schema is inferred once from all of them, with the columns that were always empty stored as
+    json text. The later pages are cast to that schema: values it cannot hold are written as null, and keys it
+    does not have are dropped, both with a warning.
+    '''
+
+    BUFFER_ROWS = 50000
+
+    def __init__(self, FILE_PATH, COMPRESSION = None):
+        self.file_path = Path(FILE_PATH)
+        self.compression = COMPRESSION if COMPRESSION else 'snappy'
+        self.builder = ArrowBatchBuilder()
+        self.count = 0
+        self._writer = None
+        self._buffer = []
+        self._buffered_rows = 0
+
+    def _flush(self):
+        import pyarrow.parquet as pq
+        self.builder.freeze()
+        self._writer = pq.ParquetWriter(str(self.file_path), self.builder.schema, compression=self.compression)
+        for batch in self._buffer:
+            self._writer.write_batch(self.builder.conform(batch))
+        self._buffer = []
+
+    def write_page(self, PAGE):
+        batch = self.builder.to_batch(PAGE)
+        if batch is None:
+            return
+        self.count += batch.num_rows
+
+        if self._writer is None:
+            self._buffer.append(batch)
+            self._buffered_rows += batch.num_rows
+            if self._buffered_rows >= self.BUFFER_ROWS:
+                self._flush()
+            return
+
+        self._writer.write_batch(batch)
+
+    def close(self):
+        if self._writer is None and self.builder.schema is None:
+            # No records: still write a valid, empty Parquet file
+            import pyarrow.parquet as pq
+            pq.write_table(self.builder.to_table([]), str(self.file_path), compression=self.compression)
+            return
+
+        if self._writer is None:
+            self._flush()
+        self._writer.close()
+
+    def abort(self):
+        '''
+            Closes the file after a failed download, keeping the row groups written so far.
+        '''
+        if self._writer is not None:
+            self._writer.close()
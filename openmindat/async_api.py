@@ -0,0 +1,425 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from .mindat_api import MindatApi, MindatApiKeyManager, encode_params, tqdm
+from .session import get_default_async_session
+from .writers import open_results_writer
+from .arrow_export import ArrowBatchBuilder
+
+
+def _synchronous_only(NAME):
+    def method(self, *args, **kwargs):
+        raise NotImplementedError(NAME + "() is not available on AsyncMindatApi; use MindatApi instead.")
+    method.__name__ = NAME
+    return method
+
+
+class AsyncMindatApi(MindatApi):
+    '''
+    The asyncio counterpart of MindatApi.
+
+    Requests are sent with an AsyncMindatSession (httpx), so many queries and pages can be in flight
+    on one event loop. CONCURRENCY bounds the pages of one query fetched at the same time, and the
+    session's MAX_CONNECTIONS bounds the requests in flight across all queries sharing it.
+    Cancelling the calling task cancels every outstanding page request.
+
+    The API key is loaded on the first request, in a worker thread, as loading it may prompt for it.
+    ID range sharding, batched id lookups, resumable downloads and syncs are only available on MindatApi;
+    the corresponding methods raise NotImplementedError here.
+
+    Usage:
+        >>> ama = AsyncMindatApi(CONCURRENCY=8)
+        >>> json_data = await ama.get_mindat_json({'format': 'json', 'page-size': 1500}, 'v1/geomaterials')
+    '''
+
+    def __init__(self, ENDPOINT: str = None, SESSION = None, CONCURRENCY = 1, CACHE = None, RETRY_POLICY = None, RATE_LIMITER = None, PAGE_SIZE_CONTROLLER = None, COALESCE = True):
+        # The synchronous default session is only used for interactive key prompts
+        super().__init__(ENDPOINT, CONCURRENCY=CONCURRENCY, CACHE=CACHE, RETRY_POLICY=RETRY_POLICY, RATE_LIMITER=RATE_LIMITER, PAGE_SIZE_CONTROLLER=PAGE_SIZE_CONTROLLER, COALESCE=COALESCE)
+        self.async_session = SESSION
+        self._semaphore = None
+        # Serializes loading and replacing the API key on the event loop; the class-level _api_key_lock
+        # of MindatApi still guards the key file against other threads
+        self._api_key_async_lock = None
+
+    def _prepare_api_key(self):
+        # Deferred to _load_api_key, so the constructor never blocks the event loop
+        self._headers = None
+
+    async def _load_api_key(self):
+        if self._headers is not None:
+            return
+        async with self._get_api_key_async_lock():
+            if self._headers is None:
+                await asyncio.to_thread(MindatApi._prepare_api_key, self)
+
+    def _get_api_key_async_lock(self):
+        if self._api_key_async_lock is None:
+            self._api_key_async_lock = asyncio.Lock()
+        return self._api_key_async_lock
+
+    def _get_async_session(self):
+        if self.async_session is None:
+            self.async_session = get_default_async_session()
+        return self.async_session
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _request(self, URL, PARAMS = None):
+        '''
+            Sends a GET request with the API key, re-prompting once for a new key if the stored one is rejected.
+            With a response cache, a stored response for the same URL and parameters is returned instead,
+            or revalidated when it has expired; the SQLite lookups run in a worker thread.
+            An identical request already in flight on the event loop is joined instead of sent again.
+        '''
+        await self._load_api_key()
+        if self.single_flight is None:
+            return await self._fetch(URL, PARAMS)
+
+        key = self.single_flight.make_key(URL, encode_params(PARAMS), self._api_key)
+        return await self.single_flight.ado(key, lambda: self._fetch(URL, PARAMS))
+
+    async def _fetch(self, URL, PARAMS = None):
+        if self.cache is None:
+            return await self._send(URL, PARAMS)
+
+        cache_key = self.cache.make_key(URL, encode_params(PARAMS))
+        cached_response = await asyncio.to_thread(self.cache.lookup, cache_key)
+        if cached_response is not None and not cached_response.stale:
+            return cached_response
+
+        response = await self._send(URL, PARAMS, self.cache.conditional_headers(cached_response))
+        return await asyncio.to_thread(self.cache.store, cache_key, response, cached_response)
+
+    async def _send(self, URL, PARAMS = None, HEADERS = None):
+        params = encode_params(PARAMS) if PARAMS else None
+        api_key = self._api_key
+        headers = dict(self._headers, **HEADERS) if HEADERS else self._headers
+        response = await self._send_with_retries(URL, params, headers)
+
+        if 401 == response.status_code:
+            # Prompting on the event loop's own thread blocks it, but nothing can be fetched without a key anyway
+            async with self._get_api_key_async_lock():
+                self._handle_invalid_api_key(api_key)
+            headers = dict(self._headers, **HEADERS) if HEADERS else self._headers
+            response = await self._send_with_retries(URL, params, headers)
+            if 401 == response.status_code:
+                raise ValueError("The Mindat API key was rejected by the server.")
+
+        if 200 == response.status_code and not self._key_validated:
+            await asyncio.to_thread(MindatApiKeyManager(self.endpoint, self.session).mark_validated, self._api_key)
+            self._key_validated = True
+
+        return response
+
+    async def _send_with_retries(self, URL, PARAMS, HEADERS):
+        '''
+            Sends a GET request, retrying connection errors, timeouts and retryable status codes
+            as the retry policy allows. The semaphore is released while waiting between attempts.
+            Every attempt waits for the rate limiter, and a 429 pauses the rate limiter for all its users.
+        '''
+        session = self._get_async_session()
+        policy = self.retry_policy
+        started_at = time.monotonic()
+        attempt = 0
+
+        while True:
+            try:
+                async with self._get_semaphore():
+                    async with self.rate_limiter.alimit() if self.rate_limiter else nullcontext():
+                        response = await session.get(URL, params=PARAMS, headers=HEADERS, timeout=policy.get_timeout(started_at))
+            except Exception as e:
+                if not policy.should_retry_exception(e):
+                    raise
+                delay = policy.get_delay(attempt, started_at)
+                if delay is None:
+                    raise
+            else:
+                if not policy.should_retry_status(response.status_code):
+                    return response
+                delay = policy.get_delay(attempt, started_at, response)
+                if delay is None:
+                    return response
+                if 429 == response.status_code and self.rate_limiter:
+                    self.rate_limiter.pause(delay)
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _get_page_results(self, URL):
+        response = await self._request(URL)
+        self._raise_for_server_error(response)
+        return response.json()['results']
+
+    async def _iter_pages_concurrently(self, PAGE_URLS):
+        '''
+            Fetches the given pages as tasks bounded by self.concurrency and yields their results in page order.
+            If one page fails or the consumer stops, the remaining page tasks are cancelled.
+        '''
+        pending = deque()
+        try:
+            for url in PAGE_URLS:
+                if len(pending) >= self.concurrency:
+                    yield await pending.popleft()
+                pending.append(asyncio.ensure_future(self._get_page_results(url)))
+
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _get_first_page(self, PARAM_DICT, END_POINT):
+        params = PARAM_DICT
+        end_point = END_POINT
+
+        key = self.page_size_controller.get_key(end_point, params)
+        if 'page-size' in params and 'page' not in params:
+            params['page-size'] = self.page_size_controller.get_page_size(key, params['page-size'])
+
+        while True:
+            started_at = time.monotonic()
+            try:
+                response = await self._request(self.MINDAT_API_URL+ "/" + end_point + "/", params)
+            except self.retry_policy.retryable_exceptions:
+                # The retries timed out or lost the connection; a smaller page may still go through
+                if not self._shrink_page_size(params, key):
+                    raise
+                continue
+
+            if len(str(response.url)) > self.MAX_URL_LENGTH:
+                raise ValueError("Search query to big, reduce the size of the search and try again.")
+
+            # Rate limiting and server errors are not page size problems; the transport has already retried them
+            self._raise_for_server_error(response)
+
+            try:
+                response_json = response.json()
+                result_data = response_json["results"]
+                self._record_page(key, params.get('page-size'), response, started_at)
+                break
+            except KeyError:
+                # This error indicates the result only has one page
+                # We will convert the result data into a list for consistency
+                result_data = [response_json]
+                break
+            except TypeError:
+                # This error indicates the result data is a list instead of a dict
+                # We will pass the response result directly
+                result_data = response_json
+                break
+            except ValueError:
+                if not self._shrink_page_size(params, key):
+                    raise ValueError(str(response.reason_phrase))
+            except:
+                raise ValueError(str(response.reason_phrase))
+
+        return response_json, result_data
+
+    async def _iter_chunked_pages(self, QUERIES, END_POINT, VERBOSE = 2):
+        '''
+            Runs the chunks of a split query as concurrent tasks and yields their pages in chunk order,
+            dropping records (by id) already returned by an earlier chunk.
+        '''
+        workers = self.concurrency if self.concurrency > 1 else self.LOOKUP_CONCURRENCY
+        if any('ordering' in query for query in QUERIES) and VERBOSE > 0:
+            print("The query is too long for one request and is split in " + str(len(QUERIES)) + " parts; the ordering applies within each part.")
+
+        async def fetch(QUERY):
+            return [page async for page in self.iter_pages(dict(QUERY), END_POINT, 0)]
+
+        pbar = tqdm(total=len(QUERIES), desc="Fetching query parts") if VERBOSE == 2 else None
+        queries = deque(QUERIES)
+        pending = deque()
+        seen_ids = set()
+        try:
+            while queries and len(pending) < workers:
+                pending.append(asyncio.ensure_future(fetch(queries.popleft())))
+
+            while pending:
+                pages = await pending.popleft()
+                if queries:
+                    pending.append(asyncio.ensure_future(fetch(queries.popleft())))
+                if pbar is not None:
+                    pbar.update(1)
+                for page in pages:
+                    yield self._drop_seen_records(page, seen_ids)
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if pbar is not None:
+                pbar.close()
+
+    async def iter_pages(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        '''
+            Yields the results of each page as soon as it arrives (async generator).
+            With self.concurrency > 1, the pages after the first are fetched concurrently and still yielded in order.
+            A query whose URL is too long for the server is split into several queries (see _split_oversized_query).
+        '''
+        params = PARAM_DICT
+        end_point = END_POINT
+        requested_page_size = params.get('page-size')
+
+        queries = self._split_oversized_query(params, end_point)
+        if queries:
+            page_iterator = self._iter_chunked_pages(queries, end_point, VERBOSE)
+            try:
+                async for page in page_iterator:
+                    yield page
+            finally:
+                await page_iterator.aclose()
+            return
+
+        # Retrieve the first page of data
+        response_json, result_data = await self._get_first_page(params, end_point)
+
+        # Check if the query involves multiple pages
+        multipage_flag = self._is_multipage_query(params, response_json)
+
+        if False == multipage_flag:
+            yield result_data
+            return
+
+        # Create the progress bar
+        total_item = response_json.get("count", None)
+        item_per_request = len(response_json["results"])
+        if VERBOSE == 2:
+            pbar = tqdm(total=total_item, desc="Fetching data") if total_item is not None else tqdm(desc="Fetching data")
+            pbar.update(item_per_request)
+        else:
+            pbar = None
+
+        try:
+            yield result_data
+
+            # Fetch the remaining pages concurrently when the page set can be computed from the count
+            page_urls = None
+            next_url = response_json.get("next")
+            if self.concurrency > 1 and next_url and total_item and isinstance(result_data, list):
+                page_urls = self._get_page_urls(next_url, total_item, item_per_request)
+
+            if page_urls:
+                page_iterator = self._iter_pages_concurrently(page_urls)
+                try:
+                    async for new_results in page_iterator:
+                        if VERBOSE == 2:
+                            pbar.update(len(new_results))
+                        yield new_results
+                finally:
+                    await page_iterator.aclose()
+                return
+
+            # Otherwise follow the next links one by one, tuning the page size as pages arrive
+            key = self.page_size_controller.get_key(end_point, params)
+            done_item = item_per_request
+            while next_url:
+                next_url, skip_item = self._adapt_page_url(next_url, done_item, key, requested_page_size)
+                while True:
+                    started_at = time.monotonic()
+                    try:
+                        response = await self._request(next_url)
+                        break
+                    except self.retry_policy.retryable_exceptions:
+                        # The retries timed out or lost the connection; a smaller page may still go through
+                        smaller_url, skip_item = self._adapt_page_url(next_url, done_item, key, requested_page_size, FAILED=True)
+                        if smaller_url == next_url:
+                            raise
+                        next_url = smaller_url
+
+                self._raise_for_server_error(response)
+                page_json = response.json()
+                self._record_page(key, self._get_url_page_size(next_url), response, started_at)
+
+                # Drop the items of a resized page that previous pages already returned
+                new_results = page_json['results'][skip_item:]
+                if VERBOSE == 2:
+                    pbar.update(len(new_results))
+                done_item += len(new_results)
+                yield new_results
+
+                next_url = page_json["next"]
+        finally:
+            # Close the progress bar
+            if VERBOSE == 2:
+                pbar.close()
+
+    async def iter_records(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        '''
+            Yields the items of a query one by one as their pages arrive (async generator).
+        '''
+        async for page in self.iter_pages(PARAM_DICT, END_POINT, VERBOSE):
+            if isinstance(page, dict): #special case for locgeoregion2
+                for feature in page.get("features", []):
+                    yield feature
+            else:
+                for record in page:
+                    yield record
+
+    async def get_mindat_json(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        '''
+            get all items in a list
+            This collects iter_pages() into a single dict
+        '''
+        json_data = None
+
+        async for page in self.iter_pages(PARAM_DICT, END_POINT, VERBOSE):
+            if json_data is None:
+                # Format the obtained data in a JSON dict
+                json_data = {"results": page}
+            elif isinstance(json_data["results"], dict): #special case for locgeoregion2
+                json_data["results"]["features"] += page["features"]
+            else:
+                json_data["results"] += page
+
+        return json_data
+
+    async def get_arrow_table(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        '''
+            get all items as a pyarrow.Table, converting each page to a record batch as it arrives
+        '''
+        builder = ArrowBatchBuilder()
+        batches = [builder.to_batch(page) async for page in self.iter_pages(PARAM_DICT, END_POINT, VERBOSE)]
+        return builder.to_table(batches)
+
+    async def download_mindat_json(self, QUERY_DICT, END_POINT, OUTDIR = '', FILE_NAME = '', VERBOSE = 2, FORMAT = 'json', COMPRESSION = None):
+        '''
+            get all items in a list and save them to a single file as pages arrive
+            FORMAT is 'json' (indented document), 'json-compact', 'ndjson' (one record per line) or 'parquet'.
+            COMPRESSION is None, 'gzip' or 'zstd'; it can also be given as the extension of FILE_NAME.
+            Pages are written in a worker thread so the event loop is not blocked
+        '''
+        # The default output name is same as the endpoint
+        file_name = FILE_NAME if FILE_NAME else END_POINT
+
+        # Getting the directory for the output file
+        file_path, compression = self._get_output_path(OUTDIR, file_name, FORMAT, COMPRESSION)
+
+        # Write to a temporary file first, so a failed download does not leave a truncated output behind
+        part_path = file_path.with_name(file_path.name + '.part')
+
+        try:
+            with open_results_writer(FORMAT, part_path, compression) as writer:
+                async for page in self.iter_pages(QUERY_DICT, END_POINT, VERBOSE):
+                    await asyncio.to_thread(writer.write_page, page)
+        except BaseException:
+            part_path.unlink(missing_ok=True)
+            raise
+
+        os.replace(part_path, file_path)
+
+        if VERBOSE > 0:
+            print("Successfully saved " + str(writer.count) + " entries to " + str(file_path.resolve()))
+
+
+# The synchronous entry points of MindatApi would call the coroutines above without awaiting them
+for _name in ('_get_by_id', '_get_id_in_chunk', 'get_many', '_iter_pages_with_next', '_count_items', '_get_id_range',
+              '_fetch_shard', '_iter_sharded_pages', '_iter_resumable_pages', '_download_checkpointed', 'sync_mindat_json'):
+    setattr(AsyncMindatApi, _name, _synchronous_only(_name))
+del _name
@@ -0,0 +1,296 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+
+class CachedResponse:
+    '''
+    A response served from the ResponseCache.
+    It offers the parts of requests.Response that MindatApi reads: status_code, url, reason, headers, content, text and json().
+    '''
+
+    from_cache = True
+
+    def __init__(self, URL, STATUS_CODE, HEADERS, CONTENT, STALE = False):
+        self.url = URL
+        # A stale response has outlived the cache TTL and is only returned after the server confirms it (304)
+        self.stale = STALE
+        self.status_code = STATUS_CODE
+        self.headers = HEADERS
+        self.content = CONTENT
+        self.reason = 'OK' if 200 == STATUS_CODE else ''
+        self.reason_phrase = self.reason
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def get_header(self, NAME):
+        name = NAME.lower()
+        for key, value in self.headers.items():
+            if key.lower() == name:
+                return value
+        return None
+
+
+class ResponseCache:
+    '''
+    An opt-in, persistent cache of Mindat API responses, stored in a SQLite file.
+
+    Successful GET responses are stored under a key made of the normalized endpoint URL and the sorted
+    query parameters, so a page requested again (by the same or a later run) is served from disk.
+    Entries expire after TTL seconds; when the stored bodies exceed MAX_SIZE bytes, the least recently
+    used entries are evicted. The cache is safe to share between threads.
+
+    Expired entries whose response carried an ETag or Last-Modified header are revalidated rather than
+    downloaded again: MindatApi sends a conditional request, and a 304 Not Modified answer renews the
+    entry and counts as a hit. With TTL=0, every request is revalidated.
+
+    Args:
+        PATH (str): The SQLite file holding the cache.
+        TTL (int): Seconds a response is served from the cache.
+        MAX_SIZE (int): The maximum number of bytes of response bodies kept on disk.
+
+    Usage:
+        >>> cache = ResponseCache(TTL=3600)
+        >>> gr = GeomaterialRetriever().cache(cache)
+        >>> gr.density_min(3.25).get_dict()
+        >>> cache.stats()
+    '''
+
+    DEFAULT_PATH = './.mindat_cache.sqlite'
+
+    def __init__(self, PATH = DEFAULT_PATH, TTL = 24 * 60 * 60, MAX_SIZE = 512 * 1024 * 1024):
+        self.path = Path(PATH)
+        self.ttl = float(TTL)
+        self.max_size = int(MAX_SIZE)
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT, body BLOB, '
+            'size INTEGER, stored_at REAL, accessed_at REAL)'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+
+    @staticmethod
+    def make_key(URL, PARAMS = None):
+        '''
+            Returns the cache key of a request: the URL without a trailing slash, followed by
+            the query parameters of the URL and PARAMS, sorted.
+            PARAMS is a list of (key, value) pairs as returned by encode_params().
+        '''
+        parsed_url = urlparse(URL)
+        query = parse_qsl(parsed_url.query, keep_blank_values=True) + list(PARAMS or [])
+        path = parsed_url.path.rstrip('/')
+        base = urlunparse((parsed_url.scheme, parsed_url.netloc.lower(), path, '', '', ''))
+        return base + '?' + urlencode(sorted(query))
+
+    def _execute(self, SQL, ARGS = ()):
+        with self._lock:
+            return self._connection.execute(SQL, ARGS).fetchall()
+
+    def lookup(self, KEY):
+        '''
+            Returns the CachedResponse stored under KEY, marked stale if it has expired, or None if there is none.
+            A fresh entry counts as a hit; for a stale one, the outcome is counted by store().
+        '''
+        now = time.time()
+        rows = self._execute('SELECT url, status, headers, body, stored_at FROM responses WHERE key = ?', (KEY,))
+
+        if not rows:
+            return None
+
+        url, status, headers, body, stored_at = rows[0]
+        stale = now - stored_at > self.ttl
+
+        if not stale:
+            self._execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, KEY))
+            with self._lock:
+                self.hits += 1
+
+        return CachedResponse(url, status, json.loads(headers), body, stale)
+
+    def get(self, KEY):
+        '''
+            Returns the CachedResponse stored under KEY, or None if there is none or it has expired.
+        '''
+        cached_response = self.lookup(KEY)
+
+        if cached_response is None or cached_response.stale:
+            with self._lock:
+                self.misses += 1
+            return None
+        return cached_response
+
+    @staticmethod
+    def conditional_headers(CACHED_RESPONSE):
+        '''
+            Returns the If-None-Match / If-Modified-Since headers that revalidate a cached response.
+        '''
+        headers = {}
+        if CACHED_RESPONSE is None:
+            return headers
+
+        etag = CACHED_RESPONSE.get_header('ETag')
+        last_modified = CACHED_RESPONSE.get_header('Last-Modified')
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def store(self, KEY, RESPONSE, CACHED_RESPONSE = None):
+        '''
+            Records the response to a request that was not served from the cache and returns the response to use.
+            A 304 answer to a conditional request renews CACHED_RESPONSE and returns it; anything else is a miss,
+            and a successful response is stored.
+        '''
+        if 304 == RESPONSE.status_code and CACHED_RESPONSE is not None:
+            headers = dict(CACHED_RESPONSE.headers)
+            for name in ('ETag', 'Last-Modified', 'Cache-Control', 'Expires', 'Date'):
+                value = RESPONSE.headers.get(name)
+                if value is not None:
+                    headers = {key: item for key, item in headers.items() if key.lower() != name.lower()}
+                    headers[name] = value
+
+            now = time.time()
+            self._execute(
+                'UPDATE responses SET headers = ?, stored_at = ?, accessed_at = ? WHERE key = ?',
+                (json.dumps(headers), now, now, KEY)
+            )
+            with self._lock:
+                self.hits += 1
+                self.revalidations += 1
+            return CachedResponse(CACHED_RESPONSE.url, CACHED_RESPONSE.status_code, headers, CACHED_RESPONSE.content)
+
+        with self._lock:
+            self.misses += 1
+        self.put(KEY, RESPONSE)
+        return RESPONSE
+
+    def put(self, KEY, RESPONSE):
+        '''
+            Stores a successful response under KEY, then evicts entries if the cache is over MAX_SIZE.
+        '''
+        if 200 != RESPONSE.status_code:
+            return
+
+        body = RESPONSE.content
+        now = time.time()
+        self._execute(
+            'INSERT OR REPLACE INTO responses (key, url, status, headers, body, size, stored_at, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (KEY, str(RESPONSE.url), RESPONSE.status_code, json.dumps(dict(RESPONSE.headers)), body, len(body), now, now)
+        )
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            total_size = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total_size <= self.max_size:
+                return
+
+            # Expired entries go first, then the least recently used ones
+            cursor = self._connection.execute('SELECT key, size, stored_at FROM responses ORDER BY accessed_at')
+            now = time.time()
+            rows = cursor.fetchall()
+            evicted = [row for row in rows if now - row[2] > self.ttl]
+            evicted += [row for row in rows if now - row[2] <= self.ttl]
+
+            keys = []
+            for key, size, stored_at in evicted:
+                if total_size <= self.max_size:
+                    break
+                keys.append((key,))
+                total_size -= size
+            self._connection.executemany('DELETE FROM responses WHERE key = ?', keys)
+
+    def stats(self):
+        '''
+            Returns the hit and miss counts of this process and the number and size of the stored entries.
+            Revalidations (304 answers) are included in the hits.
+        '''
+        entries, size = self._execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses')[0]
+        with self._lock:
+            hits, misses, revalidations = self.hits, self.misses, self.revalidations
+        requests = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'revalidations': revalidations,
+            'hit_rate': hits / requests if requests else 0.0,
+            'entries': entries,
+            'size': size,
+        }
+
+    def clear(self):
+        '''
+            Deletes every stored response and resets the statistics.
+        '''
+        self._execute('DELETE FROM responses')
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.revalidations = 0
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    '''
+        Returns the process-wide ResponseCache, or None when caching has not been enabled.
+    '''
+    return _default_cache
+
+
+def set_default_cache(CACHE = True):
+    '''
+        Enables the response cache for every MindatApi and retriever that is not given its own.
+        CACHE is a ResponseCache, True for a ResponseCache with the default settings, or None/False to disable caching.
+    '''
+    global _default_cache
+
+    with _default_cache_lock:
+        if CACHE is True:
+            CACHE = ResponseCache()
+        _default_cache = CACHE if CACHE else None
+    return _default_cache
+
+
+def resolve_cache(CACHE):
+    '''
+        Returns the ResponseCache to use for a CACHE argument: None uses the default cache,
+        False disables caching, True uses (and if needed creates) the default cache.
+    '''
+    if CACHE is None:
+        return get_default_cache()
+    if CACHE is False:
+        return None
+    if CACHE is True:
+        return get_default_cache() or set_default_cache(True)
+    return CACHE
@@ -0,0 +1,77 @@
+import json
+import os
+import time
+
+
+class HarvestCheckpoint:
+    '''
+    The on-disk checkpoint of a resumable download, kept next to the output file as '<output>.checkpoint'.
+
+    The records are appended to the partial output file as pages arrive. After every page, the partial output
+    is flushed to disk and the checkpoint records its size, the number of records in it, and where the query
+    continues (the part of a split query and the URL of its next page). After an interruption, the partial
+    output is truncated to the recorded size and the download continues at the recorded page, so no page is
+    stored twice.
+    '''
+
+    def __init__(self, FILE_PATH):
+        self.state_path = FILE_PATH.with_name(FILE_PATH.name + '.checkpoint')
+        self.state = None
+
+    def load(self, END_POINT, PARAM_DICT, FORMAT):
+        '''
+            Loads the checkpoint of the query. Returns False if there is no checkpoint,
+            or if it belongs to a different query or output format.
+        '''
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if (state.get('end_point') != END_POINT or state.get('params') != json.loads(json.dumps(PARAM_DICT))
+                or state.get('format') != FORMAT):
+            print("The checkpoint at " + str(self.state_path) + " belongs to a different query; starting over.")
+            return False
+
+        self.state = state
+        return True
+
+    def start(self, END_POINT, PARAM_DICT, FORMAT):
+        '''
+            Starts a new checkpoint for the query, discarding any previous one.
+        '''
+        self.state = {
+            'end_point': END_POINT,
+            'params': json.loads(json.dumps(PARAM_DICT)),
+            'format': FORMAT,
+            'position': None,
+            'records_written': 0,
+            'offset': 0,
+        }
+        self._save_state()
+
+    def update(self, OFFSET, RECORDS_WRITTEN, POSITION):
+        '''
+            Records that the partial output holds OFFSET bytes and RECORDS_WRITTEN records,
+            and that the query continues at POSITION.
+        '''
+        self.state['offset'] = OFFSET
+        self.state['records_written'] = RECORDS_WRITTEN
+        self.state['position'] = POSITION
+        self._save_state()
+
+    def _save_state(self):
+        self.state['updated_at'] = time.time()
+        temp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.state_path)
+
+    def remove(self):
+        try:
+            os.remove(self.state_path)
+        except FileNotFoundError:
+            pass
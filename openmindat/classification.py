@@ -0,0 +1,269 @@
+import gzip
+import json
+import os
+from pathlib import Path
+
+
+def _normalize_part(PART):
+    part = str(PART).strip()
+    if part.isdigit():
+        return str(int(part))
+    return part.upper()
+
+
+class ClassificationNode:
+    '''
+    A class, subclass, group or family of a mineral classification, with its children and the geomaterials filed under it.
+    '''
+
+    __slots__ = ('parts', 'code', 'level', 'id', 'name', 'record', 'parent', 'children', 'minerals')
+
+    def __init__(self, PARTS, CODE, LEVEL, RECORD):
+        self.parts = PARTS
+        self.code = CODE
+        self.level = LEVEL
+        self.record = RECORD
+        self.id = RECORD.get('id')
+        self.name = RECORD.get('name') or RECORD.get('description')
+        self.parent = None
+        self.children = []
+        self.minerals = []
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(self.__class__.__name__, self.code, self.name)
+
+
+class ClassificationTree:
+    '''
+    A cached tree of a mineral classification, for classifying geomaterials without requests to the API.
+
+    The flat lists of the classification endpoints are joined into one tree by their codes: a node is the child
+    of the node with the longest code it starts with, e.g. Strunz family 7.AB.05 is a child of subclass 7.A,
+    itself a child of class 7. Nodes are looked up by code or by id in a dictionary, so classifying a geomaterial
+    costs a few dictionary lookups, and the geomaterials added to the tree are found under any prefix of their code.
+
+    The tree, with the geomaterials added to it, is saved to and loaded from a gzipped json file.
+
+    Usage:
+        >>> tree = StrunzRetriever().get_tree()
+        >>> tree.add_geomaterials(GeomaterialRetriever().fields("id,name,strunz10ed1,strunz10ed2,strunz10ed3,strunz10ed4").iter_records())
+        >>> tree.get("7.AB.05")
+        >>> tree.get_minerals("7")
+        >>> tree.save()
+    '''
+
+    NAME = None
+    DEFAULT_PATH = None
+    FORMAT_VERSION = 1
+    # The sub-endpoints of the classification, from the top level down
+    LEVELS = ()
+    # The geomaterial fields holding the parts of the code of a geomaterial
+    GEOMATERIAL_FIELDS = ()
+
+    def __init__(self, RECORDS = None, MINERALS = None):
+        self.records = {level: list(records) for level, records in (RECORDS or {}).items()}
+        self._nodes = {}
+        self._ids = {}
+        self.roots = []
+
+        for level in self.LEVELS:
+            for record in self.records.get(level, ()):
+                parts = self.get_record_parts(record)
+                if parts and parts not in self._nodes:
+                    node = self._nodes[parts] = ClassificationNode(parts, self.format_code(parts), level, record)
+                    if node.id is not None:
+                        self._ids[(level, node.id)] = node
+
+        # A node hangs under the node with the longest code it starts with
+        for parts in sorted(self._nodes, key=len):
+            node = self._nodes[parts]
+            parent = self._find(parts[:-1])
+            if parent is None:
+                self.roots.append(node)
+            else:
+                node.parent = parent
+                parent.children.append(node)
+
+        for code, minerals in (MINERALS or {}).items():
+            node = self.get(code)
+            if node is not None:
+                node.minerals.extend(minerals)
+
+    @staticmethod
+    def get_parts(CODE):
+        '''
+            Returns the parts of a code, e.g. ('51', '4', '3', '1') for '51.4.3.1'.
+        '''
+        return tuple(_normalize_part(part) for part in str(CODE or '').split('.') if part.strip())
+
+    @staticmethod
+    def format_code(PARTS):
+        '''
+            Returns the code written from its parts, e.g. '51.4.3.1' for ('51', '4', '3', '1').
+        '''
+        return '.'.join(PARTS)
+
+    def get_record_parts(self, RECORD):
+        '''
+            Returns the parts of the code of a classification record or of a geomaterial, or () if it has none.
+            The code is read from a 'code' field, or else from the classification fields of a geomaterial.
+        '''
+        if RECORD.get('code'):
+            return self.get_parts(RECORD['code'])
+        parts = []
+        for field in self.GEOMATERIAL_FIELDS:
+            value = RECORD.get(field)
+            if value is None or not str(value).strip() or str(value).strip() == '0':
+                break
+            parts.append(str(value).strip())
+        return self.get_parts('.'.join(parts)) if parts else ()
+
+    def _find(self, PARTS):
+        # The deepest node whose code is a prefix of the parts
+        for length in range(len(PARTS), 0, -1):
+            node = self._nodes.get(PARTS[:length])
+            if node is not None:
+                return node
+        return None
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, CODE):
+        return self.get(CODE) is not None
+
+    def get(self, CODE):
+        '''
+            Returns the node of a code, e.g. '7.AB.05', or None if the classification has no such node.
+        '''
+        return self._nodes.get(self.get_parts(CODE))
+
+    def get_by_id(self, ID, LEVEL):
+        '''
+            Returns the node with the id of a record of the LEVEL sub-endpoint, e.g. get_by_id(12, 'subclasses'), or None.
+        '''
+        return self._ids.get((LEVEL, int(ID)))
+
+    def classify(self, RECORD):
+        '''
+            Returns the deepest node a geomaterial belongs to, from its classification fields, or None if it is unclassified.
+        '''
+        return self._find(self.get_record_parts(RECORD))
+
+    def get_path(self, CODE):
+        '''
+            Returns the nodes from the top of the tree down to the deepest node a code belongs to.
+        '''
+        node = self._find(self.get_parts(CODE))
+        path = []
+        while node is not None:
+            path.append(node)
+            node = node.parent
+        return path[::-1]
+
+    def iter_nodes(self, CODE = None):
+        '''
+            Yields the node of a code and all the nodes under it, depth first; every node of the tree if CODE is None.
+        '''
+        if CODE is None:
+            stack = self.roots[::-1]
+        else:
+            node = self.get(CODE)
+            stack = [node] if node is not None else []
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.children[::-1])
+
+    def add_geomaterials(self, RECORDS):
+        '''
+            Files geomaterials under the deepest node of their classification fields.
+            Returns the number of geomaterials filed; unclassified geomaterials are skipped.
+        '''
+        filed = 0
+        for record in RECORDS:
+            node = self.classify(record)
+            if node is not None and record.get('id') is not None:
+                node.minerals.append(record['id'])
+                filed += 1
+        return filed
+
+    def get_minerals(self, CODE = None):
+        '''
+            Returns the ids of the geomaterials filed under the node of a code or any node below it.
+        '''
+        return [id for node in self.iter_nodes(CODE) for id in node.minerals]
+
+    def save(self, PATH = None):
+        '''
+            Saves the classification records and the filed geomaterials to a gzipped json file.
+        '''
+        path = Path(PATH or self.DEFAULT_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'version': self.FORMAT_VERSION,
+            'name': self.NAME,
+            'records': self.records,
+            'minerals': {node.code: node.minerals for node in self._nodes.values() if node.minerals},
+        }
+        temp_path = path.with_name(path.name + '.part')
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, PATH = None):
+        '''
+            Loads a tree saved with save().
+        '''
+        path = PATH or cls.DEFAULT_PATH
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != cls.FORMAT_VERSION or data.get('name') != cls.NAME:
+            raise ValueError("The classification tree " + str(path) + " was saved in another format; build it again.")
+        return cls(data['records'], data['minerals'])
+
+
+class DanaTree(ClassificationTree):
+    '''
+    The Dana 8th edition classification: groups and subgroups, e.g. 51.4.3 under 51.4.
+    '''
+
+    NAME = 'dana-8'
+    DEFAULT_PATH = './mindat_data/dana-8.json.gz'
+    LEVELS = ('groups', 'subgroups')
+    GEOMATERIAL_FIELDS = ('dana8ed1', 'dana8ed2', 'dana8ed3', 'dana8ed4')
+
+
+class StrunzTree(ClassificationTree):
+    '''
+    The Nickel-Strunz 10th edition classification: classes, subclasses and families, e.g. 7.AB.05 under 7.A under 7.
+    The letters of a code are parts of their own, so family 7.AB.05 has the parts ('7', 'A', 'B', '5').
+    '''
+
+    NAME = 'nickel-strunz-10'
+    DEFAULT_PATH = './mindat_data/nickel-strunz-10.json.gz'
+    LEVELS = ('classes', 'subclasses', 'families')
+    GEOMATERIAL_FIELDS = ('strunz10ed1', 'strunz10ed2', 'strunz10ed3', 'strunz10ed4')
+
+    @staticmethod
+    def get_parts(CODE):
+        parts = []
+        for part in str(CODE or '').split('.'):
+            part = part.strip()
+            if part.isalpha():
+                parts.extend(part.upper())
+            elif part:
+                parts.append(_normalize_part(part))
+        return tuple(parts)
+
+    @staticmethod
+    def format_code(PARTS):
+        code = PARTS[0]
+        letters = ''.join(part for part in PARTS[1:] if part.isalpha())
+        numbers = [part.zfill(2) for part in PARTS[1:] if not part.isalpha()]
+        if letters:
+            code += '.' + letters
+        if numbers:
+            code += '.' + '.'.join(numbers)
+        return code
@@ -1,8 +1,12 @@
+from pathlib import Path
+
 from . import mindat_api
+from .retriever_mixin import RetrieverMixin
+from .classification import DanaTree
 
 #todo: Check back in when retrieve and id functions are implemented
 
-class DanaRetriever:
+class DanaRetriever(RetrieverMixin):
     """
     A class to facilitate the retrieval of dana-8 data from the Mindat API filtering with type of groups or subgroups.
     For more information visit: https://api.mindat.org/schema/redoc/#tag/dana-8/operation/dana_8_retrieve
@@ -14,6 +18,7 @@ class DanaRetriever:
         id: N/A
         groups: returns group information
         subgroups: returns subgroup information
+        get_tree: returns the classification tree, cached on disk, for classifying geomaterials offline
 
     Usage:
         >>> dr = DanaRetriever()
@@ -24,7 +29,8 @@ class DanaRetriever:
     
     BASE_ENDPOINT = 'v1/dana-8'
 
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.sub_endpoint = ''
         self.end_point = self.BASE_ENDPOINT
         self.verbose_flag = 2
@@ -165,37 +171,10 @@ class DanaRetriever:
         
         return self
     
-    def saveto(self, OUTDIR = '', FILE_NAME = ''):
-        '''
-            Executes the query to retrieve the dana-8 data with keywords and saves the results to a specified directory.
-
-            Args:
-                OUTDIR (str): The directory path where the retrieved dana-8 data will be saved. If not provided, the current directory will be used.
-                FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-            Returns:
-                None
-
-            Example:
-                >>> dr = DanaRetriever()
-                >>> dr.saveto("/path/to/directory")
-        '''
-        
-        params = self._params
-        outdir = OUTDIR
-        file_name = FILE_NAME
-        end_point = self.end_point
-        verbose = self.verbose_flag
-        
+    def _get_end_point(self):
         if self.sub_endpoint != '':
-            end_point = '/'.join([self.BASE_ENDPOINT, self.sub_endpoint])
-        
-        ma = mindat_api.MindatApi()
-
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # Reset the query parameters in case the user wants to make another query.
-        self._init_params()
+            return '/'.join([self.BASE_ENDPOINT, self.sub_endpoint])
+        return self.end_point
     
     def save(self, FILE_NAME = ''):
         '''
@@ -229,18 +208,48 @@ class DanaRetriever:
         '''
        
         params = self._params       
-        end_point = self.end_point 
+        end_point = self._get_end_point()
         verbose = self.verbose_flag
         
-        if self.sub_endpoint != '':
-            end_point = '/'.join([self.BASE_ENDPOINT, self.sub_endpoint])
-        
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
         
         self._init_params()
         return results
     
+    def get_tree(self, CACHE_PATH = DanaTree.DEFAULT_PATH, REFRESH = False):
+        '''
+        Returns the Dana-8 classification as a DanaTree, to look up codes and classify geomaterials without requests.
+        The tree is loaded from CACHE_PATH when it was saved there before; otherwise every level of the
+        classification is downloaded, joined into a tree and saved to CACHE_PATH.
+
+        Args:
+            CACHE_PATH (str): The gzipped json file caching the tree.
+            REFRESH (bool): If True, the classification is downloaded again.
+
+        Returns:
+            DanaTree
+
+        Example:
+            >>> dr = DanaRetriever()
+            >>> tree = dr.get_tree()
+            >>> tree.get_minerals("51.4.3")
+        '''
+        if not REFRESH and Path(CACHE_PATH).exists():
+            self._init_params()
+            return DanaTree.load(CACHE_PATH)
+
+        params, end_point, verbose = self._take_query()
+
+        ma = self._mindat_api()
+        records = {
+            level: list(ma.iter_records(params, '/'.join([self.BASE_ENDPOINT, level]), verbose))
+            for level in DanaTree.LEVELS
+        }
+        tree = DanaTree(records)
+        tree.save(CACHE_PATH)
+        return tree
+
     def available_methods(self):
         '''
         Prints the available methods of the class.
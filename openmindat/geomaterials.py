@@ -1,8 +1,10 @@
 from . import mindat_api
+from .retriever_mixin import RetrieverMixin
+from .local_query import GeomaterialQueryEngine
 from datetime import datetime
 
 
-class GeomaterialRetriever:
+class GeomaterialRetriever(RetrieverMixin):
     """
     This module provides the GeomaterialRetriever class for retrieving geomaterial data from the Mindat API. This class offers various methods to specify query parameters for filtering and retrieving detailed information about geomaterials, such as minerals and rocks.
     For more information visit: https://api.mindat.org/schema/redoc/#tag/geomaterials
@@ -20,8 +22,12 @@ class GeomaterialRetriever:
     """
 
     BASE_ENDPOINT = "v1/geomaterials"
+    _supports_id_range = True
+    _supports_updated_at = True
+    _local_engine = GeomaterialQueryEngine
 
-    def __init__(self) -> None:
+    def __init__(self, SESSION=None) -> None:
+        self._session = SESSION
         self.verbose_flag = 2
         self.end_point = self.BASE_ENDPOINT
         self._params = {}
@@ -1451,35 +1457,6 @@ class GeomaterialRetriever:
 
         return self
 
-    def saveto(self, OUTDIR="", FILE_NAME=""):
-        """
-        Executes the query to retrieve the list of geomaterials and saves the results to a specified directory.
-
-        Args:
-            OUTDIR (str): The directory path where the retrieved geomaterials will be saved. If not provided, the current directory will be used.
-            FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-        Returns:
-            None
-
-        Example:
-            >>> gr = GeomaterialRetriever()
-            >>> gr.density_min(3.25).saveto("/path/to/directory")
-
-        """
-
-        params = self._params
-        end_point = self.end_point
-        outdir = OUTDIR
-        file_name = FILE_NAME
-        verbose = self.verbose_flag
-
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # reset the query parameters in case the user wants to make another query
-        self._init_params()
-
     def save(self, FILE_NAME=""):
         """
         Executes the query to retrieve the list of geomaterials and saves the results to the current directory.
@@ -1513,10 +1490,10 @@ class GeomaterialRetriever:
         """
 
         params = self._params
-        end_point = self.end_point
+        end_point = self._get_end_point()
         verbose = self.verbose_flag
 
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
 
         self._init_params()
@@ -1553,7 +1530,7 @@ class GeomaterialRetriever:
         return object.__getattribute__(self, name)
 
 
-class GeomaterialIdRetriever:
+class GeomaterialIdRetriever(RetrieverMixin):
     """
     This module provides the GeomaterialIdRetriever class for returning geomaterial by id
     For more information visit: https://api.mindat.org/schema/redoc/#tag/geomaterials/operation/geomaterials_retrieve
@@ -1567,8 +1544,11 @@ class GeomaterialIdRetriever:
     """
 
     BASE_ENDPOINT = "v1/geomaterials"
+    _supports_id_lookup = True
+    _supports_id_in = True
 
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = self.BASE_ENDPOINT
         self.sub_endpoint = ""
         self.variety = False
@@ -1688,39 +1668,13 @@ class GeomaterialIdRetriever:
 
         return self
 
-    def saveto(self, OUTDIR="", FILE_NAME=""):
-        """
-        Executes the query to retrieve the Geomaterials with keywords and saves the results to a specified directory.
-
-        Args:
-            OUTDIR (str): The directory path where the retrieved Geomaterials will be saved. If not provided, the current directory will be used.
-            FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-        Returns:
-            None
-
-        Example:
-            >>> gir = GeomaterialIdRetriever()
-            >>> gir.id(5).saveto("/path/to/directory", "geo5")
-        """
-
+    def _get_end_point(self):
         if self.variety:
             sub_endpoint = "/".join([self.sub_endpoint, "varieties"])
         else:
             sub_endpoint = self.sub_endpoint
 
-        end_point = "/".join([self.end_point, sub_endpoint])
-        outdir = OUTDIR
-        file_name = FILE_NAME
-        params = self._params
-        sub_endpoint = self.sub_endpoint
-        verbose = self.verbose_flag
-
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # reset the query parameters in case the user wants to make another query
-        self._init_params()
+        return "/".join([self.end_point, sub_endpoint])
 
     def save(self, FILE_NAME=""):
         """
@@ -1755,9 +1709,9 @@ class GeomaterialIdRetriever:
 
         params = self._params
         verbose = self.verbose_flag
-        end_point = "/".join([self.end_point, self.sub_endpoint])
+        end_point = self._get_end_point()
 
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
 
         self._init_params()
@@ -1795,7 +1749,7 @@ class GeomaterialIdRetriever:
 
 
 # NOT YET WORKING, check in to see if it returns list vs item
-class GeomaterialDictRetriever:
+class GeomaterialDictRetriever(RetrieverMixin):
     """
     This module provides the GeomaterialDictRetriever class for returning geomaterial Dictionaries
     For more information visit: https://api.mindat.org/schema/redoc/#tag/geomaterials/operation/geomaterials_dict_retrieve
@@ -1810,7 +1764,8 @@ class GeomaterialDictRetriever:
 
     BASE_ENDPOINT = "v1/geomaterials/dict"
 
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = self.BASE_ENDPOINT
         self.sub_endpoint = ""
         self.verbose_flag = 2
@@ -1870,34 +1825,6 @@ class GeomaterialDictRetriever:
 
         return self
 
-    def saveto(self, OUTDIR="", FILE_NAME=""):
-        """
-        Executes the query to retrieve the Geomaterials with keywords and saves the results to a specified directory.
-
-        Args:
-            OUTDIR (str): The directory path where the retrieved Geomaterials will be saved. If not provided, the current directory will be used.
-            FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-        Returns:
-            None
-
-        Example:
-            >>> gdr = GeomaterialDictRetriever()
-            >>> gdr.saveto("/path/to/directory", "geoDict")
-        """
-
-        params = self._params
-        end_point = self.end_point
-        outdir = OUTDIR
-        file_name = FILE_NAME
-        verbose = self.verbose_flag
-
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # reset the query parameters in case the user wants to make another query
-        self._init_params()
-
     def save(self, FILE_NAME=""):
         """
         Executes the query to retrieve the list of geomaterials and saves the results to the current directory.
@@ -1930,10 +1857,10 @@ class GeomaterialDictRetriever:
         """
 
         params = self._params
-        end_point = self.end_point
+        end_point = self._get_end_point()
         verbose = self.verbose_flag
 
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
 
         self._init_params()
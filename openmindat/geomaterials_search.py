@@ -1,10 +1,19 @@
 from . import mindat_api
+from .retriever_mixin import RetrieverMixin
+from .local_search import GeomaterialSearchEngine
 
-class GeomaterialSearchRetriever:
+class GeomaterialSearchRetriever(RetrieverMixin):
     """
     A class to facilitate the retrieval of geomaterial data from the Mindat API using search keywords. It enables users to construct queries based on specific keywords and offers functionality to save the retrieved data.
     For more information visit: https://api.mindat.org/schema/redoc/#tag/geomaterials_search
 
+    With LOCAL=True (or local()), searches are answered from the full-text index of a local geomaterials mirror
+    (see GeomaterialSearchEngine), without a request per search.
+
+    Args:
+        SESSION (MindatSession): An optional session; by default the shared session is used.
+        LOCAL (LocalStore or str or bool): The local mirror to search, its path, or True for './mindat_mirror.sqlite'.
+
     Methods:
         geomaterials_search(KEYWORDS): Updates the search query with specified keywords.
         saveto(OUTDIR): Executes the search query and saves the data to a specified directory.
@@ -13,16 +22,21 @@ class GeomaterialSearchRetriever:
     Usage:
         >>> gsr = GeomaterialSearchRetriever()
         >>> gsr.geomaterials_search("quartz, green, hexagonal").save()
+        >>> GeomaterialSearchRetriever(LOCAL=True).geomaterials_search("chalcop").page_size(10).page(1).get_dict()
 
     Press q to quit.
     """
 
     BASE_ENDPOINT = 'v1/geomaterials-search'
+    _local_engine = GeomaterialSearchEngine
     
-    def __init__(self):
+    def __init__(self, SESSION=None, LOCAL=False):
+        self._session = SESSION
         self._params = {}
         self.end_point = self.BASE_ENDPOINT
         self.verbose_flag = 2
+        if LOCAL:
+            self.local(LOCAL)
     
     def _init_params(self):
         self.end_point = self.BASE_ENDPOINT
@@ -96,30 +110,6 @@ class GeomaterialSearchRetriever:
         
         return self
     
-    def saveto(self, OUTDIR = '', FILE_NAME = ''):
-        '''
-            Executes the query to retrieve the geomaterials with keywords and saves the results to a specified directory.
-
-            Args:
-                OUTDIR (str): The directory path where the retrieved geomaterials will be saved. If not provided, the current directory will be used.
-                FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-            Returns:
-                None
-        '''
-        
-        params = self._params
-        end_point = self.end_point
-        outdir = OUTDIR
-        file_name = FILE_NAME
-        verbose = self.verbose_flag
-
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # reset the query parameters in case the user wants to make another query
-        self._init_params()
-
     def save(self, FILE_NAME = ''):
         '''
             Executes the query to retrieve the list of geomaterials and saves the results to the current directory.
@@ -148,10 +138,10 @@ class GeomaterialSearchRetriever:
         '''
        
         params = self._params
-        end_point = self.end_point
+        end_point = self._get_end_point()
         verbose = self.verbose_flag
         
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
         
         self._init_params()
@@ -0,0 +1,282 @@
+import io
+import json
+import os
+from pathlib import Path
+
+
+def _import_numpy():
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        raise ImportError("The georegion index requires numpy. Install it with: pip install openmindat[geo]")
+
+
+class GeoRegionIndex:
+    '''
+    A compiled index of the georegion polygons of locgeoregion2, for assigning coordinates to georegions.
+
+    The GeoJSON features returned by GeoRegionRetriever are compiled into flat numpy arrays of vertices,
+    rings and polygons. assign() places a whole batch of points at once: the points are bucketed on a grid
+    of CELL_SIZE degrees, so each polygon only looks at the points of the cells its bounding box covers,
+    and those are tested with a vectorized even-odd point-in-polygon test against the polygon's edges,
+    in latitude bands so each band only meets the edges crossing it. Where georegions overlap, a point is
+    assigned to the smallest one.
+
+    The compiled arrays are saved to and loaded from a compressed .npz file, much smaller and faster to read
+    than the GeoJSON. Requires the optional numpy dependency (pip install openmindat[geo]).
+
+    Usage:
+        >>> index = GeoRegionRetriever().get_index()
+        >>> index.assign([45.5, 48.85], [-73.6, 2.35])
+        >>> GeoRegionIndex.load("./mindat_data/locgeoregion2.npz")
+    '''
+
+    DEFAULT_PATH = './mindat_data/locgeoregion2.npz'
+    FORMAT_VERSION = 1
+    # The size in degrees of the grid cells used to find the points near each polygon
+    CELL_SIZE = 1.0
+    # The number of points sorted by latitude that are tested against the same edges
+    BAND_SIZE = 1024
+    # The number of (point, edge) pairs tested at once, which bounds the memory of assign()
+    CHUNK_SIZE = 1 << 22
+
+    def __init__(self, REGION_IDS, PROPERTIES, VERTICES, RING_OFFSETS, PART_RINGS, PART_REGIONS):
+        np = self.np = _import_numpy()
+        self.region_ids = list(REGION_IDS)
+        self.properties = list(PROPERTIES)
+        self.vertices = np.asarray(VERTICES, dtype=np.float64).reshape(-1, 2)
+        self.ring_offsets = np.asarray(RING_OFFSETS, dtype=np.int64)
+        self.part_rings = np.asarray(PART_RINGS, dtype=np.int64)
+        self.part_regions = np.asarray(PART_REGIONS, dtype=np.int64)
+        self._positions = {id: position for position, id in enumerate(self.region_ids)}
+        self._compile()
+
+    @classmethod
+    def from_features(cls, FEATURES):
+        '''
+            Compiles an index from GeoJSON features with Polygon or MultiPolygon geometries.
+            Features without such a geometry are skipped; the properties of the others are kept.
+        '''
+        region_ids, properties = [], []
+        vertices, ring_offsets, part_rings, part_regions = [], [0], [0], []
+
+        for feature in FEATURES:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') == 'Polygon':
+                polygons = [geometry.get('coordinates') or []]
+            elif geometry.get('type') == 'MultiPolygon':
+                polygons = geometry.get('coordinates') or []
+            else:
+                continue
+
+            feature_properties = feature.get('properties') or {}
+            region = len(region_ids)
+            region_ids.append(feature.get('id', feature_properties.get('id')))
+            properties.append(feature_properties)
+
+            for polygon in polygons:
+                rings = [ring for ring in polygon if len(ring) >= 3]
+                if not rings:
+                    continue
+                for ring in rings:
+                    points = [(float(point[0]), float(point[1])) for point in ring]
+                    if points[0] != points[-1]:
+                        points.append(points[0])
+                    vertices.extend(points)
+                    ring_offsets.append(len(vertices))
+                part_rings.append(len(ring_offsets) - 1)
+                part_regions.append(region)
+
+        return cls(region_ids, properties, vertices, ring_offsets, part_rings, part_regions)
+
+    def _compile(self):
+        '''
+            Derives the edges, bounding boxes and areas of the polygons from the vertex and ring arrays.
+        '''
+        np = self.np
+        vertices, ring_offsets = self.vertices, self.ring_offsets
+
+        # Edge i joins vertex i to vertex i + 1, except at the last vertex of each ring
+        ring_ends = ring_offsets[1:] - 1
+        edges = np.ones(max(len(vertices) - 1, 0), dtype=bool)
+        edges[ring_ends[ring_ends < len(edges)]] = False
+        starts = np.flatnonzero(edges)
+        self._x1, self._y1 = vertices[starts, 0], vertices[starts, 1]
+        self._x2, self._y2 = vertices[starts + 1, 0], vertices[starts + 1, 1]
+        self._y_min, self._y_max = np.minimum(self._y1, self._y2), np.maximum(self._y1, self._y2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slopes = (self._x2 - self._x1) / (self._y2 - self._y1)
+        # Horizontal edges are never crossed by the horizontal ray, so their slope is not used
+        self._slopes = np.where(np.isfinite(slopes), slopes, 0.0)
+        # The first edge of each part: the number of edges before the first vertex of its first ring
+        self._part_edges = np.searchsorted(starts, ring_offsets[self.part_rings], 'left')
+
+        parts = len(self.part_regions)
+        self._bounds = np.zeros((parts, 4))
+        region_areas = np.zeros(len(self.region_ids))
+        for part in range(parts):
+            first_ring, last_ring = self.part_rings[part], self.part_rings[part + 1]
+            outer = vertices[ring_offsets[first_ring]:ring_offsets[first_ring + 1]]
+            self._bounds[part] = (outer[:, 0].min(), outer[:, 1].min(), outer[:, 0].max(), outer[:, 1].max())
+            area = 0.0
+            for ring in range(first_ring, last_ring):
+                points = vertices[ring_offsets[ring]:ring_offsets[ring + 1]]
+                ring_area = abs(np.dot(points[:-1, 0], points[1:, 1]) - np.dot(points[1:, 0], points[:-1, 1])) / 2
+                area += ring_area if ring == first_ring else -ring_area
+            region_areas[self.part_regions[part]] += area
+        self._region_areas = region_areas
+
+    def __len__(self):
+        return len(self.region_ids)
+
+    def get_properties(self, REGION_ID):
+        '''
+            Returns the properties of a georegion, or None if the index does not hold it.
+        '''
+        position = self._positions.get(REGION_ID)
+        return None if position is None else self.properties[position]
+
+    def _contains(self, PART, X, Y):
+        '''
+            Returns a boolean array telling which of the points (X, Y) are inside a polygon, holes excluded.
+        '''
+        np = self.np
+        inside = np.zeros(len(X), dtype=bool)
+        first_edge, last_edge = self._part_edges[PART], self._part_edges[PART + 1]
+        if not len(X) or last_edge <= first_edge:
+            return inside
+
+        edges = slice(first_edge, last_edge)
+        x1, y1, slopes = self._x1[edges], self._y1[edges], self._slopes[edges]
+        y_min, y_max = self._y_min[edges], self._y_max[edges]
+
+        # Points sorted by latitude, tested in bands against the edges spanning the latitudes of the band
+        order = np.argsort(Y, kind='stable')
+        for start in range(0, len(order), self.BAND_SIZE):
+            band = order[start:start + self.BAND_SIZE]
+            band_y = Y[band]
+            crossing = np.flatnonzero((y_min <= band_y[-1]) & (y_max > band_y[0]))
+            if not len(crossing):
+                continue
+            band_x1, band_y1, band_slopes = x1[crossing], y1[crossing], slopes[crossing]
+            band_y_min, band_y_max = y_min[crossing], y_max[crossing]
+            step = max(1, self.CHUNK_SIZE // len(crossing))
+            for chunk_start in range(0, len(band), step):
+                points = band[chunk_start:chunk_start + step]
+                px, py = X[points][:, None], Y[points][:, None]
+                crosses = (band_y_min <= py) & (band_y_max > py) & (px < band_x1 + (py - band_y1) * band_slopes)
+                inside[points] = (np.count_nonzero(crosses, axis=1) & 1).astype(bool)
+        return inside
+
+    def _iter_hits(self, LATITUDES, LONGITUDES):
+        '''
+            Yields (points, region) for each polygon: the positions of the points inside it and its region.
+        '''
+        np = self.np
+        x, y = LONGITUDES, LATITUDES
+        columns = int(np.ceil(360 / self.CELL_SIZE)) + 1
+        rows = int(np.ceil(180 / self.CELL_SIZE)) + 1
+        valid = np.isfinite(x) & np.isfinite(y)
+        cells = np.full(len(x), -1, dtype=np.int64)
+        cells[valid] = (
+            np.clip(((y[valid] + 90) // self.CELL_SIZE).astype(np.int64), 0, rows - 1) * columns
+            + np.clip(((x[valid] + 180) // self.CELL_SIZE).astype(np.int64), 0, columns - 1)
+        )
+        order = np.argsort(cells, kind='stable')
+        sorted_cells = cells[order]
+
+        for part, (min_x, min_y, max_x, max_y) in enumerate(self._bounds):
+            first_row = max(int((min_y + 90) // self.CELL_SIZE), 0)
+            last_row = min(int((max_y + 90) // self.CELL_SIZE), rows - 1)
+            first_column = max(int((min_x + 180) // self.CELL_SIZE), 0)
+            last_column = min(int((max_x + 180) // self.CELL_SIZE), columns - 1)
+            if last_row < first_row or last_column < first_column:
+                continue
+
+            # The cells of the bounding box are one contiguous run of cell numbers per row
+            row_cells = np.arange(first_row, last_row + 1, dtype=np.int64) * columns
+            lows = np.searchsorted(sorted_cells, row_cells + first_column, 'left')
+            highs = np.searchsorted(sorted_cells, row_cells + last_column, 'right')
+            runs = [order[low:high] for low, high in zip(lows, highs) if high > low]
+            if not runs:
+                continue
+            candidates = np.concatenate(runs)
+            candidates = candidates[(x[candidates] >= min_x) & (x[candidates] <= max_x) & (y[candidates] >= min_y) & (y[candidates] <= max_y)]
+
+            points = candidates[self._contains(part, x[candidates], y[candidates])]
+            if len(points):
+                yield points, self.part_regions[part]
+
+    def assign(self, LATITUDES, LONGITUDES, ALL = False):
+        '''
+            Assigns a batch of points to the georegions containing them.
+
+            Args:
+                LATITUDES (sequence of float): The latitudes of the points, as a list or numpy array.
+                LONGITUDES (sequence of float): The longitudes of the points.
+                ALL (bool): If True, returns every georegion containing each point instead of the smallest one.
+
+            Returns:
+                list: For each point, the id of the smallest georegion containing it, or None.
+                    With ALL=True, the list of the ids of every georegion containing it.
+
+            Example:
+                >>> index = GeoRegionRetriever().get_index()
+                >>> index.assign([45.5, 48.85], [-73.6, 2.35])
+        '''
+        np = self.np
+        latitudes = np.asarray(LATITUDES, dtype=np.float64).ravel()
+        longitudes = np.asarray(LONGITUDES, dtype=np.float64).ravel()
+        if latitudes.shape != longitudes.shape:
+            raise ValueError("Invalid input. LATITUDES and LONGITUDES must have the same length.")
+        # Longitudes are wrapped into [-180, 180), so 180 falls in the regions starting at the antimeridian at -180
+        longitudes = (longitudes + 180) % 360 - 180
+
+        if ALL:
+            regions = [[] for point in range(len(latitudes))]
+            for points, region in self._iter_hits(latitudes, longitudes):
+                region_id = self.region_ids[region]
+                for point in points.tolist():
+                    if region_id not in regions[point]:
+                        regions[point].append(region_id)
+            return regions
+
+        best = np.full(len(latitudes), -1, dtype=np.int64)
+        best_areas = np.full(len(latitudes), np.inf)
+        for points, region in self._iter_hits(latitudes, longitudes):
+            smaller = points[self._region_areas[region] < best_areas[points]]
+            best[smaller] = region
+            best_areas[smaller] = self._region_areas[region]
+        return [None if region < 0 else self.region_ids[region] for region in best.tolist()]
+
+    def save(self, PATH = DEFAULT_PATH):
+        '''
+            Saves the compiled index to a compressed .npz file.
+        '''
+        np = self.np
+        path = Path(PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        regions = json.dumps({'version': self.FORMAT_VERSION, 'ids': self.region_ids, 'properties': self.properties}, separators=(',', ':'))
+
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer, vertices=self.vertices, ring_offsets=self.ring_offsets, part_rings=self.part_rings,
+            part_regions=self.part_regions, regions=np.frombuffer(regions.encode('utf-8'), dtype=np.uint8)
+        )
+        temp_path = path.with_name(path.name + '.part')
+        with open(temp_path, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, PATH = DEFAULT_PATH):
+        '''
+            Loads an index saved with save().
+        '''
+        np = _import_numpy()
+        with np.load(PATH, allow_pickle=False) as data:
+            regions = json.loads(data['regions'].tobytes().decode('utf-8'))
+            if regions.get('version') != cls.FORMAT_VERSION:
+                raise ValueError("The georegion index " + str(PATH) + " was saved in another format; build it again.")
+            return cls(regions['ids'], regions['properties'], data['vertices'], data['ring_offsets'], data['part_rings'], data['part_regions'])
@@ -0,0 +1,918 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+
+from .mindat_api import MindatApi
+from .rate_limit import get_default_rate_limiter
+from .retry import RetryPolicy
+from .sync import LocalStore, resolve_store, parse_timestamp, format_timestamp
+
+
+def _to_number(VALUE):
+    '''
+        Returns a measured value as a float, or None when it is missing. Mindat records use 0 for unknown values.
+    '''
+    try:
+        number = float(VALUE)
+    except (TypeError, ValueError):
+        return None
+    return number if number else None
+
+
+def _to_int(VALUE):
+    try:
+        return int(VALUE)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_text(VALUE):
+    '''
+        Returns a text field, or a list of values as '|value|value|' so a single value can be matched with LIKE.
+    '''
+    if VALUE is None or VALUE == '':
+        return None
+    if isinstance(VALUE, (list, tuple)):
+        return '|' + '|'.join(str(item) for item in VALUE) + '|'
+    return str(VALUE)
+
+
+def _to_timestamp(VALUE):
+    '''
+        Returns an updttime / updated_at value as '%Y-%m-%d %H:%M:%S', which sorts and compares as text,
+        or None if it cannot be read. The separators and time zone suffixes of the API values are normalized.
+    '''
+    timestamp = parse_timestamp(VALUE)
+    return format_timestamp(timestamp) if timestamp is not None else None
+
+
+def get_elements(VALUE):
+    '''
+        Returns the element symbols of an elements field, given as a list or as a string such as '-Cu-S-'.
+    '''
+    if not VALUE:
+        return []
+    if isinstance(VALUE, str):
+        return re.findall(r'[A-Z][a-z]?', VALUE)
+    return [str(element).strip() for element in VALUE if str(element).strip()]
+
+
+def _as_list(VALUE):
+    if VALUE is None:
+        return []
+    if isinstance(VALUE, (list, tuple, set)):
+        return list(VALUE)
+    if isinstance(VALUE, str):
+        return [item.strip() for item in VALUE.split(',') if item.strip()]
+    return [VALUE]
+
+
+def _to_pattern(VALUE):
+    '''
+        Converts a name pattern of the API, with * and _ as wildcards, to a LIKE pattern.
+    '''
+    escaped = str(VALUE).replace('\\', '\\\\').replace('%', '\\%')
+    return escaped.replace('*', '%')
+
+
+# The positions of the set bits of every byte value
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+
+
+def _to_bitmap(IDS):
+    '''
+        Returns a bitmap (an int with bit i set for every id i) of a list of ids.
+    '''
+    ids = list(IDS)
+    if not ids:
+        return 0
+    data = bytearray(max(ids) // 8 + 1)
+    for id in ids:
+        data[id >> 3] |= 1 << (id & 7)
+    return int.from_bytes(data, 'little')
+
+
+def get_bitmap_ids(BITMAP):
+    '''
+        Returns the ids of the set bits of a bitmap, in ascending order.
+    '''
+    data = BITMAP.to_bytes((BITMAP.bit_length() + 7) // 8, 'little')
+    ids = []
+    for offset, byte in enumerate(data):
+        if byte:
+            base = offset << 3
+            ids.extend(base + bit for bit in _BYTE_BITS[byte])
+    return ids
+
+
+class ElementIndex:
+    '''
+    An inverted index from chemical elements to the ids of the geomaterials (or localities) that contain them.
+
+    Each element has a bitmap of geomaterial ids, and a second one of the geomaterials where it is an essential
+    element (for el_essential). el_inc / el_exc lists are evaluated with set algebra on the bitmaps: the
+    intersection of the included elements minus the union of the excluded ones, in microseconds for any
+    combination. The bitmaps are built from the element table of a GeomaterialQueryEngine and saved
+    zlib-compressed in the store, so they are loaded, not rebuilt, until the mirror changes.
+
+    The engine of a store keeps its index up to date and uses it for el_inc / el_exc; it is also available
+    on its own as GeomaterialQueryEngine(STORE).element_index.
+
+    Usage:
+        >>> index = GeomaterialQueryEngine("/path/to/mindat_mirror.sqlite").element_index
+        >>> index.query("Cu,S", "Fe")
+    '''
+
+    def __init__(self, ENGINE):
+        self.engine = ENGINE
+        self.store = ENGINE.store
+        self.elements_table = ENGINE.ELEMENTS_TABLE
+        self.query_table = ENGINE.QUERY_TABLE
+        self.bitmaps_table = ENGINE.BITMAPS_TABLE
+        self._bitmaps = {}
+        self._all = 0
+        self._version = None
+        self.store.execute(
+            'CREATE TABLE IF NOT EXISTS {} (element TEXT, essential INTEGER, bitmap BLOB, PRIMARY KEY (element, essential))'.format(self.bitmaps_table)
+        )
+
+    def load(self, VERSION):
+        '''
+            Makes the bitmaps match a version of the mirror: reads the saved ones, or builds and saves them
+            when they were saved for another version.
+        '''
+        if VERSION == self._version:
+            return
+        state = self.store.execute('SELECT version FROM query_tables WHERE name = ?', (self.bitmaps_table,))
+        if state and state[0][0] == VERSION:
+            bitmaps = {
+                (element, bool(essential)): int.from_bytes(zlib.decompress(bitmap), 'little')
+                for element, essential, bitmap in self.store.execute('SELECT element, essential, bitmap FROM {}'.format(self.bitmaps_table))
+            }
+        else:
+            bitmaps = self._build(VERSION)
+        self._all = bitmaps.pop(('*', False), 0)
+        self._bitmaps = bitmaps
+        self._version = VERSION
+
+    def _build(self, VERSION):
+        ids = {}
+        for element, id, essential in self.store.execute('SELECT element, id, essential FROM {}'.format(self.elements_table)):
+            ids.setdefault((element, False), []).append(id)
+            if essential:
+                ids.setdefault((element, True), []).append(id)
+        # '*' holds every geomaterial, including those without elements, for exclusion-only queries
+        ids[('*', False)] = [row[0] for row in self.store.execute('SELECT id FROM {}'.format(self.query_table))]
+        bitmaps = {key: _to_bitmap(key_ids) for key, key_ids in ids.items()}
+
+        with self.store.transaction() as connection:
+            connection.execute('DELETE FROM {}'.format(self.bitmaps_table))
+            connection.executemany(
+                'INSERT INTO {} (element, essential, bitmap) VALUES (?, ?, ?)'.format(self.bitmaps_table),
+                ((element, int(essential), zlib.compress(bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')))
+                 for (element, essential), bitmap in bitmaps.items())
+            )
+            connection.execute('INSERT OR REPLACE INTO query_tables (name, indexed_until, version) VALUES (?, NULL, ?)', (self.bitmaps_table, VERSION))
+        return bitmaps
+
+    def get_bitmap(self, ELEMENT, ESSENTIAL = False):
+        '''
+            Returns the bitmap of the geomaterials containing an element, or of those where it is essential.
+        '''
+        return self._bitmaps.get((str(ELEMENT).strip(), bool(ESSENTIAL)), 0)
+
+    def match(self, EL_INC = None, EL_EXC = None, ESSENTIAL = False):
+        '''
+            Returns the bitmap of the geomaterials containing all the elements of EL_INC and none of EL_EXC,
+            or None when both are empty. The bitmaps are used as last loaded by the engine's refresh().
+        '''
+        included, excluded = _as_list(EL_INC), _as_list(EL_EXC)
+        if not included and not excluded:
+            return None
+        bitmap = self._all
+        for element in included:
+            bitmap &= self.get_bitmap(element, ESSENTIAL)
+        for element in excluded:
+            bitmap &= ~self.get_bitmap(element, ESSENTIAL)
+        return bitmap
+
+    def query(self, EL_INC = None, EL_EXC = None, ESSENTIAL = False):
+        '''
+            Returns the ids of the geomaterials containing all the elements of EL_INC and none of EL_EXC, in id order.
+
+            Args:
+                EL_INC (str or list): The elements to include, as a list or comma-separated like el_inc().
+                EL_EXC (str or list): The elements to exclude.
+                ESSENTIAL (bool): Only consider the essential elements of each geomaterial, like el_essential().
+        '''
+        self.engine.refresh()
+        bitmap = self.match(EL_INC, EL_EXC, ESSENTIAL)
+        return get_bitmap_ids(self._all if bitmap is None else bitmap)
+
+    def count(self, EL_INC = None, EL_EXC = None, ESSENTIAL = False):
+        '''
+            Returns the number of geomaterials containing all the elements of EL_INC and none of EL_EXC.
+        '''
+        self.engine.refresh()
+        bitmap = self.match(EL_INC, EL_EXC, ESSENTIAL)
+        return bin(self._all if bitmap is None else bitmap).count('1')
+
+
+# The mean radius of the Earth, in km
+EARTH_RADIUS = 6371.0088
+
+
+def get_distance(LATITUDE1, LONGITUDE1, LATITUDE2, LONGITUDE2):
+    '''
+        Returns the great-circle distance in km between two points given in degrees, or None if one is missing.
+    '''
+    if None in (LATITUDE1, LONGITUDE1, LATITUDE2, LONGITUDE2):
+        return None
+    latitude1, latitude2 = math.radians(LATITUDE1), math.radians(LATITUDE2)
+    a = (math.sin((latitude2 - latitude1) / 2) ** 2
+         + math.cos(latitude1) * math.cos(latitude2) * math.sin(math.radians(LONGITUDE2 - LONGITUDE1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def get_radius_boxes(LATITUDE, LONGITUDE, RADIUS):
+    '''
+        Returns the (min latitude, min longitude, max latitude, max longitude) boxes covering the circle of
+        RADIUS km around a point. A circle crossing the antimeridian is covered by two boxes.
+    '''
+    delta = math.degrees(RADIUS / EARTH_RADIUS)
+    min_latitude, max_latitude = LATITUDE - delta, LATITUDE + delta
+    if min_latitude <= -90 or max_latitude >= 90:
+        # The circle contains a pole, so it spans every longitude
+        return [(max(min_latitude, -90), -180, min(max_latitude, 90), 180)]
+
+    delta_longitude = math.degrees(math.asin(min(1.0, math.sin(RADIUS / EARTH_RADIUS) / math.cos(math.radians(LATITUDE)))))
+    if delta_longitude >= 180:
+        return [(min_latitude, -180, max_latitude, 180)]
+    min_longitude, max_longitude = LONGITUDE - delta_longitude, LONGITUDE + delta_longitude
+    if min_longitude < -180:
+        return [(min_latitude, min_longitude + 360, max_latitude, 180), (min_latitude, -180, max_latitude, max_longitude)]
+    if max_longitude > 180:
+        return [(min_latitude, min_longitude, max_latitude, 180), (min_latitude, -180, max_latitude, max_longitude - 360)]
+    return [(min_latitude, min_longitude, max_latitude, max_longitude)]
+
+
+class LocalQueryEngine:
+    '''
+    Evaluates retriever queries against the records of an endpoint mirrored in a LocalStore.
+
+    The engine keeps a query table next to the records of the store (see LocalStore and the retrievers'
+    sync()), with one row of typed, indexed columns per record, and a table of the elements of each record
+    that feeds its ElementIndex. The parameter dict a retriever sends to the API is turned into one SQL query,
+    so a chained query runs locally in milliseconds. The tables are refreshed from the records stored since
+    they were last built whenever the store has changed.
+
+    Subclasses give the endpoint, the columns of the query table and the filters of their retriever
+    (see GeomaterialQueryEngine and LocalitiesQueryEngine).
+    '''
+
+    END_POINT = None
+    # The endpoint of the retriever whose queries the engine answers, if it is not END_POINT
+    QUERY_END_POINT = None
+    QUERY_TABLE = None
+    ELEMENTS_TABLE = None
+    BITMAPS_TABLE = None
+    # The record fields holding the elements, and the essential elements (None if the records have none)
+    ELEMENTS_FIELD = 'elements'
+    ESSENTIAL_ELEMENTS_FIELD = None
+    # The parameters including, excluding elements, and restricting them to the essential ones (or None)
+    ELEMENT_PARAMS = ('el_inc', 'el_exc', None)
+
+    # Columns of the query table: (column, SQLite type, function reading it from a record)
+    COLUMNS = ()
+    INDEXED_COLUMNS = ()
+
+    # Parameters that do not filter the records
+    SHAPE_PARAMS = ('format', 'page', 'page-size', 'fields', 'omit', 'expand', 'ordering')
+    ORDERING_COLUMNS = ('id',)
+
+    def __init__(self, STORE = None):
+        self.store = resolve_store(STORE)
+        self._lock = threading.Lock()
+        self._version = None
+        self._create_tables()
+        self.element_index = ElementIndex(self) if self.ELEMENTS_TABLE else None
+
+    def _create_tables(self):
+        columns = ', '.join('{} {}'.format(name, sql_type) for name, sql_type, reader in self.COLUMNS)
+        records_table = self.store.ensure_table(self.END_POINT)
+        with self.store.transaction() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS {} (id INTEGER PRIMARY KEY, {})'.format(self.QUERY_TABLE, columns))
+            for column in self.INDEXED_COLUMNS:
+                connection.execute('CREATE INDEX IF NOT EXISTS {0}_{1} ON {0} ({1})'.format(self.QUERY_TABLE, column))
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS {} (element TEXT, id INTEGER, essential INTEGER, PRIMARY KEY (element, id)) WITHOUT ROWID'.format(self.ELEMENTS_TABLE)
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS {0}_id ON {0} (id)'.format(self.ELEMENTS_TABLE))
+            connection.execute('CREATE TABLE IF NOT EXISTS query_tables (name TEXT PRIMARY KEY, indexed_until REAL, version INTEGER)')
+        self._records_table = records_table
+
+    def _get_index_tables(self):
+        '''
+            Returns the tables built from the records, with one or more rows per record id.
+        '''
+        return [self.QUERY_TABLE, self.ELEMENTS_TABLE]
+
+    def _get_index_rows(self, RECORD):
+        '''
+            Returns the rows of a record in the tables built from the records, as a dict of lists of rows by table.
+        '''
+        row = tuple([RECORD['id']] + [reader(RECORD) for name, sql_type, reader in self.COLUMNS])
+        essential = set(get_elements(RECORD.get(self.ESSENTIAL_ELEMENTS_FIELD))) if self.ESSENTIAL_ELEMENTS_FIELD else set()
+        elements = set(get_elements(RECORD.get(self.ELEMENTS_FIELD))) | essential
+        return {
+            self.QUERY_TABLE: [row],
+            self.ELEMENTS_TABLE: [(element, RECORD['id'], int(element in essential)) for element in elements],
+        }
+
+    def _write_index_rows(self, CONNECTION, IDS, RECORDS, REPLACE = True):
+        '''
+            Writes the rows of a batch of records to the tables built from the records,
+            replacing the rows of the same ids unless the tables were just emptied.
+        '''
+        tables = {table: [] for table in self._get_index_tables()}
+        for record in RECORDS:
+            for table, rows in self._get_index_rows(record).items():
+                tables[table].extend(rows)
+
+        for table, rows in tables.items():
+            if REPLACE:
+                CONNECTION.executemany('DELETE FROM {} WHERE id = ?'.format(table), [(id,) for id in IDS])
+            if rows:
+                placeholders = ', '.join('?' for value in rows[0])
+                CONNECTION.executemany('INSERT INTO {} VALUES ({})'.format(table, placeholders), rows)
+
+    def refresh(self, FULL = False):
+        '''
+            Brings the query tables up to date with the records of the store: indexes the records stored since
+            the last refresh and drops the rows of deleted records. With FULL=True, every record is indexed again.
+            Returns the number of records indexed.
+        '''
+        with self._lock:
+            version = self.store.get_version(self.END_POINT)
+            if not FULL and version == self._version:
+                return 0
+
+            state = self.store.execute('SELECT indexed_until, version FROM query_tables WHERE name = ?', (self.QUERY_TABLE,))
+            indexed_until = None if FULL or not state else state[0][0]
+            if not FULL and state and state[0][1] == version:
+                self._load(version)
+                self._version = version
+                return 0
+
+            select = 'SELECT id, record, stored_at FROM "{}" WHERE id > ? AND stored_at >= ? ORDER BY id LIMIT 1000'.format(self._records_table)
+            since = indexed_until if indexed_until is not None else 0
+            indexed = 0
+
+            with self.store.transaction() as connection:
+                if indexed_until is None:
+                    for table in self._get_index_tables():
+                        connection.execute('DELETE FROM {}'.format(table))
+
+                # Read the records in batches, so a full build does not hold the whole table in memory
+                replace = indexed_until is not None
+                last_id = -1
+                rows = connection.execute(select, (last_id, since)).fetchall()
+                while rows:
+                    self._write_index_rows(connection, [row[0] for row in rows], [json.loads(row[1]) for row in rows], replace)
+                    stored_at = max(row[2] for row in rows)
+                    indexed_until = stored_at if indexed_until is None else max(indexed_until, stored_at)
+                    indexed += len(rows)
+                    last_id = rows[-1][0]
+                    rows = connection.execute(select, (last_id, since)).fetchall()
+
+                # Rows of records deleted from the store
+                for table in self._get_index_tables():
+                    connection.execute('DELETE FROM {} WHERE id NOT IN (SELECT id FROM "{}")'.format(table, self._records_table))
+                connection.execute(
+                    'INSERT OR REPLACE INTO query_tables (name, indexed_until, version) VALUES (?, ?, ?)',
+                    (self.QUERY_TABLE, indexed_until, version)
+                )
+
+            self._load(version)
+            self._version = version
+            return indexed
+
+    def _load(self, VERSION):
+        '''
+            Brings the in-memory indexes up to date with a version of the mirror.
+        '''
+        if self.element_index is not None:
+            self.element_index.load(VERSION)
+
+    def _add_filter(self, KEY, VALUE, add, add_any):
+        '''
+            Adds the SQL condition of a filter of the retriever with add(CLAUSE, *ARGS) or add_any(COLUMN, VALUES, EXACT).
+            Returns False if the filter is not known.
+        '''
+        return False
+
+    def _get_clauses(self, PARAM_DICT):
+        '''
+            Translates the filters of a parameter dict into SQL conditions and arguments.
+            The element filters are left to the element index.
+        '''
+        clauses, args = [], []
+
+        def add(CLAUSE, *ARGS):
+            clauses.append(CLAUSE)
+            args.extend(ARGS)
+
+        def add_any(COLUMN, VALUES, EXACT = True):
+            values = _as_list(VALUES)
+            if not values:
+                return
+            if EXACT:
+                add('{} IN ({})'.format(COLUMN, ', '.join('?' for value in values)), *values)
+            else:
+                add('(' + ' OR '.join("{} LIKE ? ESCAPE '\\'".format(COLUMN) for value in values) + ')',
+                    *['%' + _to_pattern(value) + '%' for value in values])
+
+        for key, value in PARAM_DICT.items():
+            if value is None or key in self.SHAPE_PARAMS or key in self.ELEMENT_PARAMS:
+                continue
+            if key == 'id_in':
+                add_any('g.id', [int(id) for id in _as_list(value)])
+            elif key == 'id_min':
+                add('g.id >= ?', int(value))
+            elif key == 'id_max':
+                add('g.id <= ?', int(value))
+            elif key == 'updated_at':
+                timestamp = _to_timestamp(str(value))
+                if timestamp is None:
+                    raise ValueError("Invalid input. updated_at must be a date or a date and time, e.g. 2024-01-02 10:00:00.")
+                add('updttime >= ?', timestamp)
+            elif not self._add_filter(key, value, add, add_any):
+                raise ValueError("Invalid input. The parameter " + key + " cannot be evaluated on the local mirror.")
+
+        return clauses, args
+
+    def _get_order(self, PARAM_DICT):
+        ordering = PARAM_DICT.get('ordering') or 'id'
+        column = ordering.lstrip('-')
+        if column not in self.ORDERING_COLUMNS:
+            raise ValueError("Invalid input. The ordering " + ordering + " cannot be evaluated on the local mirror.")
+        if column == 'id':
+            return 'g.id DESC' if ordering.startswith('-') else 'g.id'
+        return column + (' DESC' if ordering.startswith('-') else '') + ', g.id'
+
+    def _get_element_bitmap(self, PARAM_DICT):
+        included, excluded, essential = self.ELEMENT_PARAMS
+        return self.element_index.match(PARAM_DICT.get(included), PARAM_DICT.get(excluded), bool(essential and PARAM_DICT.get(essential)))
+
+    def _select_ids(self, PARAM_DICT, ORDER, ORDER_ARGS = (), CLAUSES = (), ARGS = (), LIMIT = None):
+        '''
+            Returns the ids of the records matching a parameter dict and the extra CLAUSES, sorted by ORDER.
+            The page of the parameter dict is returned, or the first LIMIT ids if LIMIT is given.
+        '''
+        clauses, args = self._get_clauses(PARAM_DICT)
+        clauses, args = clauses + list(CLAUSES), args + list(ARGS)
+        elements = self._get_element_bitmap(PARAM_DICT)
+        if LIMIT is not None:
+            limit, offset = LIMIT, 0
+        elif 'page' in PARAM_DICT:
+            limit = int(PARAM_DICT.get('page-size') or 1500)
+            offset = (int(PARAM_DICT['page']) - 1) * limit
+        else:
+            limit, offset = None, 0
+
+        if elements is not None and not clauses and ORDER == 'g.id':
+            # A chemistry-only query is answered by the element index alone, already in id order
+            ids = get_bitmap_ids(elements)
+        else:
+            sql = 'SELECT g.id FROM {} g'.format(self.QUERY_TABLE)
+            if clauses:
+                sql += ' WHERE ' + ' AND '.join(clauses)
+            sql += ' ORDER BY ' + ORDER
+            args = args + list(ORDER_ARGS)
+            if elements is None:
+                if limit is not None:
+                    sql += ' LIMIT ? OFFSET ?'
+                    args = args + [limit, offset]
+                return [row[0] for row in self.store.execute(sql, args)]
+            # Test the candidates against the bytes of the bitmap, which is cheaper than listing its ids
+            members = elements.to_bytes((elements.bit_length() + 7) // 8, 'little')
+            size = len(members)
+            ids = [id for id, in self.store.execute(sql, args) if id >> 3 < size and members[id >> 3] >> (id & 7) & 1]
+
+        return ids[offset:] if limit is None else ids[offset:offset + limit]
+
+    def query_ids(self, PARAM_DICT):
+        '''
+            Returns the ids of the records matching a parameter dict, in the order of the query.
+        '''
+        self.refresh()
+        return self._select_ids(PARAM_DICT, self._get_order(PARAM_DICT))
+
+    def _project(self, RECORD, PARAM_DICT):
+        '''
+            Applies the fields / omit parameters to a record.
+        '''
+        fields = [field for field in _as_list(PARAM_DICT.get('fields')) if field not in ('*', '~all')]
+        omit = _as_list(PARAM_DICT.get('omit'))
+        if fields and not any(field in ('*', '~all') for field in _as_list(PARAM_DICT.get('fields'))):
+            RECORD = {key: value for key, value in RECORD.items() if key in fields}
+        if omit:
+            RECORD = {key: value for key, value in RECORD.items() if key not in omit}
+        return RECORD
+
+    def iter_records(self, PARAM_DICT, BATCH_SIZE = 1000):
+        '''
+            Yields the records matching a parameter dict, reading them from the store in batches.
+        '''
+        ids = self.query_ids(PARAM_DICT)
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            rows = self.store.execute(
+                'SELECT id, record FROM "{}" WHERE id IN ({})'.format(self._records_table, ', '.join('?' for id in batch)), batch
+            )
+            records = dict(rows)
+            for id in batch:
+                if id in records:
+                    yield self._project(json.loads(records[id]), PARAM_DICT)
+
+    def query(self, PARAM_DICT):
+        '''
+            Returns the records matching a parameter dict as a list.
+        '''
+        return list(self.iter_records(PARAM_DICT))
+
+    def count(self, PARAM_DICT):
+        '''
+            Returns the number of records matching a parameter dict.
+        '''
+        params = {key: value for key, value in PARAM_DICT.items() if key not in ('page', 'page-size')}
+        return len(self.query_ids(dict(params, ordering='id')))
+
+
+class GeomaterialQueryEngine(LocalQueryEngine):
+    '''
+    Evaluates GeomaterialRetriever queries against a local mirror of v1/geomaterials.
+
+    Range filters follow the API: density_min / density_max compare with dmeas2 / dmeas, hardness and
+    refractive index ranges match geomaterials whose range overlaps the requested one. Multiple choice filters
+    match any of their values, except diapheny which matches all of them. el_inc matches geomaterials with all
+    the given elements, el_exc those with none of them; with el_essential, the significant elements (sigelements)
+    are used. Element filters are evaluated on the bitmaps of the element index (see ElementIndex) and
+    combined with the other filters. Parameters that cannot be evaluated locally raise a ValueError.
+
+    Args:
+        STORE (LocalStore or str): The store holding the geomaterials, or the path of its SQLite file.
+
+    Usage:
+        >>> store = LocalStore("/path/to/mindat_mirror.sqlite")
+        >>> GeomaterialRetriever().sync(store)
+        >>> engine = GeomaterialQueryEngine(store)
+        >>> minerals = engine.query({"density_min": 3.25, "crystal_system": ["Hexagonal"], "el_inc": "Cu"})
+    '''
+
+    END_POINT = 'v1/geomaterials'
+    QUERY_TABLE = 'geomaterials_query'
+    ELEMENTS_TABLE = 'geomaterials_elements'
+    BITMAPS_TABLE = 'geomaterials_element_bitmaps'
+    ESSENTIAL_ELEMENTS_FIELD = 'sigelements'
+    ELEMENT_PARAMS = ('el_inc', 'el_exc', 'el_essential')
+
+    COLUMNS = (
+        ('name', 'TEXT COLLATE NOCASE', lambda record: record.get('name')),
+        ('entrytype', 'INTEGER', lambda record: _to_int(record.get('entrytype'))),
+        ('csystem', 'TEXT', lambda record: record.get('csystem') or None),
+        ('dmeas', 'REAL', lambda record: _to_number(record.get('dmeas'))),
+        ('dmeas2', 'REAL', lambda record: _to_number(record.get('dmeas2')) or _to_number(record.get('dmeas'))),
+        ('hmin', 'REAL', lambda record: _to_number(record.get('hmin'))),
+        ('hmax', 'REAL', lambda record: _to_number(record.get('hmax')) or _to_number(record.get('hmin'))),
+        ('rimin', 'REAL', lambda record: _to_number(record.get('rimin'))),
+        ('rimax', 'REAL', lambda record: _to_number(record.get('rimax')) or _to_number(record.get('rimin'))),
+        ('birefringence', 'REAL', lambda record: _to_number(record.get('opticalbirefringence'))),
+        ('optical2v', 'REAL', lambda record: _to_number(record.get('optical2vmeasured')) or _to_number(record.get('optical2vcalc'))),
+        ('opticalsign', 'TEXT', lambda record: record.get('opticalsign') or None),
+        ('opticaltype', 'TEXT', lambda record: record.get('opticaltype') or None),
+        ('streak', 'TEXT', lambda record: _to_text(record.get('streak'))),
+        ('colour', 'TEXT', lambda record: _to_text(record.get('colour'))),
+        ('lustretype', 'TEXT', lambda record: _to_text(record.get('lustretype'))),
+        ('cleavagetype', 'TEXT', lambda record: _to_text(record.get('cleavagetype'))),
+        ('fracturetype', 'TEXT', lambda record: _to_text(record.get('fracturetype'))),
+        ('diapheny', 'TEXT', lambda record: _to_text(record.get('diapheny'))),
+        ('tenacity', 'TEXT', lambda record: _to_text(record.get('tenacity'))),
+        ('ima_status', 'TEXT', lambda record: _to_text(record.get('ima_status'))),
+        ('ima_notes', 'TEXT', lambda record: _to_text(record.get('ima_notes'))),
+        ('groupid', 'INTEGER', lambda record: _to_int(record.get('groupid'))),
+        ('varietyof', 'INTEGER', lambda record: _to_int(record.get('varietyof'))),
+        ('synid', 'INTEGER', lambda record: _to_int(record.get('synid'))),
+        ('polytypeof', 'INTEGER', lambda record: _to_int(record.get('polytypeof'))),
+        ('meteoritical_code', 'TEXT', lambda record: record.get('meteoritical_code') or None),
+        ('approval_year', 'INTEGER', lambda record: _to_int(record.get('approval_year'))),
+        ('weighting', 'REAL', lambda record: _to_number(record.get('weighting'))),
+        ('updttime', 'TEXT', lambda record: _to_timestamp(record.get('updttime'))),
+    )
+    INDEXED_COLUMNS = ('name', 'entrytype', 'csystem', 'dmeas', 'dmeas2', 'hmin', 'hmax', 'rimin', 'rimax',
+                       'birefringence', 'optical2v', 'groupid', 'varietyof', 'synid', 'polytypeof', 'updttime')
+    ORDERING_COLUMNS = ('id', 'name', 'updttime', 'approval_year', 'weighting')
+
+    def _add_filter(self, KEY, VALUE, add, add_any):
+        if KEY == 'density_min':
+            add('dmeas2 >= ?', float(VALUE))
+        elif KEY == 'density_max':
+            add('dmeas <= ?', float(VALUE))
+        elif KEY == 'hardness_min':
+            add('hmax >= ?', float(VALUE))
+        elif KEY == 'hardness_max':
+            add('hmin <= ?', float(VALUE))
+        elif KEY == 'ri_min':
+            add('rimax >= ?', float(VALUE))
+        elif KEY == 'ri_max':
+            add('rimin <= ?', float(VALUE))
+        elif KEY == 'bi_min':
+            add('birefringence >= ?', float(VALUE))
+        elif KEY == 'bi_max':
+            add('birefringence <= ?', float(VALUE))
+        elif KEY == 'optical2v_min':
+            add('optical2v >= ?', float(VALUE))
+        elif KEY == 'optical2v_max':
+            add('optical2v <= ?', float(VALUE))
+        elif KEY == 'crystal_system':
+            add_any('csystem', VALUE)
+        elif KEY == 'entrytype':
+            add_any('entrytype', [int(item) for item in _as_list(VALUE)])
+        elif KEY == 'opticalsign':
+            add('opticalsign = ?', VALUE)
+        elif KEY == 'opticaltype':
+            add_any('opticaltype', VALUE)
+        elif KEY in ('cleavagetype', 'fracturetype', 'lustretype', 'tenacity', 'ima_status', 'ima_notes'):
+            add_any(KEY, VALUE, EXACT=False)
+        elif KEY == 'diapheny':
+            for option in _as_list(VALUE):
+                add("diapheny LIKE ? ESCAPE '\\'", '%' + _to_pattern(option) + '%')
+        elif KEY in ('colour', 'streak'):
+            add("{} LIKE ? ESCAPE '\\'".format(KEY), '%' + _to_pattern(VALUE) + '%')
+        elif KEY in ('groupid', 'varietyof', 'synid', 'polytypeof'):
+            add('{} = ?'.format(KEY), int(VALUE))
+        elif KEY == 'ima':
+            add(("" if VALUE else "NOT ") + "COALESCE(ima_status, '') LIKE '%APPROVED%'")
+        elif KEY == 'name':
+            add("name LIKE ? ESCAPE '\\'", _to_pattern(VALUE))
+        elif KEY == 'q':
+            add("name LIKE ? ESCAPE '\\'", '%' + _to_pattern(VALUE) + '%')
+        elif KEY == 'meteoritical_code':
+            add("meteoritical_code LIKE ? ESCAPE '\\'", _to_pattern(VALUE))
+        elif KEY == 'meteoritical_code_exists':
+            add('meteoritical_code IS NOT NULL' if VALUE else 'meteoritical_code IS NULL')
+        else:
+            return False
+        return True
+
+
+def _to_coordinate(VALUE, LIMIT):
+    number = _to_number(VALUE)
+    return number if number is not None and -LIMIT <= number <= LIMIT else None
+
+
+class LocalitiesQueryEngine(LocalQueryEngine):
+    '''
+    Evaluates LocalitiesRetriever queries against a local mirror of v1/localities, with a spatial index
+    over the coordinates of the localities.
+
+    The coordinates are kept in an SQLite R*Tree (or indexed columns where SQLite is built without it), so
+    spatial filters only look at the localities near the requested area:
+    within_bbox matches the localities inside a latitude / longitude box, within_radius those within a
+    great-circle distance of a point, and nearest returns the k localities closest to a point, nearest first.
+    They combine with the other filters of the retriever: country, description, txt, elements_inc / elements_exc,
+    id_in and updated_at. Localities without coordinates (missing, or 0, 0) never match a spatial filter.
+
+    Args:
+        STORE (LocalStore or str): The store holding the localities, or the path of its SQLite file.
+
+    Usage:
+        >>> store = LocalStore("/path/to/mindat_mirror.sqlite")
+        >>> LocalitiesRetriever().sync(store)
+        >>> engine = LocalitiesQueryEngine(store)
+        >>> localities = engine.within_radius(45.5, -73.6, 50)
+        >>> closest = engine.nearest(45.5, -73.6, 10, {"elements_inc": "Au"})
+    '''
+
+    END_POINT = 'v1/localities'
+    QUERY_TABLE = 'localities_query'
+    ELEMENTS_TABLE = 'localities_elements'
+    BITMAPS_TABLE = 'localities_element_bitmaps'
+    SPATIAL_TABLE = 'localities_spatial'
+    ELEMENT_PARAMS = ('elements_inc', 'elements_exc', None)
+
+    COLUMNS = (
+        ('txt', 'TEXT COLLATE NOCASE', lambda record: record.get('txt')),
+        ('country', 'TEXT COLLATE NOCASE', lambda record: record.get('country') or None),
+        ('description', 'TEXT', lambda record: record.get('description_short') or record.get('description') or None),
+        ('latitude', 'REAL', lambda record: _to_coordinate(record.get('latitude'), 90)),
+        ('longitude', 'REAL', lambda record: _to_coordinate(record.get('longitude'), 180)),
+        ('updttime', 'TEXT', lambda record: _to_timestamp(record.get('updttime'))),
+    )
+    INDEXED_COLUMNS = ('txt', 'country', 'updttime')
+    SHAPE_PARAMS = LocalQueryEngine.SHAPE_PARAMS + ('nearest',)
+    ORDERING_COLUMNS = ('id', 'txt', 'country', 'updttime')
+
+    _located_count = None
+
+    def _create_tables(self):
+        super()._create_tables()
+        try:
+            self.store.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS {} USING rtree(id, min_latitude, max_latitude, min_longitude, max_longitude)'.format(self.SPATIAL_TABLE)
+            )
+        except sqlite3.OperationalError:
+            # SQLite without the R*Tree module: the same queries on indexed columns
+            self.store.execute(
+                'CREATE TABLE IF NOT EXISTS {} (id INTEGER PRIMARY KEY, min_latitude REAL, max_latitude REAL, '
+                'min_longitude REAL, max_longitude REAL)'.format(self.SPATIAL_TABLE)
+            )
+            self.store.execute('CREATE INDEX IF NOT EXISTS {0}_latitude ON {0} (min_latitude)'.format(self.SPATIAL_TABLE))
+        self.store.create_function('mindat_distance', 4, get_distance)
+
+    def _get_index_tables(self):
+        return super()._get_index_tables() + [self.SPATIAL_TABLE]
+
+    def _get_index_rows(self, RECORD):
+        rows = super()._get_index_rows(RECORD)
+        latitude = _to_coordinate(RECORD.get('latitude'), 90)
+        longitude = _to_coordinate(RECORD.get('longitude'), 180)
+        located = latitude is not None and longitude is not None
+        rows[self.SPATIAL_TABLE] = [(RECORD['id'], latitude, latitude, longitude, longitude)] if located else []
+        return rows
+
+    def _get_box_clause(self, BOXES):
+        '''
+            Returns the SQL condition and arguments matching the localities inside any of the
+            (min latitude, min longitude, max latitude, max longitude) boxes.
+        '''
+        clauses, args = [], []
+        for min_latitude, min_longitude, max_latitude, max_longitude in BOXES:
+            # The R*Tree finds the candidates; its coordinates are rounded outwards, so they are checked again
+            clauses.append(
+                '(g.id IN (SELECT id FROM {} WHERE max_latitude >= ? AND min_latitude <= ? AND max_longitude >= ? AND min_longitude <= ?)'
+                ' AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?)'.format(self.SPATIAL_TABLE)
+            )
+            args += [min_latitude, max_latitude, min_longitude, max_longitude] * 2
+        return '(' + ' OR '.join(clauses) + ')', args
+
+    def _get_radius_clause(self, LATITUDE, LONGITUDE, RADIUS):
+        clause, args = self._get_box_clause(get_radius_boxes(LATITUDE, LONGITUDE, RADIUS))
+        return clause + ' AND mindat_distance(latitude, longitude, ?, ?) <= ?', args + [LATITUDE, LONGITUDE, RADIUS]
+
+    def _add_filter(self, KEY, VALUE, add, add_any):
+        if KEY == 'country':
+            add('country = ?', VALUE)
+        elif KEY == 'description':
+            add("description LIKE ? ESCAPE '\\'", '%' + _to_pattern(VALUE) + '%')
+        elif KEY == 'txt':
+            add("txt LIKE ? ESCAPE '\\'", '%' + _to_pattern(VALUE) + '%')
+        elif KEY == 'within_bbox':
+            min_latitude, min_longitude, max_latitude, max_longitude = [float(value) for value in VALUE]
+            if min_longitude <= max_longitude:
+                boxes = [(min_latitude, min_longitude, max_latitude, max_longitude)]
+            else:
+                # A box crossing the antimeridian
+                boxes = [(min_latitude, min_longitude, max_latitude, 180), (min_latitude, -180, max_latitude, max_longitude)]
+            clause, args = self._get_box_clause(boxes)
+            add(clause, *args)
+        elif KEY == 'within_radius':
+            latitude, longitude, radius = [float(value) for value in VALUE]
+            clause, args = self._get_radius_clause(latitude, longitude, radius)
+            add(clause, *args)
+        else:
+            return False
+        return True
+
+    def _get_located_count(self):
+        '''
+            Returns the number of localities with coordinates, counted once per version of the mirror.
+        '''
+        if self._located_count is None or self._located_count[0] != self._version:
+            self._located_count = (self._version, self.store.execute('SELECT COUNT(*) FROM {}'.format(self.SPATIAL_TABLE))[0][0])
+        return self._located_count[1]
+
+    def query_ids(self, PARAM_DICT):
+        '''
+            Returns the ids of the localities matching a parameter dict, in the order of the query,
+            or nearest first for a nearest query.
+        '''
+        if PARAM_DICT.get('nearest') is None:
+            return super().query_ids(PARAM_DICT)
+
+        self.refresh()
+        latitude, longitude, k = PARAM_DICT['nearest']
+        latitude, longitude, k = float(latitude), float(longitude), int(k)
+        order = 'mindat_distance(latitude, longitude, ?, ?), g.id'
+
+        # Search circles of growing radius, starting with the one holding k localities if they were spread evenly;
+        # once a circle holds k matching localities, they are the nearest ones.
+        total = self._get_located_count()
+        radius = math.sqrt(k * 4 * EARTH_RADIUS ** 2 / max(total, 1)) if total else math.pi * EARTH_RADIUS
+        while True:
+            clause, args = self._get_radius_clause(latitude, longitude, radius)
+            ids = self._select_ids(PARAM_DICT, order, (latitude, longitude), [clause], args, LIMIT=k)
+            if len(ids) >= k or radius >= math.pi * EARTH_RADIUS:
+                break
+            radius = min(radius * 4, math.pi * EARTH_RADIUS)
+
+        if 'page' in PARAM_DICT:
+            page_size = int(PARAM_DICT.get('page-size') or 1500)
+            offset = (int(PARAM_DICT['page']) - 1) * page_size
+            ids = ids[offset:offset + page_size]
+        return ids
+
+    def within_bbox(self, MIN_LATITUDE, MIN_LONGITUDE, MAX_LATITUDE, MAX_LONGITUDE, PARAM_DICT = None):
+        '''
+            Returns the localities inside a latitude / longitude box that match the other filters of PARAM_DICT.
+            A box with MIN_LONGITUDE greater than MAX_LONGITUDE crosses the antimeridian.
+        '''
+        return self.query(dict(PARAM_DICT or {}, within_bbox=[MIN_LATITUDE, MIN_LONGITUDE, MAX_LATITUDE, MAX_LONGITUDE]))
+
+    def within_radius(self, LATITUDE, LONGITUDE, RADIUS, PARAM_DICT = None):
+        '''
+            Returns the localities within RADIUS km of a point that match the other filters of PARAM_DICT.
+        '''
+        return self.query(dict(PARAM_DICT or {}, within_radius=[LATITUDE, LONGITUDE, RADIUS]))
+
+    def nearest(self, LATITUDE, LONGITUDE, K = 10, PARAM_DICT = None):
+        '''
+            Returns the K localities nearest to a point that match the other filters of PARAM_DICT, nearest first.
+        '''
+        return self.query(dict(PARAM_DICT or {}, nearest=[LATITUDE, LONGITUDE, K]))
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_query_engine(ENGINE_CLASS, STORE = None):
+    '''
+        Returns the query engine of ENGINE_CLASS for a store, reusing the one already open for the same file.
+    '''
+    if isinstance(STORE, LocalStore):
+        key = (ENGINE_CLASS, str(STORE.path.resolve()), id(STORE))
+    else:
+        key = (ENGINE_CLASS, str(Path(STORE or LocalStore.DEFAULT_PATH).resolve()))
+
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = ENGINE_CLASS(STORE)
+            _engines[key] = engine
+        return engine
+
+
+class LocalMindatApi(MindatApi):
+    '''
+    A MindatApi that answers queries from a local query engine instead of the Mindat API.
+
+    It offers the same query methods (get_mindat_json, iter_pages, iter_records, download_mindat_json,
+    get_arrow_table), so a retriever set to local() runs unchanged. No API key or network access is needed.
+    '''
+
+    def __init__(self, ENGINE, CONCURRENCY = 1):
+        self.engine = ENGINE
+        self.endpoint = ENGINE.END_POINT
+        self.concurrency = 1
+        self.set_concurrency(CONCURRENCY)
+        self.shard_size = None
+        self.cache = None
+        self.single_flight = None
+        self.retry_policy = RetryPolicy()
+        self.rate_limiter = get_default_rate_limiter()
+        self.MINDAT_API_URL = "https://api.mindat.org"
+        self.params = {'format': 'json'}
+        self.data_dir = './mindat_data/'
+
+    def _request(self, URL, PARAMS = None):
+        raise ValueError("Local queries do not send requests to the Mindat API.")
+
+    def iter_pages(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        '''
+            Yields the records matching the query in pages of page-size records.
+        '''
+        end_point = self.engine.QUERY_END_POINT or self.engine.END_POINT
+        if str(END_POINT).strip('/') != end_point:
+            raise ValueError("Invalid input. The local mirror only answers queries of " + end_point + ".")
+
+        page_size = int(PARAM_DICT.get('page-size') or 1500)
+        page = []
+        empty = True
+        for record in self.engine.iter_records(PARAM_DICT):
+            page.append(record)
+            if len(page) >= page_size:
+                yield page
+                page = []
+                empty = False
+        if page or empty:
+            # Like the API, a query without results returns one empty page
+            yield page
+
+    def download_mindat_json(self, QUERY_DICT, END_POINT, OUTDIR = '', FILE_NAME = '', VERBOSE = 2, FORMAT = 'json', COMPRESSION = None, RESUME = False):
+        # A local query is fast enough to run again, so there is nothing to resume
+        super().download_mindat_json(QUERY_DICT, END_POINT, OUTDIR, FILE_NAME, VERBOSE, FORMAT, COMPRESSION, False)
@@ -0,0 +1,211 @@
+import re
+import unicodedata
+from bisect import bisect_left
+
+from .local_query import LocalQueryEngine, _to_int
+
+
+def get_tokens(TEXT):
+    '''
+        Returns the search tokens of a text the way the full-text index splits them: lowercase words
+        without diacritics, e.g. ['akermanite', 'green'] for 'Åkermanite, green'.
+    '''
+    text = unicodedata.normalize('NFKD', str(TEXT or ''))
+    text = ''.join(character for character in text if not unicodedata.combining(character))
+    return re.findall(r'[^\W_]+', text.lower())
+
+
+def _to_words(*VALUES):
+    '''
+        Joins the text of record fields, given as strings or lists, into one text to index.
+    '''
+    words = []
+    for value in VALUES:
+        if isinstance(value, (list, tuple)):
+            words.extend(str(item) for item in value if item)
+        elif value:
+            words.append(str(value))
+    return ' '.join(words)
+
+
+def is_near(TOKEN, TERM):
+    '''
+        Returns True if two words are at most one edit apart: one letter inserted, deleted, replaced,
+        or two adjacent letters swapped.
+    '''
+    if TOKEN == TERM:
+        return True
+    if abs(len(TOKEN) - len(TERM)) > 1:
+        return False
+    if len(TOKEN) == len(TERM):
+        differences = [position for position in range(len(TOKEN)) if TOKEN[position] != TERM[position]]
+        if len(differences) == 1:
+            return True
+        first, second = differences[0], differences[-1]
+        return len(differences) == 2 and second == first + 1 and TOKEN[first] == TERM[second] and TOKEN[second] == TERM[first]
+
+    shorter, longer = (TOKEN, TERM) if len(TOKEN) < len(TERM) else (TERM, TOKEN)
+    position = 0
+    while position < len(shorter) and shorter[position] == longer[position]:
+        position += 1
+    return shorter[position:] == longer[position + 1:]
+
+
+def _get_deletes(WORD):
+    return {WORD} | {WORD[:position] + WORD[position + 1:] for position in range(len(WORD))}
+
+
+class GeomaterialSearchEngine(LocalQueryEngine):
+    '''
+    Answers GeomaterialSearchRetriever queries from the local geomaterials mirror with a full-text index.
+
+    The names, colours, streaks, lustres, diaphaneity, crystal systems and elements of the mirrored
+    geomaterials are kept in an SQLite FTS5 index next to the records, refreshed incrementally like the
+    query engines. A search such as "quartz, green, hexagonal" matches the geomaterials where every word
+    of every comma-separated term is found, ignoring case and diacritics. Words match as prefixes, so
+    "chalcop" finds chalcopyrite while it is being typed, and a word found nowhere in the index is replaced
+    by the indexed words one typo away from it. Synonyms are found by their own name and bring their
+    main geomaterial along.
+
+    Results are ranked by the name first (an exact name, then a name starting with the first term), then
+    by BM25 relevance with name matches weighted above the other fields.
+
+    Args:
+        STORE (LocalStore or str): The store holding the geomaterials, or the path of its SQLite file.
+
+    Usage:
+        >>> GeomaterialRetriever().sync("/path/to/mindat_mirror.sqlite")
+        >>> engine = GeomaterialSearchEngine("/path/to/mindat_mirror.sqlite")
+        >>> minerals = engine.query({"q": "quartz, green, hexagonal"})
+    '''
+
+    END_POINT = 'v1/geomaterials'
+    QUERY_END_POINT = 'v1/geomaterials-search'
+    QUERY_TABLE = 'geomaterials_text'
+    TERMS_TABLE = 'geomaterials_text_terms'
+    # The BM25 weights of the columns of the text table (id, synid, name, properties, elements)
+    WEIGHTS = (0, 0, 10, 2, 1)
+    # Words shorter than this are only matched as prefixes, never corrected
+    MIN_FUZZY_LENGTH = 4
+
+    def _create_tables(self):
+        self._records_table = self.store.ensure_table(self.END_POINT)
+        with self.store.transaction() as connection:
+            connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts5(id UNINDEXED, synid UNINDEXED, name, properties, elements, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')".format(self.QUERY_TABLE)
+            )
+            connection.execute('CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts5vocab({}, row)'.format(self.TERMS_TABLE, self.QUERY_TABLE))
+            connection.execute('CREATE TABLE IF NOT EXISTS query_tables (name TEXT PRIMARY KEY, indexed_until REAL, version INTEGER)')
+        self._vocabulary = None
+        self._deletes = None
+
+    def _get_index_tables(self):
+        return [self.QUERY_TABLE]
+
+    def _get_index_rows(self, RECORD):
+        properties = _to_words(
+            RECORD.get('colour'), RECORD.get('streak'), RECORD.get('lustre'), RECORD.get('lustretype'),
+            RECORD.get('diapheny'), RECORD.get('csystem')
+        )
+        row = (RECORD['id'], RECORD['id'], _to_int(RECORD.get('synid')) or None, RECORD.get('name') or '',
+               properties, _to_words(RECORD.get('elements')))
+        return {self.QUERY_TABLE: [row]}
+
+    def _write_index_rows(self, CONNECTION, IDS, RECORDS, REPLACE = True):
+        if REPLACE:
+            CONNECTION.executemany('DELETE FROM {} WHERE rowid = ?'.format(self.QUERY_TABLE), [(id,) for id in IDS])
+        CONNECTION.executemany(
+            'INSERT INTO {} (rowid, id, synid, name, properties, elements) VALUES (?, ?, ?, ?, ?, ?)'.format(self.QUERY_TABLE),
+            [row for record in RECORDS for row in self._get_index_rows(record)[self.QUERY_TABLE]]
+        )
+
+    def _load(self, VERSION):
+        # The vocabulary is read again, when needed, from the refreshed index
+        self._vocabulary = None
+        self._deletes = None
+
+    def _get_vocabulary(self):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(row[0] for row in self.store.execute('SELECT term FROM {}'.format(self.TERMS_TABLE)))
+        return self._vocabulary
+
+    def get_near_terms(self, TOKEN):
+        '''
+            Returns the indexed words one typo away from a word.
+        '''
+        if len(TOKEN) < self.MIN_FUZZY_LENGTH:
+            return []
+        if self._deletes is None:
+            # Every word under itself and each of its one-letter deletions, so words one edit apart share a key
+            deletes = {}
+            for term in self._get_vocabulary():
+                if len(term) >= self.MIN_FUZZY_LENGTH - 1:
+                    for key in _get_deletes(term):
+                        deletes.setdefault(key, []).append(term)
+            self._deletes = deletes
+
+        terms = set()
+        for key in _get_deletes(TOKEN):
+            terms.update(self._deletes.get(key, ()))
+        return sorted(term for term in terms if is_near(TOKEN, term))
+
+    def _get_alternatives(self, TOKEN):
+        '''
+            Returns the FTS5 expressions a search word may match: the word as a prefix, or its corrections.
+        '''
+        vocabulary = self._get_vocabulary()
+        position = bisect_left(vocabulary, TOKEN)
+        if position < len(vocabulary) and vocabulary[position].startswith(TOKEN):
+            return ['"{}"*'.format(TOKEN)]
+        return ['"{}"'.format(term) for term in self.get_near_terms(TOKEN)]
+
+    def get_match(self, KEYWORDS):
+        '''
+            Returns the FTS5 query of a search, '' for an empty search, or None if a word matches nothing.
+        '''
+        terms = []
+        for keyword in str(KEYWORDS or '').split(','):
+            for token in get_tokens(keyword):
+                alternatives = self._get_alternatives(token)
+                if not alternatives:
+                    return None
+                terms.append('(' + ' OR '.join(alternatives) + ')')
+        return ' AND '.join(terms)
+
+    def query_ids(self, PARAM_DICT):
+        '''
+            Returns the ids of the geomaterials matching the q parameter of a search, best match first.
+        '''
+        self.refresh()
+        for key, value in PARAM_DICT.items():
+            if value is not None and key != 'q' and key not in self.SHAPE_PARAMS:
+                raise ValueError("Invalid input. The parameter " + key + " cannot be evaluated on the local mirror.")
+
+        match = self.get_match(PARAM_DICT.get('q'))
+        if match is None:
+            return []
+        if not match:
+            rows = self.store.execute('SELECT id, synid FROM {} ORDER BY rowid'.format(self.QUERY_TABLE))
+        else:
+            first = str(PARAM_DICT.get('q')).split(',')[0].strip()
+            rows = self.store.execute(
+                "SELECT id, synid FROM {0} WHERE {0} MATCH ? ORDER BY "
+                "CASE WHEN name = ? COLLATE NOCASE THEN 0 WHEN name LIKE ? ESCAPE '\\' THEN 1 ELSE 2 END, "
+                "bm25({0}, {1}), rowid".format(self.QUERY_TABLE, ', '.join(str(weight) for weight in self.WEIGHTS)),
+                (match, first, first.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+            )
+
+        # A synonym is followed by the geomaterial it is a synonym of
+        ids, seen = [], set()
+        for id, synid in rows:
+            for result in (id, synid):
+                if result and result not in seen:
+                    seen.add(result)
+                    ids.append(result)
+
+        if 'page' in PARAM_DICT:
+            page_size = int(PARAM_DICT.get('page-size') or 1500)
+            offset = (int(PARAM_DICT['page']) - 1) * page_size
+            ids = ids[offset:offset + page_size]
+        return ids
@@ -1,8 +1,10 @@
 from . import mindat_api
+from .retriever_mixin import RetrieverMixin
+from .local_query import LocalitiesQueryEngine
 from datetime import datetime
 
 
-class LocalitiesRetriever:
+class LocalitiesRetriever(RetrieverMixin):
     """
     This module provides the LocalitiesRetriever class for querying locality data from the Mindat API. The class enables users to construct queries based on various parameters such as country, description, included/excluded elements, and more. It supports method chaining for the flexible combination of query parameters and offers functionality to save the queried data either to a specified directory or the current directory.
     For more information visit: https://api.mindat.org/schema/redoc/#tag/localities
@@ -22,10 +24,14 @@ class LocalitiesRetriever:
         expand(EXPAND_FIELDS): Expands the query to include additional fields.
         fields(FIELDS): Specifies the fields to be retrieved in the query.
         id_in(ID_IN_STR): Sets specific IDs for the query.
+        nearest(LATITUDE, LONGITUDE, K): Returns the K localities nearest to a point (local mirror only).
         omit(OMIT_FIELDS): Omits certain fields from the query results.
         page_size(PAGE_SIZE): Sets the number of results per page.
         txt(TXT_STR): Sets a locality name filter for the query.
         updated_at(DATE_STR): Sets the last updated datetime for the query.
+        within_bbox(MIN_LATITUDE, MIN_LONGITUDE, MAX_LATITUDE, MAX_LONGITUDE): Filters the localities inside a box (local mirror only).
+        within_radius(LATITUDE, LONGITUDE, RADIUS_KM): Filters the localities within a distance of a point (local mirror only).
+        sync(STORE): Mirrors the results into a local store, fetching only the records updated since the last sync.
         saveto(OUTDIR): Executes the query and saves the results to the specified directory.
         save(): Executes the query and saves the results to the current directory.
 
@@ -33,8 +39,11 @@ class LocalitiesRetriever:
     """
 
     BASE_ENDPOINT = "v1/localities"
+    _supports_updated_at = True
+    _local_engine = LocalitiesQueryEngine
 
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self._params = {}
         self.end_point = self.BASE_ENDPOINT
         self.verbose_flag = 2
@@ -613,6 +622,36 @@ class LocalitiesRetriever:
 
         return self
 
+    def nearest(self, LATITUDE, LONGITUDE, K=10):
+        """
+        Returns the K localities nearest to a point that match the other filters, nearest first.
+        Spatial queries are answered from the local mirror, so call local() first.
+
+        Args:
+            LATITUDE (float): The latitude of the point, in degrees.
+            LONGITUDE (float): The longitude of the point, in degrees.
+            K (int): The number of localities to return.
+
+        Returns:
+            self: The LocalitiesRetriever object.
+
+        Example:
+            >>> lr = LocalitiesRetriever()
+            >>> lr.local("/path/to/mindat_mirror.sqlite").nearest(45.5, -73.6, 10).get_dict()
+        """
+        self._check_local("nearest()")
+        latitude, longitude = self._get_point(LATITUDE, LONGITUDE)
+        try:
+            k = int(K)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid input. K must be a positive integer.")
+        if k < 1:
+            raise ValueError("Invalid input. K must be a positive integer.")
+
+        self._params.update({"nearest": [latitude, longitude, k]})
+
+        return self
+
     def omit(self, OMIT_FIELDS):
         """
         Set the fields to omit from the query.
@@ -722,57 +761,101 @@ class LocalitiesRetriever:
 
         return self
 
-    def verbose(self, FLAG):
+    def _check_local(self, METHOD):
+        if not self._local:
+            raise ValueError(METHOD + " is answered from a local mirror; call local() first.")
+
+    def _get_point(self, LATITUDE, LONGITUDE):
+        try:
+            latitude, longitude = float(LATITUDE), float(LONGITUDE)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid input. LATITUDE and LONGITUDE must be numbers.")
+        if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+            raise ValueError("Invalid input. LATITUDE must be within -90 and 90, LONGITUDE within -180 and 180.")
+        return latitude, longitude
+
+    def within_bbox(self, MIN_LATITUDE, MIN_LONGITUDE, MAX_LATITUDE, MAX_LONGITUDE):
         """
-        Determinse the verbose mode of the query.
+        Filters the localities inside a latitude / longitude box.
+        A box with MIN_LONGITUDE greater than MAX_LONGITUDE crosses the antimeridian.
+        Spatial queries are answered from the local mirror, so call local() first.
 
         Args:
-            FLAG (int): Determines the verbose mode: 0 = silent, 1 = save notifications, 2(default) = progress bar
+            MIN_LATITUDE (float): The southern edge of the box, in degrees.
+            MIN_LONGITUDE (float): The western edge of the box, in degrees.
+            MAX_LATITUDE (float): The northern edge of the box, in degrees.
+            MAX_LONGITUDE (float): The eastern edge of the box, in degrees.
 
         Returns:
-            None
+            self: The LocalitiesRetriever object.
 
         Example:
-            >>> Lr = LocalitiesRetriever()
-            >>> Lr.country("spain").verbose(0).saveto("/path/to/directory")
-
+            >>> lr = LocalitiesRetriever()
+            >>> lr.local("/path/to/mindat_mirror.sqlite").within_bbox(45, -75, 46, -73).get_dict()
         """
-        if isinstance(FLAG, int):
-            flag = FLAG
-        else:
-            raise ValueError(f"Possible Invalid ENTRYTYPE: {FLAG}\nPlease retry.")
+        self._check_local("within_bbox()")
+        min_latitude, min_longitude = self._get_point(MIN_LATITUDE, MIN_LONGITUDE)
+        max_latitude, max_longitude = self._get_point(MAX_LATITUDE, MAX_LONGITUDE)
+        if min_latitude > max_latitude:
+            raise ValueError("Invalid input. MIN_LATITUDE must not be greater than MAX_LATITUDE.")
 
-        self.verbose_flag = flag
+        self._params.update({"within_bbox": [min_latitude, min_longitude, max_latitude, max_longitude]})
 
         return self
 
-    def saveto(self, OUTDIR="", FILE_NAME=""):
+    def within_radius(self, LATITUDE, LONGITUDE, RADIUS_KM):
         """
-        Executes the query to retrieve the localities with keywords and saves the results to a specified directory.
+        Filters the localities within a great-circle distance of a point.
+        Spatial queries are answered from the local mirror, so call local() first.
 
         Args:
-            OUTDIR (str): The directory path where the retrieved localities will be saved. If not provided, the current directory will be used.
-            FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
+            LATITUDE (float): The latitude of the point, in degrees.
+            LONGITUDE (float): The longitude of the point, in degrees.
+            RADIUS_KM (float): The distance from the point, in km.
 
         Returns:
-            None
+            self: The LocalitiesRetriever object.
 
         Example:
             >>> lr = LocalitiesRetriever()
-            >>> lr.saveto("/path/to/directory", "france")
+            >>> lr.local("/path/to/mindat_mirror.sqlite").within_radius(45.5, -73.6, 50).get_dict()
         """
+        self._check_local("within_radius()")
+        latitude, longitude = self._get_point(LATITUDE, LONGITUDE)
+        try:
+            radius = float(RADIUS_KM)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid input. RADIUS_KM must be a positive number.")
+        if radius <= 0:
+            raise ValueError("Invalid input. RADIUS_KM must be a positive number.")
 
-        params = self._params
-        end_point = self.end_point
-        outdir = OUTDIR
-        file_name = FILE_NAME
-        verbose = self.verbose_flag
+        self._params.update({"within_radius": [latitude, longitude, radius]})
 
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
+        return self
 
-        # reset the query parameters in case the user wants to make another query
-        self._init_params()
+    def verbose(self, FLAG):
+        """
+        Determinse the verbose mode of the query.
+
+        Args:
+            FLAG (int): Determines the verbose mode: 0 = silent, 1 = save notifications, 2(default) = progress bar
+
+        Returns:
+            None
+
+        Example:
+            >>> Lr = LocalitiesRetriever()
+            >>> Lr.country("spain").verbose(0).saveto("/path/to/directory")
+
+        """
+        if isinstance(FLAG, int):
+            flag = FLAG
+        else:
+            raise ValueError(f"Possible Invalid ENTRYTYPE: {FLAG}\nPlease retry.")
+
+        self.verbose_flag = flag
+
+        return self
 
     def save(self, FILE_NAME=""):
         """
@@ -806,10 +889,10 @@ class LocalitiesRetriever:
         """
 
         params = self._params
-        end_point = self.end_point
+        end_point = self._get_end_point()
         verbose = self.verbose_flag
 
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
 
         self._init_params()
@@ -846,7 +929,7 @@ class LocalitiesRetriever:
         return object.__getattribute__(self, name)
 
 
-class LocalitiesIdRetriever:
+class LocalitiesIdRetriever(RetrieverMixin):
     """
     This module provides the LocalitiesIdRetriever class for returning localities by id
     For more information visit: https://api.mindat.org/schema/redoc/#tag/localities/operation/localities_retrieve
@@ -860,8 +943,11 @@ class LocalitiesIdRetriever:
     """
 
     BASE_ENDPOINT = "v1/localities"
+    _supports_id_lookup = True
+    _supports_id_in = True
 
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = self.BASE_ENDPOINT
         self.verbose_flag = 2
         self.sub_endpoint = ""
@@ -947,33 +1033,8 @@ class LocalitiesIdRetriever:
 
         return self
 
-    def saveto(self, OUTDIR="", FILE_NAME=""):
-        """
-        Executes the query to retrieve the localities with keywords and saves the results to a specified directory.
-
-        Args:
-            OUTDIR (str): The directory path where the retrieved localities will be saved. If not provided, the current directory will be used.
-            FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-        Returns:
-            None
-
-        Example:
-            >>> lir = LocalitiesIdRetriever()
-            >>> lir.saveto("/path/to/directory", "france")
-        """
-
-        params = self._params
-        end_point = "/".join([self.end_point, self.sub_endpoint])
-        outdir = OUTDIR
-        verbose = self.verbose_flag
-        file_name = FILE_NAME
-
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # reset the query parameters in case the user wants to make another query
-        self._init_params()
+    def _get_end_point(self):
+        return "/".join([self.end_point, self.sub_endpoint])
 
     def save(self, FILE_NAME=""):
         """
@@ -1008,9 +1069,9 @@ class LocalitiesIdRetriever:
 
         params = self._params
         verbose = self.verbose_flag
-        end_point = "/".join([self.end_point, self.sub_endpoint])
+        end_point = self._get_end_point()
 
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
 
         self._init_params()
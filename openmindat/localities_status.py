@@ -1,7 +1,8 @@
 from . import mindat_api
+from .retriever_mixin import RetrieverMixin
 
 
-class LocalitiesStatusRetriever:
+class LocalitiesStatusRetriever(RetrieverMixin):
     """
     A class to facilitate the retrieval of locality data from the Mindat API filtered by page.
     For more information visit: https://api.mindat.org/schema/redoc/#tag/locality_status
@@ -20,7 +21,8 @@ class LocalitiesStatusRetriever:
 
     BASE_ENDPOINT = 'v1/locality-status' 
     
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = self.BASE_ENDPOINT
         self.verbose_flag = 2
         
@@ -103,39 +105,6 @@ class LocalitiesStatusRetriever:
         
         return self
     
-    def saveto(self, OUTDIR = '', FILE_NAME = ''):
-        '''
-            Executes the query to retrieve the localities with keywords and saves the results to a specified directory.
-
-            Args:
-                OUTDIR (str): The directory path where the retrieved localities will be saved. If not provided, the current directory will be used.
-                FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-            Returns:
-                None
-
-            Example:
-                >>> lsr = LocalityStatusRetriever()
-                >>> lsr.saveto("/path/to/directory")
-        '''
-        
-        params = self._params
-        outdir = OUTDIR
-        end_point = self.end_point
-        file_name = FILE_NAME
-        verbose = self.verbose_flag
-        
-        ma = mindat_api.MindatApi()
-        
-        if "page" in params:
-            ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-        else:
-            ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-            
-
-        # Reset the query parameters in case the user wants to make another query.
-        self._init_params()
-    
     def save(self, FILE_NAME = ''):
         '''
             Executes the query to retrieve the list of locality data and saves the results to the current directory.
@@ -168,10 +137,10 @@ class LocalitiesStatusRetriever:
         '''
        
         params = self._params
-        end_point = self.end_point
+        end_point = self._get_end_point()
         verbose = self.verbose_flag
         
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
             
         self._init_params()
@@ -198,7 +167,7 @@ class LocalitiesStatusRetriever:
         return object.__getattribute__(self, name)
         
         
-class LocalitiesStatusIdRetriever:
+class LocalitiesStatusIdRetriever(RetrieverMixin):
     """
     A class to facilitate the retrieval of locality data from the Mindat API filtered by id.
     For more information visit: https://api.mindat.org/schema/redoc/#tag/locality_status/operation/locality_status_retrieve
@@ -216,8 +185,10 @@ class LocalitiesStatusIdRetriever:
     """
 
     BASE_ENDPOINT = 'v1/locality-status'  
+    _supports_id_lookup = True
 
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = self.BASE_ENDPOINT
         self.verbose_flag = 2
         self.sub_endpoint = ''
@@ -306,33 +277,8 @@ class LocalitiesStatusIdRetriever:
         
         return self
     
-    def saveto(self, OUTDIR = '', FILE_NAME = ''):
-        '''
-            Executes the query to retrieve the localities with keywords and saves the results to a specified directory.
-
-            Args:
-                OUTDIR (str): The directory path where the retrieved localities will be saved. If not provided, the current directory will be used.
-                FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-            Returns:
-                None
-
-            Example:
-                >>> lsir = LocalitiesStatusIdRetriever()
-                >>> lsir.saveto("/path/to/directory")
-        '''
-
-        params = self._params
-        outdir = OUTDIR
-        end_point = '/'.join([self.end_point, self.sub_endpoint])
-        file_name = FILE_NAME
-        verbose = self.verbose_flag
-        
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # Reset the query parameters in case the user wants to make another query.
-        self._init_params()
+    def _get_end_point(self):
+        return '/'.join([self.end_point, self.sub_endpoint])
     
     def save(self, FILE_NAME = ''):
         '''
@@ -367,9 +313,9 @@ class LocalitiesStatusIdRetriever:
        
         params = self._params
         verbose = self.verbose_flag
-        end_point = '/'.join([self.end_point, self.sub_endpoint])
+        end_point = self._get_end_point()
         
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
         
         self._init_params()
@@ -1,14 +1,28 @@
 import os
 import re
 import sys
-import json
 import yaml
 import requests
 import time
 from pathlib import Path
+from contextlib import nullcontext
 from datetime import datetime
-from json import JSONDecodeError
 import getpass
+import math
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
+from .session import get_default_session
+from .cache import resolve_cache
+from .single_flight import resolve_single_flight
+from .checkpoint import HarvestCheckpoint
+from .sync import resolve_store, parse_timestamp, format_timestamp
+from .retry import RetryPolicy
+from .rate_limit import get_default_rate_limiter
+from .page_size import get_default_page_size_controller
+from .arrow_export import ArrowBatchBuilder
+from .writers import get_format_extension, get_compression_extension, split_compression_extension, open_results_writer, get_results_writer, CheckpointedFile
 
 
 def in_notebook():
@@ -29,17 +43,41 @@ if in_notebook():
 else:
     from tqdm import tqdm
 
+
+def encode_params(PARAMS):
+    '''
+        Flattens a query dict into (key, value) string pairs the way requests encodes it:
+        None values are dropped and list values are repeated.
+    '''
+    pairs = []
+    for key, value in (PARAMS or {}).items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for item in values:
+            if item is not None:
+                pairs.append((key, str(item)))
+    return pairs
+
 class MindatApiKeyManager:
     
     MINDAT_API_URL = "https://api.mindat.org"
     DEFAULT_ENDPOINT = "v1/geomaterials"
+    API_KEY_FILE = './.apikey.yaml'
+    # Seconds a validated key is trusted before the on-disk record expires
+    VALIDATION_TTL = 24 * 60 * 60
+
+    # In-process cache of validated keys, shared by all instances: {api_key: validated_at}
+    _validated_keys = {}
+    _validated_keys_lock = threading.Lock()
     
-    def __init__(self, ENDPOINT: str = None):
+    def __init__(self, ENDPOINT: str = None, SESSION = None):
         self.endpoint = ENDPOINT if ENDPOINT else self.DEFAULT_ENDPOINT
+        self.session = SESSION if SESSION else get_default_session()
 
     def inspect_stored_api_key(self):
         try:
             env_api_key = os.environ["MINDAT_API_KEY"]
+            if self.is_validated(env_api_key):
+                return True
             status_code = self.get_api_key_status(env_api_key)
             if 200 == status_code:
                 self._save_valid_api_key(env_api_key)
@@ -48,17 +86,73 @@ class MindatApiKeyManager:
             pass
 
         try:
-            with open('./.apikey.yaml', 'r') as f:
-                yaml_api_key = yaml.safe_load(f)['api_key']
-            
+            yaml_api_key = self._read_key_file()['api_key']
+            if self.is_validated(yaml_api_key):
+                os.environ["MINDAT_API_KEY"] = yaml_api_key
+                return True
+
             status_code = self.get_api_key_status(yaml_api_key)
             if 200 == status_code:
                 self._save_valid_api_key(yaml_api_key)
                 return True
-        except FileNotFoundError:
+        except (FileNotFoundError, KeyError, TypeError):
             pass
 
         return False
+
+    def find_stored_api_key(self):
+        '''
+            Returns the stored API key from the environment or the key file without validating it,
+            or None if no key is stored.
+        '''
+        if os.environ.get("MINDAT_API_KEY"):
+            return os.environ.get("MINDAT_API_KEY")
+
+        try:
+            api_key = self._read_key_file()['api_key']
+        except (FileNotFoundError, KeyError, TypeError):
+            return None
+
+        os.environ["MINDAT_API_KEY"] = api_key
+        return api_key
+
+    def is_validated(self, API_KEY):
+        '''
+            Checks whether the key was validated within VALIDATION_TTL, first in this process
+            and then in the on-disk record, without contacting the server.
+        '''
+        now = time.time()
+
+        with self._validated_keys_lock:
+            validated_at = self._validated_keys.get(API_KEY)
+        if validated_at is not None and now - validated_at < self.VALIDATION_TTL:
+            return True
+
+        try:
+            record = self._read_key_file()
+            validated_at = float(record.get('validated_at', 0))
+        except (FileNotFoundError, AttributeError, TypeError, ValueError):
+            return False
+
+        if record.get('api_key') == API_KEY and now - validated_at < self.VALIDATION_TTL:
+            with self._validated_keys_lock:
+                self._validated_keys[API_KEY] = validated_at
+            return True
+
+        return False
+
+    def mark_validated(self, API_KEY):
+        '''
+            Records that the key was accepted by the server, in this process and in the key file.
+            The key file is only rewritten when the record is missing or stale.
+        '''
+        if self.is_validated(API_KEY):
+            return True
+        return self._save_valid_api_key(API_KEY)
+
+    def _read_key_file(self):
+        with open(self.API_KEY_FILE, 'r') as f:
+            return yaml.safe_load(f)
     
     def get_api_key_input(self):
         api_key = getpass.getpass("Input or get your Mindat API key at https://www.mindat.org/a/how_to_get_my_mindat_api_key: ")
@@ -92,9 +186,13 @@ class MindatApiKeyManager:
         
     def _save_valid_api_key(self, VALID_KEY):
         os.environ["MINDAT_API_KEY"] = VALID_KEY
+        validated_at = time.time()
 
-        with open('./.apikey.yaml', 'w') as f:
-            yaml.dump({'api_key': VALID_KEY}, f)
+        with self._validated_keys_lock:
+            self._validated_keys[VALID_KEY] = validated_at
+
+        with open(self.API_KEY_FILE, 'w') as f:
+            yaml.dump({'api_key': VALID_KEY, 'validated_at': validated_at}, f)
         
         return True
     
@@ -102,25 +200,26 @@ class MindatApiKeyManager:
         if os.environ.get("MINDAT_API_KEY"):
             api_key = os.environ.get("MINDAT_API_KEY")
         else:
-            with open('./.apikey.yaml', 'r') as f:
-                api_key = yaml.safe_load(f)['api_key']
+            api_key = self._read_key_file()['api_key']
         return api_key
     
     def reset_api_key(self):
         try:
-            del os.environ["MINDAT_API_KEY"]
+            api_key = os.environ.pop("MINDAT_API_KEY")
+            with self._validated_keys_lock:
+                self._validated_keys.pop(api_key, None)
         except KeyError:
             pass
         
         try:
-            os.remove('./.apikey.yaml')
+            os.remove(self.API_KEY_FILE)
         except FileNotFoundError:
             pass
         return True
 
     def get_api_key_status(self, api_key: str) -> int:
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.MINDAT_API_URL}/{self.endpoint}/",
                 headers={'Authorization': f'Token {api_key}'},
                 params={'format': 'json'},
@@ -134,26 +233,157 @@ class MindatApiKeyManager:
 
 class MindatApi:
     '''The main class for openmindat API'''
-    def __init__(self, ENDPOINT: str = None):
+
+    # Ids per id_in query of get_many(), which keeps the URL well below the length limit of the server
+    ID_IN_CHUNK_SIZE = 250
+    # Lookups run at the same time by get_many() and chunked queries when the concurrency is left at 1
+    LOOKUP_CONCURRENCY = 8
+    # The longest request URL the server answers
+    MAX_URL_LENGTH = 4097
+    # The room kept in split queries for the page parameter of their `next` links
+    PAGE_PARAM_ROOM = '&page=99999'
+    # Comma-separated parameters matching any of their values, which can be split over several queries.
+    # List values (repeated parameters) can always be split; el_inc / el_exc cannot, as they match all values.
+    SPLITTABLE_PARAMS = ('id_in',)
+    # Held while a rejected API key is replaced, so concurrent requests prompt for a new key only once
+    _api_key_lock = threading.Lock()
+
+    def __init__(self, ENDPOINT: str = None, SESSION = None, CONCURRENCY = 1, CACHE = None, RETRY_POLICY = None, RATE_LIMITER = None, SHARD_SIZE = None, PAGE_SIZE_CONTROLLER = None, COALESCE = True):
         self._api_key = None
         self.endpoint = ENDPOINT or ""
+        self.session = SESSION if SESSION else get_default_session()
+        self.retry_policy = RETRY_POLICY if RETRY_POLICY else RetryPolicy()
+        self.rate_limiter = RATE_LIMITER if RATE_LIMITER else get_default_rate_limiter()
+        # With a SHARD_SIZE, paginated queries are split into id_min/id_max ranges of about that many items
+        self.shard_size = int(SHARD_SIZE) if SHARD_SIZE else None
+        self.page_size_controller = PAGE_SIZE_CONTROLLER if PAGE_SIZE_CONTROLLER else get_default_page_size_controller()
+        # The ResponseCache used by _request, or None; see cache.resolve_cache for the accepted values
+        self.cache = resolve_cache(CACHE)
+        # The SingleFlight sharing identical concurrent requests, or None; see single_flight.resolve_single_flight
+        self.single_flight = resolve_single_flight(COALESCE)
+        self.concurrency = 1
+        self.set_concurrency(CONCURRENCY)
+        self._key_validated = False
         self._prepare_api_key()
         
         self.MINDAT_API_URL = "https://api.mindat.org"
-        self._headers = {'Authorization': 'Token '+ self._api_key}
         self.params = {'format': 'json'}
         self.data_dir = './mindat_data/'
         
         
 
     def _prepare_api_key(self):
-        mam = MindatApiKeyManager(self.endpoint)
+        '''
+            Loads the stored API key without probing the server.
+            The key is validated lazily: the first real response either records it as valid or,
+            on a 401, triggers a new key prompt (see _request).
+        '''
+        mam = MindatApiKeyManager(self.endpoint, self.session)
 
-        if False == mam.inspect_stored_api_key():
+        if mam.find_stored_api_key() is None:
             mam.get_api_key_input()
 
         self._api_key = mam.load_api_key()
+        self._headers = {'Authorization': 'Token '+ self._api_key}
+        self._key_validated = mam.is_validated(self._api_key)
+
+    def _handle_invalid_api_key(self, REJECTED_KEY):
+        '''
+            Replaces an API key rejected by the server. A new key is only prompted for on the main thread;
+            requests rejected on worker threads use the key entered meanwhile, or raise if there is none.
+        '''
+        with self._api_key_lock:
+            mam = MindatApiKeyManager(self.endpoint, self.session)
+            stored_api_key = mam.find_stored_api_key()
+
+            if stored_api_key is None or stored_api_key == REJECTED_KEY:
+                if threading.current_thread() is not threading.main_thread():
+                    raise ValueError("The Mindat API key was rejected by the server. Run the query from the main thread to enter a new key.")
+                mam.reset_api_key()
+                print("The stored Mindat API key was rejected by the server.")
+                mam.get_api_key_input()
+                stored_api_key = mam.load_api_key()
+
+            self._api_key = stored_api_key
+            self._headers = {'Authorization': 'Token '+ self._api_key}
+            self._key_validated = True
+
+    def _request(self, URL, PARAMS = None):
+        '''
+            Sends a GET request with the API key, re-prompting once for a new key if the stored one is rejected.
+            With a response cache, a stored response for the same URL and parameters is returned instead;
+            an expired one is revalidated with a conditional request when it has an ETag or Last-Modified header.
+            An identical request already in flight, from any thread, is joined instead of sent again.
+        '''
+        if self.single_flight is None:
+            return self._fetch(URL, PARAMS)
+
+        key = self.single_flight.make_key(URL, encode_params(PARAMS), self._api_key)
+        return self.single_flight.do(key, lambda: self._fetch(URL, PARAMS))
+
+    def _fetch(self, URL, PARAMS = None):
+        if self.cache is None:
+            return self._send(URL, PARAMS)
+
+        cache_key = self.cache.make_key(URL, encode_params(PARAMS))
+        cached_response = self.cache.lookup(cache_key)
+        if cached_response is not None and not cached_response.stale:
+            return cached_response
+
+        response = self._send(URL, PARAMS, self.cache.conditional_headers(cached_response))
+        return self.cache.store(cache_key, response, cached_response)
+
+    def _send(self, URL, PARAMS = None, HEADERS = None):
+        api_key = self._api_key
+        headers = dict(self._headers, **HEADERS) if HEADERS else self._headers
+        response = self._send_with_retries(URL, PARAMS, headers)
+
+        # A key can be revoked after it was validated, so every 401 asks for a new key, once
+        if 401 == response.status_code:
+            self._handle_invalid_api_key(api_key)
+            headers = dict(self._headers, **HEADERS) if HEADERS else self._headers
+            response = self._send_with_retries(URL, PARAMS, headers)
+            if 401 == response.status_code:
+                raise ValueError("The Mindat API key was rejected by the server.")
+
+        if 200 == response.status_code and not self._key_validated:
+            MindatApiKeyManager(self.endpoint, self.session).mark_validated(self._api_key)
+            self._key_validated = True
+
+        return response
     
+    def _send_with_retries(self, URL, PARAMS, HEADERS):
+        '''
+            Sends a GET request, retrying connection errors, timeouts and retryable status codes
+            as the retry policy allows. Returns the last response once the retries are exhausted.
+            Every attempt waits for the rate limiter, and a 429 pauses the rate limiter for all its users.
+        '''
+        policy = self.retry_policy
+        started_at = time.monotonic()
+        attempt = 0
+
+        while True:
+            try:
+                with self.rate_limiter.limit() if self.rate_limiter else nullcontext():
+                    response = self.session.get(URL, params=PARAMS, headers=HEADERS, timeout=policy.get_timeout(started_at))
+            except Exception as e:
+                if not policy.should_retry_exception(e):
+                    raise
+                delay = policy.get_delay(attempt, started_at)
+                if delay is None:
+                    raise
+            else:
+                if not policy.should_retry_status(response.status_code):
+                    return response
+                delay = policy.get_delay(attempt, started_at, response)
+                if delay is None:
+                    return response
+                if 429 == response.status_code and self.rate_limiter:
+                    self.rate_limiter.pause(delay)
+
+            time.sleep(delay)
+            attempt += 1
+
     def set_params(self, PARAMS_DICT):
         self.params = PARAMS_DICT
 
@@ -165,12 +395,50 @@ class MindatApi:
 
     def get_headers(self):
         return self._headers
+
+    def get_session(self):
+        return self.session
+
+    def get_cache(self):
+        return self.cache
+
+    def get_retry_policy(self):
+        return self.retry_policy
+
+    def get_rate_limiter(self):
+        return self.rate_limiter
+
+    def get_page_size_controller(self):
+        return self.page_size_controller
+
+    def set_concurrency(self, CONCURRENCY):
+        '''
+            Sets the number of pages fetched in parallel for paginated queries.
+            1 (default) walks the `next` links sequentially.
+        '''
+        try:
+            concurrency = int(CONCURRENCY)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid input. CONCURRENCY must be a positive integer.")
+
+        if concurrency < 1:
+            raise ValueError("Invalid input. CONCURRENCY must be a positive integer.")
+
+        self.concurrency = concurrency
     
-    def get_file_path(self, OUTDIR, FILE_NAME):
+    def get_file_path(self, OUTDIR, FILE_NAME, EXTENSION = '.json', COMPRESSION = None):
         '''
             Reads an End_point
+            A compression ('gzip' or 'zstd') is taken from COMPRESSION or from the file name's extension,
+            e.g. FILE_NAME 'geomaterials.gz' or 'geomaterials.json.gz' gives 'geomaterials.json.gz'
         '''
-        file_name = str(FILE_NAME)
+        file_name, name_compression = split_compression_extension(FILE_NAME)
+        compression = COMPRESSION if COMPRESSION else name_compression
+
+        # A name that already carries the format extension is not extended twice
+        if name_compression and file_name.endswith(EXTENSION):
+            file_name = file_name[:-len(EXTENSION)]
+
         invalid_symbols = re.findall(r"[\\?%*:|\"<>\x7F\x00-\x1F]", file_name)
         
         #input sanitization
@@ -184,7 +452,7 @@ class MindatApi:
             out_dir = Path(OUTDIR)
         
         out_dir.mkdir(parents=True, exist_ok=True)
-        return Path(out_dir, file_name.replace('/', '_') + '.json')
+        return Path(out_dir, file_name.replace('/', '_') + EXTENSION + get_compression_extension(compression))
 
 
     def get_datetime(self):
@@ -193,46 +461,161 @@ class MindatApi:
         dt_string = now.strftime("%m%d%Y%H%M%S")
         return dt_string
     
-    def get_results(self, URL, json_data, pbar, VERBOSE = 2):
-        url = URL        
-        
+    def _get_page_results(self, URL):
+        '''
+            Fetches the results of a single page. The retry policy of the transport is the only retry layer.
+        '''
+        response = self._request(URL)
+        self._raise_for_server_error(response)
+        return response.json()['results']
+
+    def _raise_for_server_error(self, RESPONSE):
+        '''
+            Raises if the server still answers with a rate limit or a server error once the retries are exhausted;
+            unlike a timeout, a smaller page would not help.
+        '''
+        if 429 == RESPONSE.status_code or RESPONSE.status_code >= 500:
+            reason = getattr(RESPONSE, 'reason', None) or getattr(RESPONSE, 'reason_phrase', '')
+            raise ValueError("The Mindat server answered " + str(RESPONSE.status_code) + " " + str(reason) + ", please try again later.")
+
+    def _get_page_urls(self, NEXT_URL, TOTAL_ITEM, ITEM_PER_REQUEST):
+        '''
+            Builds the URLs of all remaining pages from the first `next` link and the item count.
+            Returns None if the endpoint does not paginate by page number (e.g. cursor pagination).
+        '''
+        parsed_url = urlparse(NEXT_URL)
+        query = parse_qs(parsed_url.query, keep_blank_values=True)
+
+        # A page size tuned after the first page shows in the URL; the server may also cap the requested size
+        item_per_request = min(self._get_url_page_size(NEXT_URL) or ITEM_PER_REQUEST, ITEM_PER_REQUEST or math.inf)
+        if 'page' not in query or not item_per_request:
+            return None
+
         try:
-            response = requests.get(url, headers=self._headers)
-            new_results = response.json()['results']
-            json_data["results"] += new_results
-            if VERBOSE == 2:
-                pbar.update(len(new_results))
-        except TypeError: #special case for locgeoregion2
-            json_data["results"]["features"] += new_results["features"]
-            if VERBOSE == 2:
-                pbar.update(len(new_results))
-        #except JSONDecodeError:
-        #    raise
-            
-        return response
-    
-        
-    def get_mindat_json(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+            first_page = int(query['page'][0])
+        except ValueError:
+            return None
+        last_page = math.ceil(TOTAL_ITEM / item_per_request)
+
+        page_urls = []
+        for page in range(first_page, last_page + 1):
+            query['page'] = [str(page)]
+            page_urls.append(urlunparse(parsed_url._replace(query=urlencode(query, doseq=True))))
+        return page_urls
+
+    def _iter_pages_concurrently(self, PAGE_URLS):
         '''
-            get all items in a list
-            Since this API has a limit of 1500 items per page,
-            we need to loop through all pages and save them to a single json file
+            Fetches the given pages on a pool of self.concurrency workers and yields their results in page order.
+            At most self.concurrency pages are requested ahead of the consumer, which keeps memory bounded.
+        '''
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        pending = deque()
+        try:
+            for url in PAGE_URLS:
+                if len(pending) >= self.concurrency:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(self._get_page_results, url))
+
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _get_url_page_size(self, URL):
+        query = parse_qs(urlparse(str(URL)).query)
+        try:
+            return int(query['page-size'][0])
+        except (KeyError, ValueError):
+            return None
+
+    def _shrink_page_size(self, PARAM_DICT, KEY):
+        '''
+            Lowers the page size of a query after the server failed to return its first page.
+            Returns False if the query has no page size or it cannot go any lower.
+        '''
+        if 'page-size' not in PARAM_DICT or 'page' in PARAM_DICT:
+            return False
+
+        page_size = self.page_size_controller.record_error(KEY, PARAM_DICT['page-size'])
+        if page_size is None:
+            return False
+
+        PARAM_DICT['page-size'] = page_size
+        print("page size too big, reducing and trying again. New size: ", PARAM_DICT['page-size'])
+        return True
+
+    def _record_page(self, KEY, PAGE_SIZE, RESPONSE, STARTED_AT):
+        '''
+            Reports the latency and payload size of a page to the page size controller.
+        '''
+        if PAGE_SIZE is None or getattr(RESPONSE, 'from_cache', False):
+            return
+        self.page_size_controller.record_page(KEY, PAGE_SIZE, time.monotonic() - STARTED_AT, len(RESPONSE.content))
+
+    def _adapt_page_url(self, URL, DONE_ITEM, KEY, REQUESTED, FAILED = False):
+        '''
+            Returns the URL of the next page of a query with the page size tuned by the controller,
+            and the number of items at the start of that page that were already fetched.
+            The page number is recomputed from the items fetched so far. A page size that divides that number
+            is preferred when it is close to the tuned size; otherwise the new page overlaps the previous ones.
+        '''
+        page_size = self._get_url_page_size(URL)
+        parsed_url = urlparse(URL)
+        query = parse_qs(parsed_url.query, keep_blank_values=True)
+
+        if page_size is None or 'page' not in query or not REQUESTED:
+            return URL, 0
+
+        if FAILED:
+            self.page_size_controller.record_error(KEY, page_size)
+        desired = self.page_size_controller.get_page_size(KEY, REQUESTED)
+        if desired == page_size:
+            return URL, 0
+
+        new_size = desired
+        while DONE_ITEM % new_size and new_size > 0.8 * desired:
+            new_size -= 1
+        if DONE_ITEM % new_size or new_size == page_size:
+            new_size = desired
+
+        page = DONE_ITEM // new_size + 1
+        query['page-size'] = [str(new_size)]
+        query['page'] = [str(page)]
+        return urlunparse(parsed_url._replace(query=urlencode(query, doseq=True))), DONE_ITEM - (page - 1) * new_size
+
+    def _get_first_page(self, PARAM_DICT, END_POINT):
+        '''
+            Retrieves the first page of a query with the page size tuned by the page size controller,
+            lowering it while the server cannot return the page.
+            Returns the raw json and the results of the page.
         '''
         params = PARAM_DICT
         end_point = END_POINT
 
-        # Retrieve the first page of data
-        for i in range(4):
-            response = requests.get(self.MINDAT_API_URL+ "/" + end_point + "/",
-                            params=params,
-                            headers=self._headers)
+        key = self.page_size_controller.get_key(end_point, params)
+        if 'page-size' in params and 'page' not in params:
+            params['page-size'] = self.page_size_controller.get_page_size(key, params['page-size'])
+
+        while True:
+            started_at = time.monotonic()
+            try:
+                response = self._request(self.MINDAT_API_URL+ "/" + end_point + "/", params)
+            except self.retry_policy.retryable_exceptions:
+                # The retries timed out or lost the connection; a smaller page may still go through
+                if not self._shrink_page_size(params, key):
+                    raise
+                continue
             
-            if len(response.url) > 4097:
+            if len(response.url) > self.MAX_URL_LENGTH:
                 raise ValueError("Search query to big, reduce the size of the search and try again.")
-            
+
+            # Rate limiting and server errors are not page size problems; the transport has already retried them
+            self._raise_for_server_error(response)
+
             try:
                 response_json = response.json()
                 result_data = response_json["results"]
+                self._record_page(key, params.get('page-size'), response, started_at)
                 break
             except KeyError:
                 # This error indicates the result only has one page
@@ -245,93 +628,662 @@ class MindatApi:
                 result_data = response_json
                 break
             except ValueError:
-                if(params['page-size'] < 150):
+                if not self._shrink_page_size(params, key):
                     raise ValueError(str(response.reason))
-                params['page-size'] = int(params['page-size']/2)
-                print("page size too big, reducing and trying again. New size: ", params['page-size'])
             except:
                 raise ValueError(str(response.reason))
+
+        return response_json, result_data
+
+    def _get_url_length(self, END_POINT, PARAM_DICT):
+        return len(self.MINDAT_API_URL + "/" + END_POINT + "/?" + urlencode(encode_params(PARAM_DICT)))
+
+    def _split_oversized_query(self, PARAM_DICT, END_POINT):
+        '''
+            Returns None if the URLs of the query are within MAX_URL_LENGTH. Otherwise, splits the largest list-valued
+            parameter (a list, or one of SPLITTABLE_PARAMS) into chunks that fit, and returns one query per chunk;
+            together, they return the results of the original query. Returns None if no parameter can be split.
+        '''
+        # The `next` links of later pages add a page number to the URL of the query
+        max_url_length = self.MAX_URL_LENGTH - len(self.PAGE_PARAM_ROOM)
+        url_length = self._get_url_length(END_POINT, PARAM_DICT)
+        if url_length <= max_url_length or 'page' in PARAM_DICT:
+            return None
+
+        candidates = {}
+        for key, value in PARAM_DICT.items():
+            if isinstance(value, (list, tuple)):
+                values = list(value)
+            elif key in self.SPLITTABLE_PARAMS and isinstance(value, str):
+                values = [item.strip() for item in value.split(',') if item.strip()]
+            else:
+                continue
+            values = list(dict.fromkeys(values))
+            if len(values) > 1:
+                candidates[key] = values
+        if not candidates:
+            return None
+
+        key = max(candidates, key=lambda name: len(urlencode(encode_params({name: PARAM_DICT[name]}))))
+        values = candidates[key]
+        if key in self.SPLITTABLE_PARAMS and all(str(value).isdigit() for value in values):
+            # Ids are fetched in ascending order, so the chunks follow the default ordering of the results
+            values = sorted(values, key=int)
+
+        base_params = {name: value for name, value in PARAM_DICT.items() if name != key}
+        budget = max_url_length - self._get_url_length(END_POINT, base_params)
+
+        if isinstance(PARAM_DICT[key], (list, tuple)):
+            # Every value is sent as &key=value
+            value_lengths = [len(urlencode({key: value})) + 1 for value in values]
         else:
-            raise ValueError(str(response.reason))
-        
-        # Format the obtained data in a JSON dict
-        json_data = {"results": result_data}
+            # Values are joined by commas, encoded as %2C
+            value_lengths = [len(urlencode({'': value})) - 1 + len('%2C') for value in values]
 
-        # Check if the query involves multiple pages
-        multipage_flag = self._is_multipage_query(params, response.json())
-        
-        if True == multipage_flag:
-            # Create the progress bar
-            total_item = response.json().get("count", None)
-            item_per_request = len(response.json()["results"])
+        key_length = len('&' + key + '=')
+        if key_length + max(value_lengths) > budget:
+            # Even a single value does not fit next to the other parameters
+            return None
+
+        chunks, chunk, chunk_length = [], [], key_length
+        for value, value_length in zip(values, value_lengths):
+            if chunk and chunk_length + value_length > budget:
+                chunks.append(chunk)
+                chunk, chunk_length = [], key_length
+            chunk.append(value)
+            chunk_length += value_length
+        chunks.append(chunk)
+
+        queries = []
+        for chunk in chunks:
+            query = dict(base_params)
+            query[key] = chunk if isinstance(PARAM_DICT[key], (list, tuple)) else ','.join(str(value) for value in chunk)
+            queries.append(query)
+        return queries
+
+    def _iter_chunked_pages(self, QUERIES, END_POINT, VERBOSE = 2):
+        '''
+            Runs the chunks of a split query on a pool of workers and yields their pages in chunk order,
+            dropping records (by id) already returned by an earlier chunk.
+        '''
+        workers = self.concurrency if self.concurrency > 1 else self.LOOKUP_CONCURRENCY
+        ordering = any('ordering' in query for query in QUERIES)
+        if ordering and VERBOSE > 0:
+            print("The query is too long for one request and is split in " + str(len(QUERIES)) + " parts; the ordering applies within each part.")
+
+        def fetch(QUERY):
+            return [page for page, next_url, total_item, item_per_request in self._iter_pages_with_next(dict(QUERY), END_POINT, 0, CONCURRENCY=1)]
+
+        pbar = tqdm(total=len(QUERIES), desc="Fetching query parts") if VERBOSE == 2 else None
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = deque()
+        seen_ids = set()
+        try:
+            queries = deque(QUERIES)
+            while queries and len(pending) < workers:
+                pending.append(executor.submit(fetch, queries.popleft()))
+
+            while pending:
+                pages = pending.popleft().result()
+                if queries:
+                    pending.append(executor.submit(fetch, queries.popleft()))
+                if pbar is not None:
+                    pbar.update(1)
+                for page in pages:
+                    yield self._drop_seen_records(page, seen_ids)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if pbar is not None:
+                pbar.close()
+
+    @staticmethod
+    def _drop_seen_records(PAGE, SEEN_IDS):
+        '''
+            Returns the records of a page whose id is not in SEEN_IDS, and adds their ids to it.
+        '''
+        if isinstance(PAGE, dict): #special case for locgeoregion2
+            features = [feature for feature in PAGE.get("features", []) if not MindatApi._is_seen(feature, SEEN_IDS)]
+            return dict(PAGE, features=features)
+        return [record for record in PAGE if not MindatApi._is_seen(record, SEEN_IDS)]
+
+    @staticmethod
+    def _is_seen(RECORD, SEEN_IDS):
+        record_id = RECORD.get('id') if isinstance(RECORD, dict) else None
+        if record_id is None:
+            return False
+        if record_id in SEEN_IDS:
+            return True
+        SEEN_IDS.add(record_id)
+        return False
+
+    def iter_pages(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        '''
+            Yields the results of each page as soon as it arrives,
+            so only one page (or self.concurrency pages in parallel mode) is held in memory.
+            With self.concurrency > 1, the pages after the first are fetched in parallel and still yielded in order.
+            With self.shard_size, the query is split into ID ranges fetched in parallel (see _iter_sharded_pages).
+            A query whose URL is too long for the server is split into several queries (see _split_oversized_query).
+        '''
+        queries = self._split_oversized_query(PARAM_DICT, END_POINT)
+        if queries:
+            yield from self._iter_chunked_pages(queries, END_POINT, VERBOSE)
+            return
+
+        if self.shard_size and 'page' not in PARAM_DICT:
+            if 'ordering' not in PARAM_DICT:
+                yield from self._iter_sharded_pages(PARAM_DICT, END_POINT, VERBOSE)
+                return
+            print("Results with a custom ordering cannot be split into ID ranges; fetching them page by page.")
+
+        for page, next_url, total_item, item_per_request in self._iter_pages_with_next(PARAM_DICT, END_POINT, VERBOSE):
+            yield page
+
+    def _iter_pages_with_next(self, PARAM_DICT, END_POINT, VERBOSE = 2, RESUME_STATE = None, CONCURRENCY = None):
+        '''
+            Yields (page results, URL of the following page, item count, page size) for each page,
+            so a download can be checkpointed and later resumed.
+            With RESUME_STATE (the state of a HarvestCheckpoint), the first page is skipped
+            and the query continues at RESUME_STATE['next_url'].
+            CONCURRENCY overrides self.concurrency for the pages of this query.
+        '''
+        params = PARAM_DICT
+        end_point = END_POINT
+        concurrency = CONCURRENCY if CONCURRENCY else self.concurrency
+        requested_page_size = params.get('page-size')
+
+        if RESUME_STATE is None:
+            # Retrieve the first page of data
+            response_json, result_data = self._get_first_page(params, end_point)
+
+            # Check if the query involves multiple pages
+            multipage_flag = self._is_multipage_query(params, response_json)
+
+            if False == multipage_flag:
+                yield result_data, None, None, None
+                return
+
+            total_item = response_json.get("count", None)
+            item_per_request = len(response_json["results"])
+            next_url = response_json.get("next")
+            done_item = item_per_request
+        else:
+            result_data = None
+            total_item = RESUME_STATE['count']
+            item_per_request = RESUME_STATE['page_size']
+            next_url = RESUME_STATE['next_url']
+            done_item = RESUME_STATE['records_written']
+
+        # Create the progress bar
+        if VERBOSE == 2:
+            pbar = tqdm(total=total_item, desc="Fetching data") if total_item is not None else tqdm(desc="Fetching data")
+            pbar.update(done_item)
+        else:
+            pbar = None
+
+        try:
+            if result_data is not None:
+                yield result_data, next_url, total_item, item_per_request
+
+            # Fetch the remaining pages in parallel when the page set can be computed from the count
+            page_urls = None
+            if concurrency > 1 and next_url and total_item and not isinstance(result_data, dict):
+                page_urls = self._get_page_urls(next_url, total_item, item_per_request)
+
+            if page_urls:
+                for index, new_results in enumerate(self._iter_pages_concurrently(page_urls)):
+                    if VERBOSE == 2:
+                        pbar.update(len(new_results))
+                    next_url = page_urls[index + 1] if index + 1 < len(page_urls) else None
+                    yield new_results, next_url, total_item, item_per_request
+                return
+
+            # Otherwise follow the next links one by one, tuning the page size as pages arrive
+            key = self.page_size_controller.get_key(end_point, params)
+            while next_url:
+                next_url, skip_item = self._adapt_page_url(next_url, done_item, key, requested_page_size)
+                while True:
+                    started_at = time.monotonic()
+                    try:
+                        response = self._request(next_url)
+                        break
+                    except self.retry_policy.retryable_exceptions:
+                        # The retries timed out or lost the connection; a smaller page may still go through
+                        smaller_url, skip_item = self._adapt_page_url(next_url, done_item, key, requested_page_size, FAILED=True)
+                        if smaller_url == next_url:
+                            raise
+                        next_url = smaller_url
+
+                self._raise_for_server_error(response)
+                page_json = response.json()
+                self._record_page(key, self._get_url_page_size(next_url), response, started_at)
+
+                # Drop the items of a resized page that previous pages already returned
+                new_results = page_json['results'][skip_item:]
+                if VERBOSE == 2:
+                    pbar.update(len(new_results))
+                done_item += len(new_results)
+
+                next_url = page_json["next"]
+                yield new_results, next_url, total_item, item_per_request
+        finally:
+            # Close the progress bar
             if VERBOSE == 2:
-                pbar = tqdm(total=total_item, desc="Fetching data") if total_item is not None else tqdm(desc="Fetching data")
-                pbar.update(item_per_request)
+                pbar.close()
+
+    def _count_items(self, PARAM_DICT, END_POINT, ID_MIN = None, ID_MAX = None):
+        '''
+            Returns the number of items of a query within an ID range, with a single one-item request.
+        '''
+        params = dict(PARAM_DICT)
+        params.update({'page-size': 1, 'id_min': ID_MIN, 'id_max': ID_MAX})
+        params.pop('page', None)
+
+        response = self._request(self.MINDAT_API_URL + "/" + END_POINT + "/", params)
+        try:
+            return int(response.json()["count"])
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("The endpoint " + END_POINT + " did not return an item count for an ID range: " + str(response.reason))
+
+    def _get_id_range(self, PARAM_DICT, END_POINT, ID_MIN = None, ID_MAX = None):
+        '''
+            Returns (lowest ID, highest ID, item count) of the query.
+            Without ID_MAX, the highest ID is found by an exponential then binary search on the item count.
+        '''
+        low = int(ID_MIN) if ID_MIN is not None else 1
+        total_item = self._count_items(PARAM_DICT, END_POINT, low, ID_MAX)
+
+        if ID_MAX is not None or 0 == total_item:
+            return low, int(ID_MAX) if ID_MAX is not None else low, total_item
+
+        # Find an ID above every item, then the lowest ID with no item at or above it
+        step = 1024
+        while self._count_items(PARAM_DICT, END_POINT, low + step, None) > 0:
+            step *= 2
+        above, below = low + step, low + step // 2
+        while above - below > 1:
+            middle = (above + below) // 2
+            if self._count_items(PARAM_DICT, END_POINT, middle, None) > 0:
+                below = middle
             else:
-                pbar = None
+                above = middle
 
-            # Try if multipage download is needed
-            while True:
-                
-                next_url = response.json()["next"]
-                
-                if next_url:
-                    for server_fail_count in range(4):
-                        try:
-                            response = self.get_results(next_url, json_data, pbar, VERBOSE)
-                            if VERBOSE == 2:
-                                pbar.set_postfix()
-                            break
-                        except JSONDecodeError as e:
-                            if VERBOSE == 2:
-                                pbar.set_postfix({'retry attempt': server_fail_count})
-                            time.sleep(5*server_fail_count)
-                    else:
-                        raise JSONDecodeError("\nServer was not able to resolve the search, please try again.", next_url, 0)
-                else:
-                    break    
-                
-            # Close the progress bar
-            
+        return low, below, total_item
+
+    def _fetch_shard(self, PARAM_DICT, END_POINT, ID_MIN, ID_MAX, SHARD_SIZE):
+        '''
+            Fetches the pages of one ID range in order, or, if the range turns out to hold
+            more than twice SHARD_SIZE items, returns the smaller ranges to fetch instead.
+            Returns ('pages', list of pages) or ('split', list of (id_min, id_max)).
+        '''
+        params = dict(PARAM_DICT)
+        params.update({'id_min': ID_MIN, 'id_max': ID_MAX})
+
+        pages = []
+        for page, next_url, total_item, item_per_request in self._iter_pages_with_next(params, END_POINT, 0, CONCURRENCY=1):
+            if not pages and next_url and total_item and total_item > 2 * SHARD_SIZE and ID_MAX > ID_MIN:
+                # The range is denser than expected: split it according to its observed density
+                parts = min(math.ceil(total_item / SHARD_SIZE), ID_MAX - ID_MIN + 1)
+                width = math.ceil((ID_MAX - ID_MIN + 1) / parts)
+                return 'split', [(start, min(start + width - 1, ID_MAX)) for start in range(ID_MIN, ID_MAX + 1, width)]
+            pages.append(page)
+
+        return 'pages', pages
+
+    def _iter_sharded_pages(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        '''
+            Yields the pages of a query split into ID ranges (shards) with id_min/id_max,
+            for endpoints that support these filters.
+
+            The shards are sized from the average density of the ID space to hold about self.shard_size items.
+            Up to self.concurrency shards are fetched at the same time, each following its own `next` links,
+            and a shard that holds far more items than expected is split further once its item count is known.
+            Shards are yielded in ID order, so the merged result is the same as a single linear query ordered by ID.
+        '''
+        params = dict(PARAM_DICT)
+        id_min = params.pop('id_min', None)
+        id_max = params.pop('id_max', None)
+        shard_size = self.shard_size
+
+        low, high, total_item = self._get_id_range(params, END_POINT, id_min, id_max)
+        if 0 == total_item:
+            yield []
+            return
+
+        width = max(1, math.ceil(shard_size * (high - low + 1) / total_item))
+        shards = deque((start, min(start + width - 1, high)) for start in range(low, high + 1, width))
+
+        if VERBOSE == 2:
+            pbar = tqdm(total=total_item, desc="Fetching data")
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        pending = deque()
+        try:
+            while shards or pending:
+                while shards and len(pending) < self.concurrency:
+                    start, end = shards.popleft()
+                    pending.append(executor.submit(self._fetch_shard, params, END_POINT, start, end, shard_size))
+
+                kind, value = pending.popleft().result()
+
+                if 'split' == kind:
+                    # The smaller shards take the place of the split one, ahead of the shards already submitted
+                    pending.extendleft(reversed([
+                        executor.submit(self._fetch_shard, params, END_POINT, start, end, shard_size)
+                        for start, end in value
+                    ]))
+                    continue
+
+                for page in value:
+                    if VERBOSE == 2:
+                        pbar.update(len(page))
+                    yield page
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
             if VERBOSE == 2:
                 pbar.close()
-            
+
+    def iter_records(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        '''
+            Yields the items of a query one by one as their pages arrive.
+        '''
+        for page in self.iter_pages(PARAM_DICT, END_POINT, VERBOSE):
+            if isinstance(page, dict): #special case for locgeoregion2
+                yield from page.get("features", [])
+            else:
+                yield from page
+
+    def get_mindat_json(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        '''
+            get all items in a list
+            Since this API has a limit of 1500 items per page,
+            we need to loop through all pages and save them to a single json file
+            This collects iter_pages() into a single dict
+        '''
+        json_data = None
+
+        for page in self.iter_pages(PARAM_DICT, END_POINT, VERBOSE):
+            if json_data is None:
+                # Format the obtained data in a JSON dict
+                json_data = {"results": page}
+            elif isinstance(json_data["results"], dict): #special case for locgeoregion2
+                json_data["results"]["features"] += page["features"]
+            else:
+                json_data["results"] += page
+
         return json_data
     
     def _is_multipage_query(self, PARAM, RAW_JSON):
         if 'page' in PARAM:
             return False
-        
-        raw_json = RAW_JSON
-        try:
-            result_data = raw_json["results"]
-        except:
-            return False
 
-        return True
+        return isinstance(RAW_JSON, dict) and "results" in RAW_JSON
 
-    def download_mindat_json(self, QUERY_DICT, END_POINT, OUTDIR = '', FILE_NAME = '', VERBOSE = 2):
+    def _get_output_path(self, OUTDIR, FILE_NAME, FORMAT, COMPRESSION):
+        '''
+            Returns the output file path and its compression for an output FORMAT.
+            Parquet files are compressed internally, so their name gets no compression extension.
+        '''
+        extension = get_format_extension(FORMAT)
+
+        if 'parquet' == FORMAT:
+            file_name, name_compression = split_compression_extension(FILE_NAME)
+            compression = COMPRESSION if COMPRESSION else name_compression
+            get_compression_extension(compression)
+            if file_name.endswith(extension):
+                file_name = file_name[:-len(extension)]
+            return self.get_file_path(OUTDIR, file_name, extension), compression
+
+        file_path = self.get_file_path(OUTDIR, FILE_NAME, extension, COMPRESSION)
+        return file_path, split_compression_extension(file_path)[1]
+
+    def download_mindat_json(self, QUERY_DICT, END_POINT, OUTDIR = '', FILE_NAME = '', VERBOSE = 2, FORMAT = 'json', COMPRESSION = None, RESUME = False):
         '''
             get all items in a list
             Since this API has a limit of 1000 items per page,
             we need to loop through all pages and save them to a single json file
+            Pages are written as they arrive, so memory use does not grow with the size of the result.
+            FORMAT is 'json' (indented document), 'json-compact', 'ndjson' (one record per line)
+            or 'parquet' (one row group per page, requires pyarrow).
+            COMPRESSION is None, 'gzip' or 'zstd'; it can also be given as the extension of FILE_NAME.
+            With RESUME=True, the download is checkpointed after every page and an interrupted download
+            of the same query to the same file continues where it stopped (see HarvestCheckpoint).
         '''
-        # get the json data
-        json_data = self.get_mindat_json(QUERY_DICT, END_POINT, VERBOSE)
-
         # The default output name is same as the endpoint
         file_name = FILE_NAME if FILE_NAME else END_POINT   
 
         # Getting the directory for the output file
-        file_path = self.get_file_path(OUTDIR, file_name)
+        file_path, compression = self._get_output_path(OUTDIR, file_name, FORMAT, COMPRESSION)
+
+        # Write to a temporary file first, so a failed download does not leave a truncated output behind
+        part_path = file_path.with_name(file_path.name + '.part')
+
+        if RESUME and self.shard_size:
+            raise ValueError("RESUME cannot be combined with ID range sharding.")
+        if RESUME and 'parquet' == FORMAT:
+            raise ValueError("RESUME is not available for the parquet format, which is only readable once complete.")
+
+        if RESUME:
+            writer = self._download_checkpointed(QUERY_DICT, END_POINT, FORMAT, part_path, compression, HarvestCheckpoint(file_path), VERBOSE)
+        else:
+            try:
+                with open_results_writer(FORMAT, part_path, compression) as writer:
+                    for page in self.iter_pages(QUERY_DICT, END_POINT, VERBOSE):
+                        writer.write_page(page)
+            except BaseException:
+                # Without a checkpoint, the partial output cannot be resumed
+                part_path.unlink(missing_ok=True)
+                raise
+
+        os.replace(part_path, file_path)
 
-        # Create and write the json data to the file
-        with open(file_path, 'w') as f:
-            json.dump(json_data, f, indent=4)   
+        if RESUME:
+            HarvestCheckpoint(file_path).remove()
 
         if VERBOSE > 0:
-            print("Successfully saved " + str(len(json_data['results'])) + " entries to " + str(file_path.resolve()))
-        
+            print("Successfully saved " + str(writer.count) + " entries to " + str(file_path.resolve()))
+
+    def _iter_resumable_pages(self, PARAM_DICT, END_POINT, VERBOSE = 2, POSITION = None):
+        '''
+            Yields (page results, position) for each page of a query, where position tells where the query
+            continues after the page: the index of the part of a split query ('chunk'), the URL of its next page
+            ('next_url', None to start the part), and what _iter_pages_with_next needs to continue from it.
+            With POSITION, the query continues from there. A query whose URL is too long for the server is split
+            as in iter_pages, and its parts are fetched one after the other, dropping records already returned.
+        '''
+        queries = self._split_oversized_query(PARAM_DICT, END_POINT) or [PARAM_DICT]
+        position = POSITION or {'chunk': 0, 'next_url': None}
+        seen_ids = set(position.get('seen_ids', ())) if len(queries) > 1 else None
+        verbose = VERBOSE if len(queries) == 1 else 0
+
+        for chunk in range(position['chunk'], len(queries)):
+            resume_state = None
+            if chunk == position['chunk'] and position['next_url']:
+                resume_state = {'next_url': position['next_url'], 'count': position['count'],
+                                'page_size': position['page_size'], 'records_written': position['done']}
+            done_item = resume_state['records_written'] if resume_state else 0
+
+            for page, next_url, total_item, item_per_request in self._iter_pages_with_next(dict(queries[chunk]), END_POINT, verbose, resume_state):
+                done_item += len(page.get("features", []) if isinstance(page, dict) else page)
+                if seen_ids is not None:
+                    page = self._drop_seen_records(page, seen_ids)
+
+                if next_url:
+                    position = {'chunk': chunk, 'next_url': next_url, 'count': total_item, 'page_size': item_per_request, 'done': done_item}
+                else:
+                    position = {'chunk': chunk + 1, 'next_url': None}
+                if seen_ids is not None:
+                    position['seen_ids'] = sorted(seen_ids)
+                yield page, position
+
+    def _download_checkpointed(self, QUERY_DICT, END_POINT, FORMAT, PART_PATH, COMPRESSION, CHECKPOINT, VERBOSE = 2):
+        '''
+            Appends the pages of a query to PART_PATH, recording in CHECKPOINT after every page the size of the file
+            and where the query continues. If CHECKPOINT holds a partial download of the same query, PART_PATH is
+            truncated to its recorded size and the download continues from there. Returns the writer.
+        '''
+        checkpoint = CHECKPOINT
+        query = dict(QUERY_DICT)
+
+        if checkpoint.load(END_POINT, query, FORMAT) and PART_PATH.exists() and PART_PATH.stat().st_size >= checkpoint.state['offset']:
+            if VERBOSE > 0:
+                print("Resuming from checkpoint: " + str(checkpoint.state['records_written']) + " entries already downloaded")
+        else:
+            checkpoint.start(END_POINT, query, FORMAT)
+
+        state = checkpoint.state
+        with CheckpointedFile(PART_PATH, COMPRESSION, state['offset']) as f:
+            writer = get_results_writer(FORMAT, f)
+            writer.resume(state['records_written'])
+
+            for page, position in self._iter_resumable_pages(QUERY_DICT, END_POINT, VERBOSE, state['position']):
+                writer.write_page(page)
+                # Results held until the end (GeoJSON) cannot be resumed; the checkpoint then stays at the start
+                if not writer.holds_results:
+                    checkpoint.update(f.commit(), writer.count, position)
+
+            writer.close()
+            f.commit()
+        return writer
+
+    def get_arrow_table(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        '''
+            get all items as a pyarrow.Table
+            Each page is converted to a record batch as it arrives, so the json of only one page is held in memory.
+        '''
+        builder = ArrowBatchBuilder()
+        batches = [builder.to_batch(page) for page in self.iter_pages(PARAM_DICT, END_POINT, VERBOSE)]
+        return builder.to_table(batches)
+
+    def _get_by_id(self, END_POINT, ID, PARAM_DICT):
+        '''
+            Fetches a single record from END_POINT/ID. Returns None if there is no record with that id.
+        '''
+        params = {key: value for key, value in PARAM_DICT.items() if key != 'page-size'}
+        response = self._request(self.MINDAT_API_URL + "/" + END_POINT + "/" + str(ID) + "/", params)
+
+        if 404 == response.status_code:
+            return None
+        if 200 != response.status_code:
+            raise ValueError(str(response.reason))
+        return response.json()
+
+    def _get_id_in_chunk(self, END_POINT, IDS, PARAM_DICT):
+        '''
+            Fetches the records of a chunk of ids with one id_in query on the list endpoint.
+            Returns an empty list if the endpoint ignores the filter, so the ids are looked up one by one.
+        '''
+        params = dict(PARAM_DICT)
+        params['id_in'] = ','.join(str(id) for id in IDS)
+        params['page-size'] = len(IDS)
+
+        records = []
+        for page, next_url, total_item, item_per_request in self._iter_pages_with_next(params, END_POINT, 0, CONCURRENCY=1):
+            if total_item is not None and total_item > len(IDS):
+                return []
+            records += page
+        return records
+
+    def get_many(self, END_POINT, IDS, PARAM_DICT = None, VERBOSE = 2, ID_IN = True):
+        '''
+            Returns the records of END_POINT with the given ids as a dict keyed by id, in the order of IDS.
+            Duplicate ids are fetched once, and ids without a record map to None.
+            With ID_IN=True, the ids are fetched in chunks of ID_IN_CHUNK_SIZE with id_in queries on the
+            list endpoint; the ids these do not return, or all of them with ID_IN=False, are fetched one by one.
+            Chunks and single lookups run on self.concurrency workers, or LOOKUP_CONCURRENCY if it is 1.
+        '''
+        try:
+            ids = list(dict.fromkeys(int(id) for id in IDS))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid input. IDS must be a list of integers.")
+
+        params = dict(PARAM_DICT or {})
+        params.pop('id_in', None)
+        records = {}
+        workers = self.concurrency if self.concurrency > 1 else self.LOOKUP_CONCURRENCY
+        pbar = tqdm(total=len(ids), desc="Fetching records") if VERBOSE == 2 else None
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                if ID_IN:
+                    chunks = [ids[i:i + self.ID_IN_CHUNK_SIZE] for i in range(0, len(ids), self.ID_IN_CHUNK_SIZE)]
+                    for chunk, chunk_records in zip(chunks, executor.map(lambda chunk: self._get_id_in_chunk(END_POINT, chunk, params), chunks)):
+                        chunk_ids = set(chunk)
+                        found = [record for record in chunk_records if isinstance(record, dict) and record.get('id') in chunk_ids]
+                        for record in found:
+                            records[record['id']] = record
+                        if pbar is not None:
+                            pbar.update(len(found))
+
+                missing = [id for id in ids if id not in records]
+                for id, record in zip(missing, executor.map(lambda id: self._get_by_id(END_POINT, id, params), missing)):
+                    records[id] = record
+                    if pbar is not None:
+                        pbar.update(1)
+        finally:
+            if pbar is not None:
+                pbar.close()
+
+        if VERBOSE > 0:
+            print("Successfully retrieved " + str(sum(record is not None for record in records.values())) + " of " + str(len(ids)) + " entries from " + END_POINT)
+        return {id: records.get(id) for id in ids}
+
+    def sync_mindat_json(self, PARAM_DICT, END_POINT, STORE = None, VERBOSE = 2, FULL = False):
+        '''
+            Mirrors the results of a query into a LocalStore, fetching only the records updated since the last sync.
+            The latest updttime seen is recorded as the high-water mark of the query once all pages are stored,
+            so an interrupted sync starts again from the previous mark. An updated_at in PARAM_DICT is the
+            starting point of the first sync. With FULL=True, every record is fetched again, and for a query
+            without filters, the stored records that are no longer returned are deleted.
+            Returns the number of records fetched.
+        '''
+        store = resolve_store(STORE)
+        params = dict(PARAM_DICT)
+        high_water_mark = None if FULL else store.get_high_water_mark(END_POINT, params)
+
+        if high_water_mark:
+            params['updated_at'] = high_water_mark
+        elif FULL:
+            params.pop('updated_at', None)
+
+        # The high-water mark is read from the updttime of the records
+        fields = params.get('fields')
+        if fields and '*' not in fields.split(',') and 'updttime' not in fields.split(','):
+            params['fields'] = fields + ',updttime'
+
+        started_at = datetime.now().replace(microsecond=0)
+        latest = parse_timestamp(high_water_mark or params.get('updated_at'))
+        missing_updttime = False
+        synced_ids = []
+        fetched = 0
+
+        for page in self.iter_pages(params, END_POINT, VERBOSE):
+            records = page.get("features", []) if isinstance(page, dict) else page
+            fetched += store.upsert(END_POINT, records)
+            for record in records:
+                updttime = parse_timestamp(record.get('updttime'))
+                if updttime is None:
+                    missing_updttime = True
+                elif latest is None or updttime > latest:
+                    latest = updttime
+                if FULL:
+                    synced_ids.append(record.get('id'))
+
+        if missing_updttime and latest is None:
+            # Without updttime, fall back to the local start time of this sync
+            latest = started_at
+
+        if FULL and not store.get_filters(params):
+            deleted = store.delete_missing(END_POINT, synced_ids)
+            if VERBOSE > 0 and deleted:
+                print("Deleted " + str(deleted) + " entries no longer returned by " + END_POINT)
+
+        store.set_high_water_mark(END_POINT, PARAM_DICT, format_timestamp(latest) if latest else high_water_mark, fetched)
+
+        if VERBOSE > 0:
+            print("Successfully synced " + str(fetched) + " updated entries to " + str(store.path.resolve())
+                  + " (" + str(store.count(END_POINT)) + " entries in " + store.get_table(END_POINT) + ")")
+        return fetched
+
 if __name__ == '__main__':
     # test if api key is valid
     ma = MindatApi()
\ No newline at end of file
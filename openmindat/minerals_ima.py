@@ -1,7 +1,8 @@
 from . import mindat_api
+from .retriever_mixin import RetrieverMixin
 from datetime import datetime
 
-class MineralsIMARetriever:
+class MineralsIMARetriever(RetrieverMixin):
     '''
     A class for querying mineral data from the Mindat API. It supports various query parameters such as mineral IDs, IMA status, fields selection, and pagination. The class enables method chaining for building complex queries and provides functionalities to save the queried data either to a specified directory or the current directory.
     For more information visit: https://api.mindat.org/schema/redoc/#tag/minerals_ima
@@ -15,7 +16,8 @@ class MineralsIMARetriever:
 
     BASE_ENDPOINT = 'v1/minerals-ima'
 
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = self.BASE_ENDPOINT
         self.verbose_flag = 2
         self._params = {}
@@ -292,34 +294,6 @@ class MineralsIMARetriever:
         
         return self
     
-    def saveto(self, OUTDIR='', FILE_NAME = ''):
-        '''
-            Executes the query to retrieve the geomaterials with keywords and saves the results to a specified directory.
-
-            Args:
-                OUTDIR (str): The directory path where the retrieved geomaterials will be saved. If not provided, the current directory will be used.
-                FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-            Returns:
-                None
-
-            Example:
-                >>> mir = MineralsIMARetriever()
-                >>> mir.saveto("/path/to/directory")
-        '''
-
-        params = self._params
-        end_point = self.end_point
-        outdir = OUTDIR
-        verbose = self.verbose_flag
-        file_name = FILE_NAME
-
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # reset the query parameters in case the user wants to make another query
-        self._init_params()
-    
     def save(self, FILE_NAME = ''):
         '''
             Executes the query to retrieve the list of geomaterials and saves the results to the current directory.
@@ -353,9 +327,9 @@ class MineralsIMARetriever:
        
         params = self._params
         verbose = self.verbose_flag
-        end_point = self.end_point
+        end_point = self._get_end_point()
         
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
         
         self._init_params()
@@ -382,7 +356,7 @@ class MineralsIMARetriever:
         return object.__getattribute__(self, name)
         
         
-class MineralsIdRetriever:
+class MineralsIdRetriever(RetrieverMixin):
     """
     This module provides the MineralsIdRetriever class for returning Minerals by id
     For more information visit: https://api.mindat.org/schema/redoc/#tag/minerals_ima/operation/minerals_ima_retrieve
@@ -396,8 +370,11 @@ class MineralsIdRetriever:
     """
     
     BASE_ENDPOINT = 'v1/minerals-ima'
+    _supports_id_lookup = True
+    _supports_id_in = True
 
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = self.BASE_ENDPOINT
         self.verbose_flag = 2
         self.sub_endpoint = ''
@@ -486,33 +463,8 @@ class MineralsIdRetriever:
         
         return self
     
-    def saveto(self, OUTDIR = '', FILE_NAME = ''):
-        '''
-            Executes the query to retrieve the Minerals with keywords and saves the results to a specified directory.
-
-            Args:
-                OUTDIR (str): The directory path where the retrieved Minerals will be saved. If not provided, the current directory will be used.
-                FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-            Returns:
-                None
-
-            Example:
-                >>> midr = MineralsIdRetriever()
-                >>> midr.id(3).saveto("/path/to/directory", "Mineral_ima_id")
-        '''
-
-        params = self._params
-        end_point = '/'.join([self.end_point, self.sub_endpoint])
-        outdir = OUTDIR
-        file_name = FILE_NAME
-        verbose = self.verbose_flag
-
-        ma = mindat_api.MindatApi()
-        ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # reset the query parameters in case the user wants to make another query
-        self._init_params()
+    def _get_end_point(self):
+        return '/'.join([self.end_point, self.sub_endpoint])
     
     def save(self, FILE_NAME = ''):
         '''
@@ -547,9 +499,9 @@ class MineralsIdRetriever:
        
         params = self._params
         verbose = self.verbose_flag
-        end_point = '/'.join([self.end_point, self.sub_endpoint])
+        end_point = self._get_end_point()
         
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
         
         self._init_params()
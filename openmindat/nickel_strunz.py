@@ -1,8 +1,12 @@
+from pathlib import Path
+
 from . import mindat_api
+from .retriever_mixin import RetrieverMixin
+from .classification import StrunzTree
 
 #todo: Check back in when retrieve and id functions are implemented
 
-class StrunzRetriever:
+class StrunzRetriever(RetrieverMixin):
     """
     A class to facilitate the retrieval of nickel strunz 10 data from the Mindat API filtering with type of classes or subclasses.
     For more information visit: https://api.mindat.org/schema/redoc/#tag/nickel-strunz-10
@@ -15,6 +19,7 @@ class StrunzRetriever:
         families: returns family information
         classes: returns classes information
         subClasses: returns subClasses information
+        get_tree: returns the classification tree, cached on disk, for classifying geomaterials offline
 
     Usage:
         >>> sr = StrunzRetriever()
@@ -25,7 +30,8 @@ class StrunzRetriever:
 
     BASE_ENDPOINT = 'v1/nickel-strunz-10'
     
-    def __init__(self):
+    def __init__(self, SESSION=None):
+        self._session = SESSION
         self.end_point = self.BASE_ENDPOINT
         self.verbose_flag = 2
         self.sub_endpoint = '' 
@@ -184,37 +190,8 @@ class StrunzRetriever:
         
         return self
     
-    def saveto(self, OUTDIR = '', FILE_NAME = ''):
-        '''
-            Executes the query to retrieve the nickel strunz data with keywords and saves the results to a specified directory.
-
-            Args:
-                OUTDIR (str): The directory path where the retrieved nickel strunz data will be saved. If not provided, the current directory will be used.
-                FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
-
-            Returns:
-                None
-
-            Example:
-                >>> sr = strunzRetriever()
-                >>> sr.families.saveto("/path/to/directory")
-        '''
-
-        params = self._params
-        outdir = OUTDIR
-        end_point = '/'.join([self.end_point, self.sub_endpoint])
-        file_name = FILE_NAME
-        verbose = self.verbose_flag
-        
-        ma = mindat_api.MindatApi()
-        
-        if 'classes' in self.sub_endpoint:
-            ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-        else:
-            ma.download_mindat_json(params, end_point, outdir, file_name, verbose)
-
-        # Reset the query parameters in case the user wants to make another query.
-        self._init_params()
+    def _get_end_point(self):
+        return '/'.join([self.end_point, self.sub_endpoint])
     
     def save(self, FILE_NAME = ''):
         '''
@@ -248,14 +225,47 @@ class StrunzRetriever:
        
         params = self._params
         verbose = self.verbose_flag
-        end_point = '/'.join([self.end_point, self.sub_endpoint])
+        end_point = self._get_end_point()
         
-        ma = mindat_api.MindatApi()
+        ma = self._mindat_api()
         results = ma.get_mindat_json(params, end_point, verbose)
             
         self._init_params()
         return results
 
+    def get_tree(self, CACHE_PATH = StrunzTree.DEFAULT_PATH, REFRESH = False):
+        '''
+        Returns the Nickel-Strunz-10 classification as a StrunzTree, to look up codes and classify geomaterials without requests.
+        The tree is loaded from CACHE_PATH when it was saved there before; otherwise every level of the
+        classification is downloaded, joined into a tree and saved to CACHE_PATH.
+
+        Args:
+            CACHE_PATH (str): The gzipped json file caching the tree.
+            REFRESH (bool): If True, the classification is downloaded again.
+
+        Returns:
+            StrunzTree
+
+        Example:
+            >>> sr = StrunzRetriever()
+            >>> tree = sr.get_tree()
+            >>> tree.get_minerals("7")
+        '''
+        if not REFRESH and Path(CACHE_PATH).exists():
+            self._init_params()
+            return StrunzTree.load(CACHE_PATH)
+
+        params, end_point, verbose = self._take_query()
+
+        ma = self._mindat_api()
+        records = {
+            level: list(ma.iter_records(params, '/'.join([self.BASE_ENDPOINT, level]), verbose))
+            for level in StrunzTree.LEVELS
+        }
+        tree = StrunzTree(records)
+        tree.save(CACHE_PATH)
+        return tree
+
     def available_methods(self):
         '''
         Prints the available methods of the class.
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class PageSizeController:
+    '''
+    Tunes the page size of paginated queries from the latency, payload size and errors of their pages.
+
+    A tuned page size is kept per endpoint and per fields / expand / omit combination, since expanded
+    records can be many times larger than plain ones. After every page, the size is lowered in proportion
+    when the page took longer than TARGET_LATENCY seconds or was larger than MAX_PAYLOAD bytes, halved
+    after an error, and raised by GROWTH while pages are fast and small. The page size set on a query
+    (1500 by default) stays the upper limit. Tuned sizes are kept in memory, or saved to STATE_FILE when one
+    is given and reused by later runs.
+
+    Args:
+        MIN_PAGE_SIZE (int): The smallest page size the controller uses.
+        MAX_PAGE_SIZE (int): The largest page size the controller uses.
+        TARGET_LATENCY (float): The number of seconds a page should take at most.
+        MAX_PAYLOAD (int): The number of bytes a page should hold at most.
+        GROWTH (float): The factor by which the page size grows after a fast, small page.
+        STATE_FILE (str): An optional json file for keeping the tuned page sizes between runs.
+
+    Usage:
+        >>> controller = PageSizeController(TARGET_LATENCY=5, STATE_FILE='./.mindat_page_sizes.json')
+        >>> ma = MindatApi(PAGE_SIZE_CONTROLLER=controller)
+    '''
+
+    def __init__(self, MIN_PAGE_SIZE = 50, MAX_PAGE_SIZE = 1500, TARGET_LATENCY = 15.0, MAX_PAYLOAD = 32 * 1024 * 1024,
+                 GROWTH = 1.25, STATE_FILE = None):
+        self.min_page_size = int(MIN_PAGE_SIZE)
+        self.max_page_size = int(MAX_PAGE_SIZE)
+        self.target_latency = float(TARGET_LATENCY)
+        self.max_payload = int(MAX_PAYLOAD)
+        self.growth = float(GROWTH)
+        self.state_file = Path(STATE_FILE) if STATE_FILE else None
+
+        self._lock = threading.Lock()
+        self._page_sizes = self._load()
+
+    @staticmethod
+    def get_key(END_POINT, PARAM_DICT):
+        '''
+            Returns the key of the tuned page size of a query: the endpoint and its fields / expand / omit parameters.
+        '''
+        params = PARAM_DICT or {}
+        key = str(END_POINT).strip('/')
+        shape = ['{}={}'.format(name, params[name]) for name in ('fields', 'expand', 'omit') if params.get(name)]
+        if shape:
+            key += '?' + '&'.join(shape)
+        return key
+
+    def _load(self):
+        if self.state_file is None:
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                page_sizes = json.load(f)
+            return {key: int(value) for key, value in page_sizes.items()}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _save(self):
+        if self.state_file is None:
+            return
+        temp_path = self.state_file.with_name(self.state_file.name + '.tmp')
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._page_sizes, f, indent=4, sort_keys=True)
+            os.replace(temp_path, self.state_file)
+        except OSError:
+            # Tuning still works for this run if the state cannot be saved
+            pass
+
+    def _clamp(self, PAGE_SIZE):
+        return max(self.min_page_size, min(self.max_page_size, int(PAGE_SIZE)))
+
+    def get_page_size(self, KEY, REQUESTED):
+        '''
+            Returns the page size to use for a query that asked for REQUESTED items per page.
+        '''
+        requested = int(REQUESTED)
+        with self._lock:
+            tuned = self._page_sizes.get(KEY)
+        if tuned is None:
+            return requested
+        return max(1, min(requested, tuned))
+
+    def _set(self, KEY, PAGE_SIZE):
+        page_size = self._clamp(PAGE_SIZE)
+        with self._lock:
+            if self._page_sizes.get(KEY) == page_size:
+                return page_size
+            self._page_sizes[KEY] = page_size
+            self._save()
+        return page_size
+
+    def record_page(self, KEY, PAGE_SIZE, LATENCY, PAYLOAD_SIZE):
+        '''
+            Updates the tuned page size after a page of PAGE_SIZE items took LATENCY seconds and PAYLOAD_SIZE bytes.
+            Returns the new page size.
+        '''
+        page_size = int(PAGE_SIZE)
+        factor = 1.0
+
+        if LATENCY > self.target_latency:
+            factor = min(factor, self.target_latency / LATENCY)
+        if PAYLOAD_SIZE > self.max_payload:
+            factor = min(factor, self.max_payload / PAYLOAD_SIZE)
+        if factor == 1.0 and LATENCY < self.target_latency / 2 and PAYLOAD_SIZE < self.max_payload / 2:
+            factor = self.growth
+
+        with self._lock:
+            tuned = self._page_sizes.get(KEY)
+
+        if factor > 1:
+            if tuned is None:
+                # Pages of the requested size are fine; nothing to remember
+                return page_size
+            # A fast page smaller than the tuned size says nothing against the tuned size
+            return self._set(KEY, max(page_size * factor, tuned))
+        if factor < 1:
+            return self._set(KEY, page_size * factor)
+        return page_size
+
+    def record_error(self, KEY, PAGE_SIZE):
+        '''
+            Halves the tuned page size after the server failed to return a page of PAGE_SIZE items.
+            Returns the new page size, or None if it cannot go any lower.
+        '''
+        if int(PAGE_SIZE) <= self.min_page_size:
+            return None
+        return self._set(KEY, int(PAGE_SIZE) // 2)
+
+    def reset(self, KEY = None):
+        '''
+            Forgets the tuned page size of KEY, or of every query.
+        '''
+        with self._lock:
+            if KEY is None:
+                self._page_sizes.clear()
+            else:
+                self._page_sizes.pop(KEY, None)
+            self._save()
+
+
+_default_controller = None
+_default_controller_lock = threading.Lock()
+
+
+def get_default_page_size_controller():
+    '''
+        Returns the process-wide PageSizeController, creating it on first use.
+    '''
+    global _default_controller
+
+    with _default_controller_lock:
+        if _default_controller is None:
+            _default_controller = PageSizeController()
+        return _default_controller
+
+
+def set_default_page_size_controller(CONTROLLER):
+    '''
+        Replaces the process-wide PageSizeController. Passing None creates a new default one on next use.
+    '''
+    global _default_controller
+
+    with _default_controller_lock:
+        _default_controller = CONTROLLER
+    return CONTROLLER
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from pathlib import Path
+
+
+class RateLimiter:
+    '''
+    A token-bucket rate limiter for the requests sent to the Mindat API.
+
+    Every request takes one token; tokens are refilled at RATE per second, up to BURST tokens.
+    MAX_IN_FLIGHT caps the number of requests waiting for an answer at the same time.
+    One RateLimiter can be shared by any number of retrievers, MindatApi objects and threads.
+
+    With STATE_FILE, the bucket and the in-flight slots are kept in local files protected by file locks,
+    so separate processes using the same STATE_FILE share one budget. In-flight slots are released by the
+    operating system if a process dies. This mode requires a POSIX system.
+
+    When the server answers 429 with a Retry-After header, the limiter pauses every user for that long.
+
+    Args:
+        RATE (float): The number of requests per second. None for no rate limit.
+        BURST (int): The number of requests that can be sent at once after an idle period. Defaults to max(1, RATE).
+        MAX_IN_FLIGHT (int): The maximum number of concurrent requests. None for no limit.
+        STATE_FILE (str): An optional file for sharing the limits between processes.
+
+    Usage:
+        >>> limiter = RateLimiter(RATE=5, MAX_IN_FLIGHT=4)
+        >>> gr = GeomaterialRetriever().rate_limiter(limiter).concurrency(8)
+        >>> gr.saveto("/path/to/directory")
+    '''
+
+    # Seconds between two checks for a free in-flight slot
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, RATE = None, BURST = None, MAX_IN_FLIGHT = None, STATE_FILE = None):
+        if RATE is not None and float(RATE) <= 0:
+            raise ValueError("Invalid input. RATE must be a positive number.")
+        if MAX_IN_FLIGHT is not None and int(MAX_IN_FLIGHT) < 1:
+            raise ValueError("Invalid input. MAX_IN_FLIGHT must be a positive integer.")
+
+        self.rate = float(RATE) if RATE is not None else None
+        self.burst = float(BURST) if BURST is not None else max(1.0, self.rate or 1.0)
+        self.max_in_flight = int(MAX_IN_FLIGHT) if MAX_IN_FLIGHT is not None else None
+        self.state_file = Path(STATE_FILE) if STATE_FILE else None
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated_at = time.time()
+        self._paused_until = 0.0
+        self._slots = threading.BoundedSemaphore(self.max_in_flight) if self.max_in_flight else None
+
+        if self.state_file is not None:
+            try:
+                import fcntl
+            except ImportError:
+                raise ImportError("Sharing a RateLimiter between processes requires a POSIX system (fcntl).")
+            self._fcntl = fcntl
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+
+    def _take_token(self, TOKENS, UPDATED_AT, PAUSED_UNTIL, NOW):
+        '''
+            Refills the bucket and takes one token if possible.
+            Returns the new (tokens, updated_at) and the seconds to wait, 0 if the token was taken.
+        '''
+        if NOW < PAUSED_UNTIL:
+            return TOKENS, UPDATED_AT, PAUSED_UNTIL - NOW
+        if self.rate is None:
+            return TOKENS, NOW, 0.0
+
+        tokens = min(self.burst, TOKENS + (NOW - UPDATED_AT) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, NOW, 0.0
+        return tokens, NOW, (1 - tokens) / self.rate
+
+    @contextmanager
+    def _locked_state(self):
+        '''
+            Yields the shared bucket state {tokens, updated_at, paused_until} under an exclusive file lock
+            and writes it back afterwards.
+        '''
+        with open(self.state_file, 'a+', encoding='utf-8') as f:
+            self._fcntl.flock(f.fileno(), self._fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read())
+                except ValueError:
+                    state = {'tokens': self.burst, 'updated_at': time.time(), 'paused_until': 0.0}
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+            finally:
+                self._fcntl.flock(f.fileno(), self._fcntl.LOCK_UN)
+
+    def _reserve(self):
+        '''
+            Takes a token if one is available. Returns 0, or the seconds to wait before trying again.
+        '''
+        now = time.time()
+
+        if self.state_file is None:
+            with self._lock:
+                self._tokens, self._updated_at, wait = self._take_token(self._tokens, self._updated_at, self._paused_until, now)
+            return wait
+
+        with self._locked_state() as state:
+            state['tokens'], state['updated_at'], wait = self._take_token(
+                state['tokens'], state['updated_at'], state.get('paused_until', 0.0), now
+            )
+        return wait
+
+    def _try_acquire_slot(self):
+        '''
+            Takes an in-flight slot without blocking. Returns the slot to release, None if all are taken,
+            or True when there is no in-flight limit.
+        '''
+        if self.max_in_flight is None:
+            return True
+
+        if self.state_file is None:
+            return True if self._slots.acquire(blocking=False) else None
+
+        for index in range(self.max_in_flight):
+            f = open(self.state_file.with_name(self.state_file.name + '.slot' + str(index)), 'a')
+            try:
+                self._fcntl.flock(f.fileno(), self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+                return f
+            except OSError:
+                f.close()
+        return None
+
+    def _release_slot(self, SLOT):
+        if self.max_in_flight is None:
+            return
+        if self.state_file is None:
+            self._slots.release()
+            return
+
+        self._fcntl.flock(SLOT.fileno(), self._fcntl.LOCK_UN)
+        SLOT.close()
+
+    def _acquire_slot(self):
+        if self.max_in_flight is not None and self.state_file is None:
+            self._slots.acquire()
+            return True
+
+        slot = self._try_acquire_slot()
+        while slot is None:
+            time.sleep(self.POLL_INTERVAL)
+            slot = self._try_acquire_slot()
+        return slot
+
+    @contextmanager
+    def limit(self):
+        '''
+            Waits for an in-flight slot and a token, and holds the slot while the block runs.
+
+            Example:
+                >>> with limiter.limit():
+                ...     response = session.get(url)
+        '''
+        slot = self._acquire_slot()
+        try:
+            wait = self._reserve()
+            while wait > 0:
+                time.sleep(wait)
+                wait = self._reserve()
+            yield
+        finally:
+            self._release_slot(slot)
+
+    @asynccontextmanager
+    async def alimit(self):
+        '''
+            The asyncio counterpart of limit(); waiting does not block the event loop.
+        '''
+        slot = self._try_acquire_slot()
+        while slot is None:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            slot = self._try_acquire_slot()
+
+        try:
+            wait = self._reserve()
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self._reserve()
+            yield
+        finally:
+            self._release_slot(slot)
+
+    def pause(self, SECONDS):
+        '''
+            Stops handing out tokens for SECONDS, e.g. when the server asked to retry after that long.
+        '''
+        paused_until = time.time() + max(float(SECONDS), 0.0)
+
+        if self.state_file is None:
+            with self._lock:
+                self._paused_until = max(self._paused_until, paused_until)
+            return
+
+        with self._locked_state() as state:
+            state['paused_until'] = max(state.get('paused_until', 0.0), paused_until)
+
+
+_default_rate_limiter = None
+_default_rate_limiter_lock = threading.Lock()
+
+
+def get_default_rate_limiter():
+    '''
+        Returns the process-wide RateLimiter, or None when requests are not rate limited.
+    '''
+    return _default_rate_limiter
+
+
+def set_default_rate_limiter(RATE_LIMITER):
+    '''
+        Sets the RateLimiter used by every MindatApi and retriever that is not given its own.
+        Passing None removes the default rate limit.
+    '''
+    global _default_rate_limiter
+
+    with _default_rate_limiter_lock:
+        _default_rate_limiter = RATE_LIMITER
+    return RATE_LIMITER
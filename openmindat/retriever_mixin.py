@@ -0,0 +1,449 @@
+from . import mindat_api
+from . import async_api
+from .cache import ResponseCache
+from .retry import RetryPolicy
+from .rate_limit import RateLimiter
+from .sync import LocalStore
+from .local_query import LocalMindatApi, get_query_engine
+
+
+class RetrieverMixin:
+    """
+    Shared execution settings and methods for the retriever classes.
+
+    The retrievers keep their own query-building methods; this mixin holds the options that
+    control how a query is executed, such as the number of pages fetched in parallel,
+    and the execution methods shared by every retriever, such as saveto(), aget_dict() and asaveto().
+    Unlike the query parameters, the execution settings (concurrency, cache, retry policy, rate limiter, sharding, local mirror) are kept between queries.
+    """
+
+    _concurrency = 1
+    _cache = None
+    _retry_policy = None
+    _rate_limiter = None
+    _shard_size = None
+    # Set by the retrievers whose endpoint supports the id_min / id_max filters
+    _supports_id_range = False
+    # Set by the retrievers whose endpoint supports the updated_at filter
+    _supports_updated_at = False
+    # Set by the Id retrievers, which can look up many ids with get_many()
+    _supports_id_lookup = False
+    # Set by the Id retrievers whose list endpoint supports the id_in filter
+    _supports_id_in = False
+    _ids = None
+    # The query engine class of the retrievers that can answer their queries from a local mirror
+    _local_engine = None
+    _local = None
+
+    def concurrency(self, CONCURRENCY):
+        '''
+        Sets the number of pages fetched in parallel for paginated queries.
+        With the default of 1, pages are fetched one after another.
+
+        Args:
+            CONCURRENCY (int): The number of pages fetched at the same time.
+                Keep it within the pool size of the MindatSession (10 by default) to reuse connections.
+
+        Returns:
+            self: The retriever object.
+
+        Example:
+            >>> gr = GeomaterialRetriever()
+            >>> gr.concurrency(8).saveto("/path/to/directory")
+        '''
+        try:
+            concurrency = int(CONCURRENCY)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid input. CONCURRENCY must be a positive integer.")
+
+        if concurrency < 1:
+            raise ValueError("Invalid input. CONCURRENCY must be a positive integer.")
+
+        self._concurrency = concurrency
+
+        return self
+
+    def cache(self, CACHE = True):
+        '''
+        Serves repeated requests of this retriever from a persistent response cache.
+        By default no cache is used, unless one was enabled with set_default_cache().
+
+        Args:
+            CACHE (ResponseCache or bool): A ResponseCache, True for the shared default cache,
+                or False to bypass the default cache for this retriever.
+
+        Returns:
+            self: The retriever object.
+
+        Example:
+            >>> mr = MineralsIMARetriever()
+            >>> mr.cache(ResponseCache(TTL=3600)).ima(1).saveto("/path/to/directory")
+        '''
+        if not isinstance(CACHE, (bool, ResponseCache)):
+            raise ValueError("Invalid input. CACHE must be a ResponseCache, True or False.")
+
+        self._cache = CACHE
+
+        return self
+
+    def retry_policy(self, RETRY_POLICY):
+        '''
+        Sets how failed requests of this retriever are retried.
+        By default, a RetryPolicy with its default settings is used.
+
+        Args:
+            RETRY_POLICY (RetryPolicy): The retry policy.
+
+        Returns:
+            self: The retriever object.
+
+        Example:
+            >>> lr = LocalitiesRetriever()
+            >>> lr.retry_policy(RetryPolicy(MAX_ATTEMPTS=10, BACKOFF_MAX=120)).saveto("/path/to/directory")
+        '''
+        if not isinstance(RETRY_POLICY, RetryPolicy):
+            raise ValueError("Invalid input. RETRY_POLICY must be a RetryPolicy.")
+
+        self._retry_policy = RETRY_POLICY
+
+        return self
+
+    def rate_limiter(self, RATE_LIMITER):
+        '''
+        Paces the requests of this retriever with a RateLimiter, which can be shared with other retrievers,
+        threads and processes. By default, the limiter set with set_default_rate_limiter() is used, if any.
+
+        Args:
+            RATE_LIMITER (RateLimiter): The rate limiter.
+
+        Returns:
+            self: The retriever object.
+
+        Example:
+            >>> limiter = RateLimiter(RATE=5, MAX_IN_FLIGHT=4)
+            >>> gr = GeomaterialRetriever()
+            >>> gr.rate_limiter(limiter).concurrency(8).saveto("/path/to/directory")
+        '''
+        if not isinstance(RATE_LIMITER, RateLimiter):
+            raise ValueError("Invalid input. RATE_LIMITER must be a RateLimiter.")
+
+        self._rate_limiter = RATE_LIMITER
+
+        return self
+
+    def shard_by_id(self, SHARD_SIZE = 6000):
+        '''
+        Splits paginated queries into ID ranges (with id_min / id_max) that are fetched in parallel
+        and merged in ID order, instead of following a single chain of pages.
+        The number of ranges fetched at the same time is set with concurrency().
+        Shards are sized from the density of the ID space, and split further where it is denser.
+
+        Args:
+            SHARD_SIZE (int): The approximate number of items per shard, or None to turn sharding off.
+
+        Returns:
+            self: The retriever object.
+
+        Example:
+            >>> gr = GeomaterialRetriever()
+            >>> gr.shard_by_id().concurrency(8).saveto("/path/to/directory")
+        '''
+        if not self._supports_id_range:
+            raise ValueError(type(self).__name__ + " does not support ID range filters, so its queries cannot be sharded.")
+
+        if SHARD_SIZE is not None:
+            try:
+                shard_size = int(SHARD_SIZE)
+            except (TypeError, ValueError):
+                raise ValueError("Invalid input. SHARD_SIZE must be a positive integer.")
+            if shard_size < 1:
+                raise ValueError("Invalid input. SHARD_SIZE must be a positive integer.")
+            SHARD_SIZE = shard_size
+
+        self._shard_size = SHARD_SIZE
+
+        return self
+
+    def ids(self, IDS):
+        '''
+        Sets the ids looked up by get_many().
+
+        Args:
+            IDS (list of int or str): The ids, as a list or separated by commas. Duplicates are fetched once.
+
+        Returns:
+            self: The retriever object.
+
+        Example:
+            >>> lir = LocalitiesIdRetriever()
+            >>> localities = lir.ids([3337, 3338, 5042]).get_many()
+        '''
+        if not self._supports_id_lookup:
+            raise ValueError(type(self).__name__ + " does not look up records by id; use its Id retriever.")
+
+        if isinstance(IDS, str):
+            IDS = [id for id in IDS.split(',') if id.strip()]
+        try:
+            self._ids = [int(id) for id in IDS]
+        except (TypeError, ValueError):
+            raise ValueError("Invalid input. IDS must be a list of integers.")
+
+        return self
+
+    def get_many(self, IDS = None):
+        '''
+        Looks up many ids at once and returns the records as a dict keyed by id.
+        Where the endpoint supports it, ids are fetched in chunks with id_in queries; the others are
+        fetched one by one. Chunks and lookups run in parallel, on concurrency() workers if set, or 8 otherwise.
+        All lookups share one MindatApi and its pooled connections.
+
+        Args:
+            IDS (list of int): The ids to look up. Defaults to the ids set with ids().
+
+        Returns:
+            dict: The records by id, in the order of the ids. Ids without a record map to None.
+
+        Example:
+            >>> gir = GeomaterialIdRetriever()
+            >>> minerals = gir.get_many([1, 2, 3])
+            >>> minerals[2]["name"]
+        '''
+        if IDS is not None:
+            self.ids(IDS)
+        elif not self._supports_id_lookup:
+            raise ValueError(type(self).__name__ + " does not look up records by id; use its Id retriever.")
+
+        ids = self._ids or []
+        self._ids = None
+        params, end_point, verbose = self._take_query()
+
+        ma = self._mindat_api()
+        return ma.get_many(self.BASE_ENDPOINT, ids, params, verbose, self._supports_id_in)
+
+    def _get_end_point(self):
+        return self.end_point
+
+    def local(self, STORE = True):
+        '''
+        Answers the queries of this retriever from a local mirror instead of the Mindat API.
+        The mirror is filled and kept up to date with sync(); get_dict(), saveto(), iter_records() and
+        to_arrow() then evaluate the same chained query locally, without network access.
+
+        Args:
+            STORE (LocalStore or str or bool): The store of the mirror, the path of its SQLite file,
+                True for './mindat_mirror.sqlite', or False to query the Mindat API again.
+
+        Returns:
+            self: The retriever object.
+
+        Example:
+            >>> gr = GeomaterialRetriever()
+            >>> gr.sync("/path/to/mindat_mirror.sqlite")
+            >>> gr.local("/path/to/mindat_mirror.sqlite").density_min(3.25).el_inc("Cu").get_dict()
+        '''
+        if self._local_engine is None:
+            raise ValueError(type(self).__name__ + " cannot answer its queries from a local mirror.")
+        if not isinstance(STORE, (bool, str, LocalStore)):
+            raise ValueError("Invalid input. STORE must be a LocalStore, a path, True or False.")
+
+        self._local = STORE
+
+        return self
+
+    def _mindat_api(self):
+        '''
+        Returns a MindatApi configured with the execution settings of this retriever,
+        or a LocalMindatApi when the retriever is set to local().
+        '''
+        if self._local:
+            store = None if self._local is True else self._local
+            return LocalMindatApi(get_query_engine(self._local_engine, store), self._concurrency)
+        return self._remote_mindat_api()
+
+    def _remote_mindat_api(self):
+        return mindat_api.MindatApi(
+            SESSION=self._session, CONCURRENCY=self._concurrency, CACHE=self._cache,
+            RETRY_POLICY=self._retry_policy, RATE_LIMITER=self._rate_limiter, SHARD_SIZE=self._shard_size
+        )
+
+    def _async_mindat_api(self, SESSION = None):
+        if self._local:
+            raise ValueError("Local queries are answered synchronously; use get_dict() or iter_records().")
+        if self._shard_size:
+            raise ValueError("Queries sharded by ID range are fetched synchronously; use get_dict(), iter_records() or saveto().")
+        return async_api.AsyncMindatApi(SESSION=SESSION, CONCURRENCY=self._concurrency, CACHE=self._cache, RETRY_POLICY=self._retry_policy, RATE_LIMITER=self._rate_limiter)
+
+    def _take_query(self):
+        '''
+        Returns the current query and resets the retriever, so the next query can be built
+        while this one is still running.
+        '''
+        query = (dict(self._params), self._get_end_point(), self.verbose_flag)
+        self._init_params()
+        return query
+
+    def iter_pages(self):
+        '''
+        Executes the query and yields the results page by page as they arrive,
+        so only one page (or one page per concurrent worker) is held in memory.
+
+        Returns:
+            generator of lists of dictionaries.
+
+        Example:
+            >>> lr = LocalitiesRetriever()
+            >>> for page in lr.country("Canada").iter_pages():
+            ...     print(len(page))
+        '''
+        params, end_point, verbose = self._take_query()
+
+        ma = self._mindat_api()
+        yield from ma.iter_pages(params, end_point, verbose)
+
+    def iter_records(self):
+        '''
+        Executes the query and yields the results one record at a time as their pages arrive.
+
+        Returns:
+            generator of dictionaries.
+
+        Example:
+            >>> lr = LocalitiesRetriever()
+            >>> for locality in lr.verbose(0).iter_records():
+            ...     print(locality["id"])
+        '''
+        params, end_point, verbose = self._take_query()
+
+        ma = self._mindat_api()
+        yield from ma.iter_records(params, end_point, verbose)
+
+    def sync(self, STORE = None, FULL = False):
+        '''
+        Mirrors the results of the query into a local SQLite store, fetching only the records
+        updated since the last sync of the same query. The first sync fetches every record;
+        later ones ask for the records whose updttime is at or after the high-water mark of the previous run
+        and replace them in the store by id.
+
+        Args:
+            STORE (LocalStore or str): The store, or the path of its SQLite file. Defaults to './mindat_mirror.sqlite'.
+            FULL (bool): If True, every record is fetched again. For a query without filters, stored records no longer returned are deleted.
+
+        Returns:
+            int: The number of records fetched.
+
+        Example:
+            >>> store = LocalStore("/path/to/mindat_mirror.sqlite")
+            >>> GeomaterialRetriever().sync(store)
+            >>> LocalitiesRetriever().concurrency(4).sync(store)
+        '''
+        if not self._supports_updated_at:
+            raise ValueError(type(self).__name__ + " does not support the updated_at filter, so its queries cannot be synced incrementally.")
+
+        params, end_point, verbose = self._take_query()
+
+        ma = self._remote_mindat_api()
+        return ma.sync_mindat_json(params, end_point, STORE, verbose, FULL)
+
+    def to_arrow(self):
+        '''
+        Executes the query and returns the results as a pyarrow.Table.
+        Pages are converted to record batches as they arrive; nested fields such as `elements`
+        become list columns. Requires the optional pyarrow dependency (pip install openmindat[parquet]).
+
+        Returns:
+            pyarrow.Table
+
+        Example:
+            >>> gr = GeomaterialRetriever()
+            >>> table = gr.density_min(3.25).to_arrow()
+        '''
+        params, end_point, verbose = self._take_query()
+
+        ma = self._mindat_api()
+        return ma.get_arrow_table(params, end_point, verbose)
+
+    def saveto(self, OUTDIR = '', FILE_NAME = '', FORMAT = 'json', COMPRESSION = None, RESUME = False):
+        '''
+        Executes the query and saves the results to a specified directory.
+
+        Args:
+            OUTDIR (str): The directory path where the results will be saved. If not provided, the current directory will be used.
+            FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
+            FORMAT (str): The output format: 'json' (default, indented), 'json-compact', 'ndjson' (one record per line)
+                or 'parquet' (requires pyarrow). Pages are written as they arrive.
+            COMPRESSION (str): Optional 'gzip' or 'zstd' compression, applied while writing.
+                It can also be given as the extension of FILE_NAME, e.g. 'minerals.ndjson.zst'.
+            RESUME (bool): If True, the download is checkpointed after every page, and an interrupted download
+                of the same query to the same file continues where it stopped. Not available for 'parquet'.
+
+        Returns:
+            None
+
+        Example:
+            >>> gr = GeomaterialRetriever()
+            >>> gr.density_min(3.25).saveto("/path/to/directory", "dense.ndjson.gz", FORMAT="ndjson", RESUME=True)
+        '''
+        params, end_point, verbose = self._take_query()
+
+        ma = self._mindat_api()
+        ma.download_mindat_json(params, end_point, OUTDIR, FILE_NAME, verbose, FORMAT, COMPRESSION, RESUME)
+
+    async def aiter_records(self, SESSION = None):
+        '''
+        The asyncio counterpart of iter_records(); yields records as their pages arrive.
+        Requires the optional httpx dependency (pip install openmindat[async]).
+
+        Example:
+            >>> gr = GeomaterialRetriever()
+            >>> async for mineral in gr.density_min(3.25).aiter_records():
+            ...     print(mineral["name"])
+        '''
+        params, end_point, verbose = self._take_query()
+
+        ama = self._async_mindat_api(SESSION)
+        async for record in ama.iter_records(params, end_point, verbose):
+            yield record
+
+    async def aget_dict(self, SESSION = None):
+        '''
+        Executes the query on the running asyncio event loop and returns the json object.
+        Requires the optional httpx dependency (pip install openmindat[async]).
+
+        Args:
+            SESSION (AsyncMindatSession): An optional session; by default the event loop's shared session is used.
+
+        Returns:
+            list of dictionaries.
+
+        Example:
+            >>> gr = GeomaterialRetriever()
+            >>> geoObject = await gr.density_min(3.25).concurrency(8).aget_dict()
+        '''
+        params, end_point, verbose = self._take_query()
+
+        ama = self._async_mindat_api(SESSION)
+        return await ama.get_mindat_json(params, end_point, verbose)
+
+    async def asaveto(self, OUTDIR = '', FILE_NAME = '', FORMAT = 'json', COMPRESSION = None, SESSION = None):
+        '''
+        Executes the query on the running asyncio event loop and saves the results to a specified directory.
+        Requires the optional httpx dependency (pip install openmindat[async]).
+
+        Args:
+            OUTDIR (str): The directory path where the results will be saved. If not provided, the current directory will be used.
+            FILE_NAME (str): An optional file name, if no input is given it uses the end point as a name
+            FORMAT (str): The output format: 'json' (default, indented), 'json-compact', 'ndjson' (one record per line) or 'parquet' (requires pyarrow).
+            COMPRESSION (str): Optional 'gzip' or 'zstd' compression. It can also be given as the extension of FILE_NAME.
+            SESSION (AsyncMindatSession): An optional session; by default the event loop's shared session is used.
+
+        Returns:
+            None
+
+        Example:
+            >>> gr = GeomaterialRetriever()
+            >>> await gr.density_min(3.25).asaveto("/path/to/directory")
+        '''
+        params, end_point, verbose = self._take_query()
+
+        ama = self._async_mindat_api(SESSION)
+        await ama.download_mindat_json(params, end_point, OUTDIR, FILE_NAME, verbose, FORMAT, COMPRESSION)
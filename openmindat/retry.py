@@ -0,0 +1,127 @@
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+
+def _get_retryable_exceptions():
+    exceptions = [
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+    ]
+    try:
+        import httpx
+        exceptions.append(httpx.TransportError)
+    except ImportError:
+        pass
+    return tuple(exceptions)
+
+
+class RetryPolicy:
+    '''
+    Decides which failed requests MindatApi retries, and how long it waits in between.
+
+    A request is retried when the connection fails or times out, or when the server answers with one of
+    RETRY_STATUSES (rate limiting and transient server errors). The wait grows exponentially,
+    BACKOFF_FACTOR * 2 ** attempt capped at BACKOFF_MAX, with full jitter so parallel workers do not retry
+    in lockstep. A Retry-After header from the server takes precedence over the computed wait.
+    Retries stop after MAX_ATTEMPTS attempts, or when the next wait would pass the DEADLINE of the request.
+
+    Args:
+        MAX_ATTEMPTS (int): The maximum number of attempts per request, including the first one.
+        BACKOFF_FACTOR (float): The wait in seconds before the first retry, doubled on every further retry.
+        BACKOFF_MAX (float): The longest wait in seconds between two attempts, unless the server asks for more.
+        JITTER (bool): If True, each wait is drawn at random between 0 and the exponential backoff.
+        RETRY_STATUSES (tuple): The HTTP status codes that are retried.
+        CONNECT_TIMEOUT (float): Seconds to wait for a connection to the server.
+        READ_TIMEOUT (float): Seconds to wait for the server to send data.
+        DEADLINE (float): The total seconds one request may take, retries included. None for no limit.
+
+    Usage:
+        >>> policy = RetryPolicy(MAX_ATTEMPTS=8, DEADLINE=600)
+        >>> gr = GeomaterialRetriever().retry_policy(policy)
+    '''
+
+    def __init__(self, MAX_ATTEMPTS=5, BACKOFF_FACTOR=1.0, BACKOFF_MAX=60.0, JITTER=True,
+                 RETRY_STATUSES=(429, 500, 502, 503, 504), CONNECT_TIMEOUT=10.0, READ_TIMEOUT=180.0, DEADLINE=None):
+        if int(MAX_ATTEMPTS) < 1:
+            raise ValueError("Invalid input. MAX_ATTEMPTS must be a positive integer.")
+
+        self.max_attempts = int(MAX_ATTEMPTS)
+        self.backoff_factor = float(BACKOFF_FACTOR)
+        self.backoff_max = float(BACKOFF_MAX)
+        self.jitter = bool(JITTER)
+        self.retry_statuses = frozenset(RETRY_STATUSES)
+        self.connect_timeout = CONNECT_TIMEOUT
+        self.read_timeout = READ_TIMEOUT
+        self.deadline = DEADLINE
+        self.retryable_exceptions = _get_retryable_exceptions()
+
+    def get_timeout(self, STARTED_AT = None):
+        '''
+            Returns the (connect, read) timeout of the next attempt, shortened so it ends by the deadline.
+        '''
+        connect_timeout, read_timeout = self.connect_timeout, self.read_timeout
+
+        if self.deadline is not None and STARTED_AT is not None:
+            remaining = max(self.deadline - (time.monotonic() - STARTED_AT), 0.001)
+            connect_timeout = remaining if connect_timeout is None else min(connect_timeout, remaining)
+            read_timeout = remaining if read_timeout is None else min(read_timeout, remaining)
+
+        return (connect_timeout, read_timeout)
+
+    def should_retry_status(self, STATUS_CODE):
+        return STATUS_CODE in self.retry_statuses
+
+    def should_retry_exception(self, EXCEPTION):
+        return isinstance(EXCEPTION, self.retryable_exceptions)
+
+    def get_backoff(self, ATTEMPT):
+        '''
+            Returns the wait in seconds after the failed attempt number ATTEMPT (0 for the first attempt).
+        '''
+        backoff = min(self.backoff_max, self.backoff_factor * (2 ** ATTEMPT))
+        return random.uniform(0, backoff) if self.jitter else backoff
+
+    def get_retry_after(self, RESPONSE):
+        '''
+            Returns the wait in seconds requested by the Retry-After header of a response, or None.
+        '''
+        if RESPONSE is None:
+            return None
+
+        value = RESPONSE.headers.get('Retry-After')
+        if not value:
+            return None
+
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+    def get_delay(self, ATTEMPT, STARTED_AT, RESPONSE = None):
+        '''
+            Returns the wait before retrying after the failed attempt number ATTEMPT,
+            or None if the request must not be retried again.
+        '''
+        if ATTEMPT + 1 >= self.max_attempts:
+            return None
+
+        delay = self.get_retry_after(RESPONSE)
+        if delay is None:
+            delay = self.get_backoff(ATTEMPT)
+
+        if self.deadline is not None and time.monotonic() - STARTED_AT + delay >= self.deadline:
+            return None
+        return delay
@@ -0,0 +1,156 @@
+import asyncio
+import threading
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class MindatSession:
+    '''
+    A pooled, keep-alive HTTP client for the Mindat API.
+
+    One MindatSession is shared process-wide by default, so every MindatApi and every retriever
+    reuses the same TCP/TLS connections instead of opening a new one per request.
+    A custom session can be injected into MindatApi or any retriever class.
+
+    Args:
+        POOL_CONNECTIONS (int): The number of per-host connection pools to keep.
+        POOL_MAXSIZE (int): The maximum number of connections kept open per host.
+        POOL_BLOCK (bool): If True, block when all connections to a host are busy instead of opening extra ones.
+        KEEP_ALIVE (bool): If False, connections are closed after every request.
+
+    Usage:
+        >>> ms = MindatSession(POOL_MAXSIZE=20)
+        >>> gr = GeomaterialRetriever(SESSION=ms)
+        >>> gr.density_min(2.0).save()
+    '''
+
+    def __init__(self, POOL_CONNECTIONS=10, POOL_MAXSIZE=10, POOL_BLOCK=False, KEEP_ALIVE=True):
+        self.pool_connections = int(POOL_CONNECTIONS)
+        self.pool_maxsize = int(POOL_MAXSIZE)
+        self.pool_block = bool(POOL_BLOCK)
+        self.keep_alive = bool(KEEP_ALIVE)
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block
+        )
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+        if not self.keep_alive:
+            self._session.headers.update({'Connection': 'close'})
+
+    def get(self, URL, **kwargs):
+        return self._session.get(URL, **kwargs)
+
+    def close(self):
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncMindatSession:
+    '''
+    A pooled, keep-alive asyncio HTTP client for the Mindat API, used by AsyncMindatApi.
+
+    This requires the optional httpx dependency (pip install openmindat[async]).
+    The underlying httpx.AsyncClient is created on first use and bound to the running event loop.
+    Its connection limits also bound the number of requests in flight across all queries sharing it.
+
+    Args:
+        MAX_CONNECTIONS (int): The maximum number of connections open at the same time.
+        MAX_KEEPALIVE (int): The maximum number of idle connections kept alive.
+        KEEP_ALIVE (bool): If False, connections are closed after every request.
+
+    Usage:
+        >>> async with AsyncMindatSession(MAX_CONNECTIONS=20) as ams:
+        ...     results = await GeomaterialRetriever().density_min(2.0).aget_dict(SESSION=ams)
+    '''
+
+    def __init__(self, MAX_CONNECTIONS=100, MAX_KEEPALIVE=20, KEEP_ALIVE=True):
+        self.max_connections = int(MAX_CONNECTIONS)
+        self.max_keepalive = int(MAX_KEEPALIVE)
+        self.keep_alive = bool(KEEP_ALIVE)
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            try:
+                import httpx
+            except ImportError:
+                raise ImportError("The asyncio client requires httpx. Install it with: pip install openmindat[async]")
+
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive if self.keep_alive else 0
+            )
+            self._client = httpx.AsyncClient(limits=limits, timeout=None)
+        return self._client
+
+    async def get(self, URL, params=None, headers=None, timeout=None, **kwargs):
+        client = self._get_client()
+        if isinstance(timeout, tuple):
+            # A (connect, read) timeout, as accepted by requests
+            import httpx
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        return await client.get(URL, params=params, headers=headers, timeout=timeout, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+# One AsyncMindatSession per event loop, since an httpx.AsyncClient cannot be shared between loops
+_default_async_sessions = weakref.WeakKeyDictionary()
+
+
+def get_default_session():
+    '''
+        Returns the process-wide MindatSession, creating it on first use.
+    '''
+    global _default_session
+
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = MindatSession()
+        return _default_session
+
+
+def set_default_session(SESSION):
+    '''
+        Replaces the process-wide MindatSession used when no session is injected.
+        Passing None discards the current one, and a new default session is created on next use.
+    '''
+    global _default_session
+
+    with _default_session_lock:
+        _default_session = SESSION
+    return SESSION
+
+
+def get_default_async_session():
+    '''
+        Returns the AsyncMindatSession of the running event loop, creating it on first use.
+    '''
+    loop = asyncio.get_running_loop()
+
+    with _default_session_lock:
+        if loop not in _default_async_sessions:
+            _default_async_sessions[loop] = AsyncMindatSession()
+        return _default_async_sessions[loop]
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+
+from .cache import ResponseCache
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    '''
+    Coalesces identical requests that are in flight at the same time.
+
+    The first caller of a request (the same URL, query parameters and API key) sends it; callers asking for
+    the same request before it completes wait for that call and receive its response, or its exception,
+    instead of sending their own. Requests that are not concurrent are not affected; use a ResponseCache
+    to reuse completed responses. One SingleFlight is shared by every MindatApi of the process by default,
+    so concurrent retrievers in different threads, or tasks of one event loop, are coalesced.
+
+    Usage:
+        >>> ma = MindatApi(COALESCE=SingleFlight())
+        >>> get_default_single_flight().stats()
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(URL, PARAMS = None, API_KEY = None):
+        '''
+            Returns the key of a request: the API key and the normalized URL with its sorted query parameters.
+            PARAMS is a list of (key, value) pairs as returned by encode_params().
+        '''
+        return (API_KEY, ResponseCache.make_key(URL, PARAMS))
+
+    def do(self, KEY, FUNCTION):
+        '''
+            Calls FUNCTION and returns its result, unless a call with the same KEY is already running,
+            in which case its result is returned once it completes.
+        '''
+        with self._lock:
+            call = self._calls.get(KEY)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[KEY] = call
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = FUNCTION()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[KEY]
+            call.event.set()
+        return call.result
+
+    async def ado(self, KEY, FUNCTION):
+        '''
+            The asyncio counterpart of do(): awaits FUNCTION() in a task shared by the callers of the same KEY
+            on the running event loop. The task is cancelled when every caller waiting for it is cancelled.
+        '''
+        loop = asyncio.get_running_loop()
+        key = (id(loop), KEY)
+
+        with self._lock:
+            entry = self._tasks.get(key)
+            if entry is None:
+                entry = {'task': loop.create_task(FUNCTION()), 'waiters': 0}
+                self._tasks[key] = entry
+                self.calls += 1
+                entry['task'].add_done_callback(lambda task: self._forget_task(key, entry))
+            else:
+                self.coalesced += 1
+            entry['waiters'] += 1
+
+        try:
+            return await asyncio.shield(entry['task'])
+        except asyncio.CancelledError:
+            if entry['waiters'] == 1:
+                entry['task'].cancel()
+            raise
+        finally:
+            entry['waiters'] -= 1
+
+    def _forget_task(self, KEY, ENTRY):
+        with self._lock:
+            if self._tasks.get(KEY) is ENTRY:
+                del self._tasks[KEY]
+
+    def stats(self):
+        '''
+            Returns the number of requests sent and of requests that joined one already in flight.
+        '''
+        with self._lock:
+            return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._calls) + len(self._tasks)}
+
+
+_default_single_flight = SingleFlight()
+
+
+def get_default_single_flight():
+    '''
+        Returns the process-wide SingleFlight shared by every MindatApi.
+    '''
+    return _default_single_flight
+
+
+def resolve_single_flight(COALESCE):
+    '''
+        Returns the SingleFlight to use for a COALESCE argument: True for the process-wide one,
+        False or None to send every request on its own, or a SingleFlight.
+    '''
+    if COALESCE is True:
+        return get_default_single_flight()
+    if not COALESCE:
+        return None
+    return COALESCE
@@ -0,0 +1,304 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+# The parameters that do not change which records a query returns
+_PAGING_PARAMS = ('format', 'page', 'page-size', 'updated_at')
+# The parameters that change the fields of the records, but not which records are returned
+_SHAPE_PARAMS = ('fields', 'expand', 'omit')
+
+
+def parse_timestamp(VALUE):
+    '''
+        Returns the datetime of an updttime / updated_at value, or None if it cannot be read.
+        Time zones are dropped, so timestamps of the server compare with each other.
+    '''
+    if not VALUE or not isinstance(VALUE, str):
+        return None
+    try:
+        timestamp = datetime.fromisoformat(VALUE.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return timestamp.replace(tzinfo=None, microsecond=0)
+
+
+def format_timestamp(TIMESTAMP):
+    '''
+        Returns a datetime in the %Y-%m-%d %H:%M:%S format of the updated_at filter.
+    '''
+    return TIMESTAMP.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class LocalStore:
+    '''
+    A local SQLite mirror of Mindat records, filled and kept up to date by incremental syncs.
+
+    Each endpoint has its own table of records keyed by id, holding the record as json and its updttime.
+    For every synced query, the store also keeps the high-water mark: the latest updttime seen so far.
+    The next sync only asks the API for the records updated since that mark and upserts them, so a daily
+    refresh of a full table downloads the few records that changed instead of the whole table.
+
+    Records deleted on Mindat are not reported by an incremental sync; run a full sync of the whole table
+    from time to time (sync(FULL=True)) to drop them.
+
+    Args:
+        PATH (str): The SQLite file holding the mirror.
+
+    Usage:
+        >>> store = LocalStore("/path/to/mindat_mirror.sqlite")
+        >>> GeomaterialRetriever().sync(store)
+        >>> store.get("v1/geomaterials", 3337)
+    '''
+
+    DEFAULT_PATH = './mindat_mirror.sqlite'
+
+    def __init__(self, PATH = DEFAULT_PATH):
+        self.path = Path(PATH)
+        self._lock = threading.RLock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS sync_state ('
+            'key TEXT PRIMARY KEY, end_point TEXT, params TEXT, high_water_mark TEXT, '
+            'synced_at REAL, records_synced INTEGER)'
+        )
+        # Counts the changes of each table, so indexes built from the records know when to refresh
+        self._connection.execute('CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER)')
+        self._tables = set()
+
+    @staticmethod
+    def get_table(END_POINT):
+        '''
+            Returns the name of the table holding the records of an endpoint, e.g. 'geomaterials' for 'v1/geomaterials'.
+        '''
+        name = re.sub(r'^v\d+/', '', str(END_POINT).strip('/'))
+        return re.sub(r'\W', '_', name)
+
+    @staticmethod
+    def get_filters(PARAM_DICT):
+        '''
+            Returns the parameters of a query that select which records it returns.
+        '''
+        return {key: value for key, value in (PARAM_DICT or {}).items() if key not in _PAGING_PARAMS + _SHAPE_PARAMS}
+
+    @staticmethod
+    def get_sync_key(END_POINT, PARAM_DICT):
+        '''
+            Returns the key of the sync state of a query: the endpoint and its parameters, without the paging parameters.
+        '''
+        params = {key: value for key, value in (PARAM_DICT or {}).items() if key not in _PAGING_PARAMS}
+        return str(END_POINT).strip('/') + '?' + json.dumps(params, sort_keys=True, default=str)
+
+    def ensure_table(self, END_POINT):
+        '''
+            Creates the table of an endpoint if needed and returns its name.
+        '''
+        table = self.get_table(END_POINT)
+        if table not in self._tables:
+            with self._lock:
+                self._connection.execute(
+                    'CREATE TABLE IF NOT EXISTS "{}" (id INTEGER PRIMARY KEY, updttime TEXT, record TEXT, stored_at REAL)'.format(table)
+                )
+                self._connection.execute('CREATE INDEX IF NOT EXISTS "{0}_stored_at" ON "{0}" (stored_at)'.format(table))
+                self._tables.add(table)
+        return table
+
+    def execute(self, SQL, ARGS = ()):
+        '''
+            Runs a SQL statement on the store and returns all its rows.
+        '''
+        with self._lock:
+            return self._connection.execute(SQL, ARGS).fetchall()
+
+    def create_function(self, NAME, ARGUMENTS, FUNCTION):
+        '''
+            Registers a Python function that the SQL statements on the store can call.
+        '''
+        with self._lock:
+            self._connection.create_function(NAME, ARGUMENTS, FUNCTION, deterministic=True)
+
+    @contextmanager
+    def transaction(self):
+        '''
+            Runs the statements of the block in one transaction and yields the SQLite connection.
+            Other threads wait until the transaction is committed or rolled back.
+        '''
+        with self._lock:
+            self._connection.execute('BEGIN')
+            try:
+                yield self._connection
+                self._connection.execute('COMMIT')
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+
+    def _bump_version(self, CONNECTION, TABLE):
+        CONNECTION.execute(
+            'INSERT INTO table_versions (name, version) VALUES (?, 1) '
+            'ON CONFLICT(name) DO UPDATE SET version = version + 1', (TABLE,)
+        )
+
+    def get_version(self, END_POINT):
+        '''
+            Returns a number that changes every time records of the endpoint are stored or deleted.
+        '''
+        rows = self.execute('SELECT version FROM table_versions WHERE name = ?', (self.get_table(END_POINT),))
+        return rows[0][0] if rows else 0
+
+    def upsert(self, END_POINT, RECORDS):
+        '''
+            Inserts the records of an endpoint, replacing the stored records with the same id.
+            Records without an id are skipped. Returns the number of records stored.
+        '''
+        table = self.ensure_table(END_POINT)
+        now = time.time()
+        rows = [
+            (record['id'], record.get('updttime'), json.dumps(record, separators=(',', ':')), now)
+            for record in RECORDS if isinstance(record, dict) and record.get('id') is not None
+        ]
+        if not rows:
+            return 0
+
+        with self.transaction() as connection:
+            connection.executemany(
+                'INSERT INTO "{}" (id, updttime, record, stored_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET updttime = excluded.updttime, record = excluded.record, '
+                'stored_at = excluded.stored_at'.format(table),
+                rows
+            )
+            self._bump_version(connection, table)
+        return len(rows)
+
+    def delete_missing(self, END_POINT, IDS):
+        '''
+            Deletes the stored records of an endpoint whose id is not in IDS. Returns the number of deleted records.
+        '''
+        table = self.ensure_table(END_POINT)
+        with self.transaction() as connection:
+            connection.execute('CREATE TEMP TABLE IF NOT EXISTS kept_ids (id INTEGER PRIMARY KEY)')
+            connection.execute('DELETE FROM kept_ids')
+            connection.executemany('INSERT OR IGNORE INTO kept_ids (id) VALUES (?)', ((id,) for id in IDS))
+            deleted = connection.execute(
+                'DELETE FROM "{}" WHERE id NOT IN (SELECT id FROM kept_ids)'.format(table)
+            ).rowcount
+            connection.execute('DELETE FROM kept_ids')
+            if deleted:
+                self._bump_version(connection, table)
+        return deleted
+
+    def get(self, END_POINT, ID):
+        '''
+            Returns the stored record of an endpoint with the given id, or None.
+        '''
+        table = self.ensure_table(END_POINT)
+        rows = self.execute('SELECT record FROM "{}" WHERE id = ?'.format(table), (int(ID),))
+        return json.loads(rows[0][0]) if rows else None
+
+    def iter_records(self, END_POINT):
+        '''
+            Yields the stored records of an endpoint in id order.
+        '''
+        table = self.ensure_table(END_POINT)
+        last_id = None
+        while True:
+            # Read in batches, so other threads can use the store in between
+            if last_id is None:
+                rows = self.execute('SELECT id, record FROM "{}" ORDER BY id LIMIT 1000'.format(table))
+            else:
+                rows = self.execute('SELECT id, record FROM "{}" WHERE id > ? ORDER BY id LIMIT 1000'.format(table), (last_id,))
+            if not rows:
+                return
+            for row_id, record in rows:
+                yield json.loads(record)
+            last_id = rows[-1][0]
+
+    def count(self, END_POINT):
+        '''
+            Returns the number of stored records of an endpoint.
+        '''
+        table = self.ensure_table(END_POINT)
+        return self.execute('SELECT COUNT(*) FROM "{}"'.format(table))[0][0]
+
+    def get_high_water_mark(self, END_POINT, PARAM_DICT = None):
+        '''
+            Returns the latest updttime synced for a query, in the %Y-%m-%d %H:%M:%S format, or None if it was never synced.
+        '''
+        rows = self.execute('SELECT high_water_mark FROM sync_state WHERE key = ?', (self.get_sync_key(END_POINT, PARAM_DICT),))
+        return rows[0][0] if rows else None
+
+    def set_high_water_mark(self, END_POINT, PARAM_DICT, HIGH_WATER_MARK, RECORDS_SYNCED = 0):
+        '''
+            Records a completed sync of a query and the latest updttime it has seen.
+        '''
+        params = {key: value for key, value in (PARAM_DICT or {}).items() if key not in _PAGING_PARAMS}
+        self.execute(
+            'INSERT OR REPLACE INTO sync_state (key, end_point, params, high_water_mark, synced_at, records_synced) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (self.get_sync_key(END_POINT, PARAM_DICT), str(END_POINT).strip('/'), json.dumps(params, sort_keys=True, default=str),
+             HIGH_WATER_MARK, time.time(), RECORDS_SYNCED)
+        )
+
+    def reset(self, END_POINT = None):
+        '''
+            Forgets the high-water marks of an endpoint, or of every endpoint, so the next sync is a full one.
+        '''
+        if END_POINT is None:
+            self.execute('DELETE FROM sync_state')
+        else:
+            self.execute('DELETE FROM sync_state WHERE end_point = ?', (str(END_POINT).strip('/'),))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def resolve_store(STORE):
+    '''
+        Returns the LocalStore for a STORE argument: a LocalStore, the path of its SQLite file, or None for the default path.
+    '''
+    if isinstance(STORE, LocalStore):
+        return STORE
+    return LocalStore(STORE if STORE else LocalStore.DEFAULT_PATH)
+
+
+def main(ARGV = None):
+    '''
+        Command-line entry point: python -m openmindat.sync [geomaterials] [localities] [--store PATH] [--full]
+    '''
+    import argparse
+    from .geomaterials import GeomaterialRetriever
+    from .localities import LocalitiesRetriever
+
+    retrievers = {'geomaterials': GeomaterialRetriever, 'localities': LocalitiesRetriever}
+
+    parser = argparse.ArgumentParser(prog='python -m openmindat.sync', description='Incrementally mirror Mindat tables into a local SQLite store.')
+    parser.add_argument('tables', nargs='*', help='the tables to sync: ' + ', '.join(sorted(retrievers)) + ' (default: all)')
+    parser.add_argument('--store', default=LocalStore.DEFAULT_PATH, help='the SQLite file of the mirror')
+    parser.add_argument('--full', action='store_true', help='fetch every record again and drop deleted ones')
+    parser.add_argument('--concurrency', type=int, default=1, help='the number of pages fetched in parallel')
+    args = parser.parse_args(ARGV)
+    unknown = [table for table in args.tables if table not in retrievers]
+    if unknown:
+        parser.error('unknown table(s): ' + ', '.join(unknown) + ' (choose from ' + ', '.join(sorted(retrievers)) + ')')
+    args.tables = args.tables or sorted(retrievers)
+
+    with LocalStore(args.store) as store:
+        for table in args.tables:
+            retrievers[table]().concurrency(args.concurrency).sync(store, args.full)
+
+
+if __name__ == '__main__':
+    main()
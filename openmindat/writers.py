@@ -0,0 +1,334 @@
+import gzip
+import json
+import os
+from contextlib import contextmanager
+
+
+# Output formats accepted by saveto() and download_mindat_json(), with their file extensions
+OUTPUT_FORMATS = {
+    'json': '.json',
+    'json-compact': '.json',
+    'ndjson': '.ndjson',
+    'parquet': '.parquet',
+}
+
+# Output compressions, with their file extensions
+COMPRESSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def get_format_extension(FORMAT):
+    '''
+        Returns the file extension of an output format, e.g. '.ndjson' for 'ndjson'.
+    '''
+    try:
+        return OUTPUT_FORMATS[FORMAT]
+    except KeyError:
+        raise ValueError(f"Invalid FORMAT: {FORMAT}\nFORMAT must be one of: {', '.join(OUTPUT_FORMATS)}")
+
+
+def get_compression_extension(COMPRESSION):
+    '''
+        Returns the file extension of a compression, e.g. '.gz' for 'gzip', or '' for no compression.
+    '''
+    if COMPRESSION is None:
+        return ''
+    try:
+        return COMPRESSIONS[COMPRESSION]
+    except KeyError:
+        raise ValueError(f"Invalid COMPRESSION: {COMPRESSION}\nCOMPRESSION must be None or one of: {', '.join(COMPRESSIONS)}")
+
+
+def split_compression_extension(FILE_NAME):
+    '''
+        Splits the compression extension off a file name: 'name.json.gz' -> ('name.json', 'gzip').
+        Returns (FILE_NAME, None) when the name has no compression extension.
+    '''
+    file_name = str(FILE_NAME)
+    for compression, extension in list(COMPRESSIONS.items()) + [('zstd', '.zstd')]:
+        if file_name.lower().endswith(extension):
+            return file_name[:-len(extension)], compression
+    return file_name, None
+
+
+def _import_zstd():
+    try:
+        from compression import zstd # Python 3.14+
+        return zstd
+    except ImportError:
+        pass
+
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise ImportError("zstd compression requires the zstandard package. Install it with: pip install openmindat[zstd]")
+
+
+def open_text_file(FILE_PATH, MODE = 'r', COMPRESSION = None):
+    '''
+        Opens a text file for streaming reads ('r') or writes ('w'), compressing or decompressing on the fly.
+        If COMPRESSION is None, it is inferred from the file extension.
+    '''
+    compression = COMPRESSION if COMPRESSION else split_compression_extension(FILE_PATH)[1]
+    get_compression_extension(compression)
+
+    if 'gzip' == compression:
+        # Level 6 is much faster than gzip's default of 9 for almost the same ratio on json
+        return gzip.open(FILE_PATH, MODE + 't', compresslevel=6, encoding='utf-8')
+    if 'zstd' == compression:
+        return _import_zstd().open(FILE_PATH, MODE + 't', encoding='utf-8')
+    return open(FILE_PATH, MODE, encoding='utf-8')
+
+
+class CheckpointedFile:
+    '''
+    A text file written in committed blocks, for downloads that are checkpointed after every page.
+
+    Text written to it is kept in memory until commit(), which appends it to the file (as one gzip member or
+    zstd frame when compressed) and flushes it to disk. gzip and zstd readers read concatenated members as one
+    stream, so the file can be truncated to the size returned by any commit() and appended to again.
+
+    Args:
+        FILE_PATH (Path): The file to write.
+        COMPRESSION (str): None, 'gzip' or 'zstd'.
+        OFFSET (int): The size returned by an earlier commit() to continue from, or 0 to start a new file.
+    '''
+
+    def __init__(self, FILE_PATH, COMPRESSION = None, OFFSET = 0):
+        get_compression_extension(COMPRESSION)
+        self.compression = COMPRESSION
+        self._buffer = []
+        if OFFSET:
+            self._file = open(FILE_PATH, 'r+b')
+            self._file.truncate(OFFSET)
+            self._file.seek(OFFSET)
+        else:
+            self._file = open(FILE_PATH, 'wb')
+
+    def write(self, TEXT):
+        self._buffer.append(TEXT)
+
+    def commit(self):
+        '''
+            Appends the text written since the last commit to the file and flushes it to disk. Returns the size of the file.
+        '''
+        data = ''.join(self._buffer).encode('utf-8')
+        self._buffer = []
+        if data:
+            if 'gzip' == self.compression:
+                data = gzip.compress(data, compresslevel=6)
+            elif 'zstd' == self.compression:
+                data = _import_zstd().compress(data)
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self.commit()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+
+
+def iter_saved_records(FILE_PATH):
+    '''
+        Yields the records of a file written by saveto() or download_mindat_json(), in any format and compression.
+        ndjson files are read one line at a time; json documents are loaded whole.
+
+        Example:
+            >>> for mineral in iter_saved_records("./mindat_data/v1_geomaterials.ndjson.gz"):
+            ...     print(mineral["name"])
+    '''
+    base_name, compression = split_compression_extension(FILE_PATH)
+
+    with open_text_file(FILE_PATH, 'r', compression) as f:
+        if base_name.lower().endswith('.ndjson'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        results = json.load(f)["results"]
+
+    if isinstance(results, dict): #special case for locgeoregion2
+        results = results.get("features", [])
+    yield from results
+
+
+def load_mindat_json(FILE_PATH):
+    '''
+        Loads a file written by saveto() or download_mindat_json() into the same {"results": [...]}
+        dict that get_dict() returns. The format (json or ndjson) and compression (gzip or zstd)
+        are inferred from the file extension.
+
+        Example:
+            >>> json_data = load_mindat_json("./mindat_data/v1_geomaterials.json.gz")
+    '''
+    base_name, compression = split_compression_extension(FILE_PATH)
+
+    if base_name.lower().endswith('.ndjson'):
+        return {"results": list(iter_saved_records(FILE_PATH))}
+
+    with open_text_file(FILE_PATH, 'r', compression) as f:
+        return json.load(f)
+
+
+class JsonResultsWriter:
+    '''
+    Writes a {"results": [...]} json document page by page, so the full result list is never held in memory.
+
+    With INDENT=4 (the default of download_mindat_json) the output is identical to json.dump(json_data, f, indent=4).
+    With INDENT=None the document is written without any whitespace.
+
+    The GeoJSON results of locgeoregion2 are a dict rather than a list; they are collected and written at close().
+    '''
+
+    def __init__(self, FILE, INDENT = 4):
+        self.file = FILE
+        self.indent = INDENT
+        self.count = 0
+        self._started = False
+        self._geojson_data = None
+
+    @property
+    def holds_results(self):
+        '''
+            True while results are held in memory until close(), as for the GeoJSON results of locgeoregion2.
+        '''
+        return self._geojson_data is not None
+
+    def resume(self, COUNT):
+        '''
+            Continues a document of which COUNT records were written before, by an earlier writer.
+        '''
+        self.count = COUNT
+        self._started = COUNT > 0
+
+    def _dumps(self, RECORD):
+        if self.indent is None:
+            return json.dumps(RECORD, separators=(',', ':'))
+
+        # Records sit two levels deep in the document
+        prefix = ' ' * (2 * self.indent)
+        text = json.dumps(RECORD, indent=self.indent)
+        return prefix + text.replace('\n', '\n' + prefix)
+
+    def write_page(self, PAGE):
+        if isinstance(PAGE, dict) or self._geojson_data is not None: #special case for locgeoregion2
+            if self._geojson_data is None:
+                self._geojson_data = {"results": PAGE}
+            else:
+                self._geojson_data["results"]["features"] += PAGE["features"]
+            self.count = len(self._geojson_data["results"])
+            return
+
+        for record in PAGE:
+            if not self._started:
+                self.file.write(self._header())
+                self._started = True
+            else:
+                self.file.write(',' if self.indent is None else ',\n')
+            self.file.write(self._dumps(record))
+            self.count += 1
+
+    def _header(self):
+        if self.indent is None:
+            return '{"results":['
+        return '{\n' + ' ' * self.indent + '"results": [\n'
+
+    def close(self):
+        if self._geojson_data is not None:
+            if self.indent is None:
+                json.dump(self._geojson_data, self.file, separators=(',', ':'))
+            else:
+                json.dump(self._geojson_data, self.file, indent=self.indent)
+        elif not self._started:
+            if self.indent is None:
+                self.file.write('{"results":[]}')
+            else:
+                self.file.write('{\n' + ' ' * self.indent + '"results": []\n}')
+        elif self.indent is None:
+            self.file.write(']}')
+        else:
+            self.file.write('\n' + ' ' * self.indent + ']\n}')
+
+
+class NdjsonResultsWriter:
+    '''
+    Writes newline-delimited json, one compact record per line, as pages arrive.
+    For the GeoJSON results of locgeoregion2, each feature is written as one line.
+    '''
+
+    holds_results = False
+
+    def __init__(self, FILE):
+        self.file = FILE
+        self.count = 0
+
+    def resume(self, COUNT):
+        '''
+            Continues a file of which COUNT records were written before, by an earlier writer.
+        '''
+        self.count = COUNT
+
+    def write_page(self, PAGE):
+        if isinstance(PAGE, dict): #special case for locgeoregion2
+            PAGE = PAGE.get("features", [])
+
+        for record in PAGE:
+            self.file.write(json.dumps(record, separators=(',', ':')))
+            self.file.write('\n')
+            self.count += 1
+
+    def close(self):
+        pass
+
+
+def get_results_writer(FORMAT, FILE):
+    '''
+        Returns the streaming writer for an output format, writing to an open text file.
+    '''
+    get_format_extension(FORMAT)
+
+    if 'parquet' == FORMAT:
+        raise ValueError("The parquet format writes a binary file; use open_results_writer() instead.")
+    if 'ndjson' == FORMAT:
+        return NdjsonResultsWriter(FILE)
+    if 'json-compact' == FORMAT:
+        return JsonResultsWriter(FILE, INDENT=None)
+    return JsonResultsWriter(FILE, INDENT=4)
+
+
+@contextmanager
+def open_results_writer(FORMAT, FILE_PATH, COMPRESSION = None):
+    '''
+        Opens FILE_PATH and yields the streaming writer for FORMAT.
+        The writer is closed (the document completed) only if the block finishes without an error;
+        otherwise the file is closed as it is.
+        For 'parquet', COMPRESSION is the codec used inside the file.
+    '''
+    get_format_extension(FORMAT)
+
+    if 'parquet' == FORMAT:
+        from .arrow_export import ParquetResultsWriter
+        writer = ParquetResultsWriter(FILE_PATH, COMPRESSION)
+        try:
+            yield writer
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        return
+
+    with open_text_file(FILE_PATH, 'w', COMPRESSION) as f:
+        writer = get_results_writer(FORMAT, f)
+        yield writer
+        writer.close()
@@ -0,0 +1,83 @@
+import json
+import threading
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import pytest
+
+from openmindat.mindat_api import MindatApi, MindatApiKeyManager
+from openmindat.page_size import PageSizeController
+
+
+class FakeResponse:
+    def __init__(self, URL, PAYLOAD, STATUS_CODE = 200):
+        self.status_code = STATUS_CODE
+        self.headers = {}
+        self.reason = 'OK' if STATUS_CODE == 200 else 'Error'
+        self.url = URL
+        self.content = json.dumps(PAYLOAD).encode()
+        self._payload = PAYLOAD
+
+    def json(self):
+        return self._payload
+
+
+class FakeMindatServer:
+    '''
+    A session answering list queries over RECORDS like the Mindat API: id_min / id_max / id_in filters,
+    ordering by id, and page / page-size pagination with `next` links. Requests are recorded.
+    '''
+
+    BASE_URL = 'https://api.mindat.org/v1/geomaterials/'
+
+    def __init__(self, RECORDS):
+        self.records = sorted(RECORDS, key=lambda record: record['id'])
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def get(self, URL, params = None, headers = None, timeout = None):
+        pairs = parse_qsl(urlparse(URL).query, keep_blank_values=True)
+        items = params.items() if isinstance(params, dict) else (params or [])
+        for name, value in items:
+            for item in value if isinstance(value, (list, tuple)) else [value]:
+                if item is not None:
+                    pairs.append((name, str(item)))
+        query = dict(pairs)
+        with self._lock:
+            self.requests.append(query)
+
+        records = self.records
+        if query.get('id_min'):
+            records = [record for record in records if record['id'] >= int(query['id_min'])]
+        if query.get('id_max'):
+            records = [record for record in records if record['id'] <= int(query['id_max'])]
+        if query.get('id_in'):
+            ids = {int(id) for id in query['id_in'].split(',')}
+            records = [record for record in records if record['id'] in ids]
+
+        page, page_size = int(query.get('page', 1)), int(query.get('page-size', 1500))
+        start = (page - 1) * page_size
+        next_url = None
+        if start + page_size < len(records):
+            next_url = self.BASE_URL + '?' + urlencode(dict(query, page=page + 1))
+        url = self.BASE_URL + '?' + urlencode(pairs)
+        return FakeResponse(url, {'count': len(records), 'next': next_url, 'results': records[start:start + page_size]})
+
+
+@pytest.fixture
+def api_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(MindatApiKeyManager, 'API_KEY_FILE', str(tmp_path / 'apikey.yaml'))
+    monkeypatch.setenv('MINDAT_API_KEY', 'a' * 32)
+
+
+@pytest.fixture
+def make_api(api_key):
+    '''
+    Returns a factory of MindatApi objects querying a FakeMindatServer over the given records.
+    '''
+    def make_api(RECORDS, **OPTIONS):
+        server = FakeMindatServer(RECORDS)
+        options = dict(CACHE=False, PAGE_SIZE_CONTROLLER=PageSizeController())
+        options.update(OPTIONS)
+        return MindatApi(SESSION=server, **options), server
+
+    return make_api
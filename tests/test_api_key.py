@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import pytest
+
+from openmindat.async_api import AsyncMindatApi
+from openmindat.mindat_api import MindatApi, MindatApiKeyManager
+
+OLD_KEY = 'a' * 32
+NEW_KEY = 'b' * 32
+URL = 'https://api.mindat.org/v1/geomaterials/'
+
+
+class FakeResponse:
+    def __init__(self, STATUS_CODE):
+        self.status_code = STATUS_CODE
+        self.headers = {}
+
+    def json(self):
+        return {'results': []}
+
+
+def _respond(HEADERS, VALID_KEY):
+    return FakeResponse(200 if HEADERS['Authorization'] == 'Token ' + VALID_KEY else 401)
+
+
+class FakeSession:
+    def __init__(self, VALID_KEY = NEW_KEY):
+        self.valid_key = VALID_KEY
+
+    def get(self, URL, params = None, headers = None, timeout = None):
+        return _respond(headers, self.valid_key)
+
+
+class FakeAsyncSession(FakeSession):
+    async def get(self, URL, params = None, headers = None, timeout = None):
+        return _respond(headers, self.valid_key)
+
+
+@pytest.fixture
+def prompts(tmp_path, monkeypatch):
+    prompts = []
+
+    def fake_input(self):
+        prompts.append(threading.current_thread().name)
+        self._save_valid_api_key(NEW_KEY)
+
+    monkeypatch.setattr(MindatApiKeyManager, 'API_KEY_FILE', str(tmp_path / 'apikey.yaml'))
+    monkeypatch.setattr(MindatApiKeyManager, 'get_api_key_input', fake_input)
+    monkeypatch.setenv('MINDAT_API_KEY', OLD_KEY)
+    return prompts
+
+
+def test_sync_401_prompts_for_a_new_key_once(prompts):
+    ma = MindatApi(SESSION=FakeSession(), CACHE=False)
+    assert ma._request(URL).status_code == 200
+    assert ma._request(URL).status_code == 200
+    assert len(prompts) == 1
+    assert ma._api_key == NEW_KEY
+
+
+def test_sync_401_on_a_worker_thread_raises(prompts):
+    ma = MindatApi(SESSION=FakeSession(), CACHE=False)
+    errors = []
+
+    def run():
+        try:
+            ma._request(URL)
+        except ValueError as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=run)
+    worker.start()
+    worker.join()
+    assert len(errors) == 1
+    assert prompts == []
+
+
+def test_sync_second_401_raises(prompts):
+    ma = MindatApi(SESSION=FakeSession(VALID_KEY='c' * 32), CACHE=False)
+    with pytest.raises(ValueError, match='rejected'):
+        ma._request(URL)
+
+
+def test_async_401_prompts_for_a_new_key_once(prompts):
+    async def run():
+        ama = AsyncMindatApi(SESSION=FakeAsyncSession(), CACHE=False)
+        responses = await asyncio.gather(*(ama._request(URL, {'page': page}) for page in range(4)))
+        return ama, responses
+
+    ama, responses = asyncio.run(run())
+    assert [response.status_code for response in responses] == [200] * 4
+    assert len(prompts) == 1
+    assert ama._api_key == NEW_KEY
@@ -0,0 +1,42 @@
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+from openmindat.arrow_export import ArrowBatchBuilder, ParquetResultsWriter
+
+
+def test_to_table_widens_the_schema_per_page():
+    builder = ArrowBatchBuilder()
+    batches = [builder.to_batch([{'id': 1, 'density': 3}]), builder.to_batch([{'id': 2, 'density': 3.5, 'name': 'Quartz'}])]
+    table = builder.to_table(batches)
+
+    assert table.schema.field('density').type == pa.float64()
+    assert table.to_pylist() == [{'id': 1, 'density': 3.0, 'name': None}, {'id': 2, 'density': 3.5, 'name': 'Quartz'}]
+
+
+def test_parquet_casts_later_pages_to_the_first_schema(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(ParquetResultsWriter, 'BUFFER_ROWS', 2)
+    path = tmp_path / 'minerals.parquet'
+    writer = ParquetResultsWriter(path)
+    writer.write_page([{'id': 1, 'formula': None}])
+    writer.write_page([{'id': 2, 'formula': None}])
+    writer.write_page([{'id': 3, 'formula': 'SiO2', 'extra': 1}])
+    writer.write_page([{'id': 4.5, 'formula': {'text': 'Cu'}}])
+    writer.close()
+
+    table = pq.read_table(path)
+    assert table.schema.names == ['id', 'formula']
+    assert table.schema.field('formula').type == pa.string()
+    assert table.to_pylist()[2:] == [{'id': 3, 'formula': 'SiO2'}, {'id': None, 'formula': '{"text": "Cu"}'}]
+    assert 'extra' in capsys.readouterr().out
+    assert not list(tmp_path.glob('*.widened'))
+
+
+def test_parquet_without_records_is_still_a_valid_file(tmp_path):
+    path = tmp_path / 'empty.parquet'
+    writer = ParquetResultsWriter(path)
+    writer.write_page([])
+    writer.close()
+
+    assert pq.read_table(path).num_rows == 0
@@ -0,0 +1,99 @@
+import pytest
+
+from openmindat import cache as cache_module
+from openmindat.cache import ResponseCache
+from openmindat.mindat_api import MindatApi, MindatApiKeyManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, STATUS_CODE = 200, CONTENT = b'{"results": []}', HEADERS = None):
+        self.status_code = STATUS_CODE
+        self.url = 'https://api.mindat.org/v1/geomaterials/'
+        self.content = CONTENT
+        self.headers = HEADERS or {}
+        self.reason = 'OK'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    with ResponseCache(tmp_path / 'cache.sqlite', TTL=60) as cache:
+        yield cache
+
+
+def test_key_ignores_parameter_order_and_trailing_slash():
+    assert ResponseCache.make_key('https://API.mindat.org/v1/geomaterials/?b=2', [('a', '1')]) == \
+        ResponseCache.make_key('https://api.mindat.org/v1/geomaterials', [('b', '2'), ('a', '1')])
+
+
+def test_hit_until_the_ttl_expires(cache, clock):
+    cache.put('key', FakeResponse(CONTENT=b'{"id": 1}'))
+    assert cache.get('key').json() == {'id': 1}
+
+    clock.now += 61
+    assert cache.get('key') is None
+    assert cache.lookup('key').stale
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_only_successful_responses_are_stored(cache):
+    cache.put('key', FakeResponse(STATUS_CODE=500))
+    assert cache.get('key') is None
+
+
+def test_not_modified_renews_a_stale_entry(cache, clock):
+    cache.put('key', FakeResponse(HEADERS={'ETag': '"v1"'}))
+    clock.now += 61
+    stale = cache.lookup('key')
+    assert ResponseCache.conditional_headers(stale) == {'If-None-Match': '"v1"'}
+
+    response = cache.store('key', FakeResponse(STATUS_CODE=304), stale)
+    assert response.status_code == 200 and response.from_cache
+    assert not cache.lookup('key').stale
+    assert cache.stats()['revalidations'] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    with ResponseCache(tmp_path / 'cache.sqlite', TTL=60, MAX_SIZE=20) as cache:
+        cache.put('old', FakeResponse(CONTENT=b'x' * 10))
+        clock.now += 1
+        cache.put('used', FakeResponse(CONTENT=b'x' * 10))
+        clock.now += 1
+        cache.get('old')
+        clock.now += 1
+        cache.put('new', FakeResponse(CONTENT=b'x' * 10))
+
+        assert cache.get('used') is None
+        assert cache.get('old') is not None and cache.get('new') is not None
+
+
+def test_repeated_request_is_served_from_the_cache(tmp_path, monkeypatch, cache):
+    class FakeSession:
+        calls = 0
+
+        def get(self, URL, params = None, headers = None, timeout = None):
+            FakeSession.calls += 1
+            return FakeResponse()
+
+    monkeypatch.setattr(MindatApiKeyManager, 'API_KEY_FILE', str(tmp_path / 'apikey.yaml'))
+    monkeypatch.setenv('MINDAT_API_KEY', 'a' * 32)
+    ma = MindatApi(SESSION=FakeSession(), CACHE=cache)
+
+    ma._request('https://api.mindat.org/v1/geomaterials/', {'page': 1})
+    response = ma._request('https://api.mindat.org/v1/geomaterials/', {'page': 1})
+    assert FakeSession.calls == 1
+    assert response.from_cache
@@ -0,0 +1,91 @@
+import pytest
+
+from openmindat.classification import DanaTree, StrunzTree
+
+STRUNZ_RECORDS = {
+    'classes': [{'id': 7, 'code': '7', 'description': 'Sulfates'}, {'id': 9, 'code': '9', 'description': 'Silicates'}],
+    'subclasses': [{'id': 70, 'code': '7.A', 'description': 'Sulfates without additional anions'}],
+    'families': [
+        {'id': 700, 'code': '7.AB.05', 'description': 'With medium-sized cations'},
+        {'id': 701, 'code': '7.AD.10', 'description': 'With large cations'},
+    ],
+}
+
+
+@pytest.fixture
+def tree():
+    return StrunzTree(STRUNZ_RECORDS)
+
+
+@pytest.mark.parametrize('code, parts', [
+    ('7', ('7',)),
+    ('7.A', ('7', 'A')),
+    ('7.AB.05', ('7', 'A', 'B', '5')),
+    (' 07 . ab . 5 ', ('7', 'A', 'B', '5')),
+    ('7..AB.05.', ('7', 'A', 'B', '5')),
+    ('', ()),
+    (None, ()),
+])
+def test_strunz_code_parts(code, parts):
+    assert StrunzTree.get_parts(code) == parts
+
+
+@pytest.mark.parametrize('parts, code', [
+    (('7',), '7'),
+    (('7', 'A'), '7.A'),
+    (('7', 'A', 'B'), '7.AB'),
+    (('7', 'A', 'B', '5'), '7.AB.05'),
+])
+def test_strunz_code_format(parts, code):
+    assert StrunzTree.format_code(parts) == code
+    assert StrunzTree.get_parts(code) == parts
+
+
+def test_dana_code_parts():
+    assert DanaTree.get_parts('51.04.3.1') == ('51', '4', '3', '1')
+    assert DanaTree.format_code(('51', '4', '3')) == '51.4.3'
+
+
+def test_tree_is_joined_by_code(tree):
+    assert len(tree) == 5
+    assert [node.code for node in tree.roots] == ['7', '9']
+    assert [node.code for node in tree.get('7.A').children] == ['7.AB.05', '7.AD.10']
+    assert [node.code for node in tree.get_path('7.ab.5')] == ['7', '7.A', '7.AB.05']
+    assert tree.get_by_id('700', 'families') is tree.get('7.AB.05')
+    assert '9' in tree and '8' not in tree
+
+
+def test_classify_from_geomaterial_fields(tree):
+    assert tree.classify({'strunz10ed1': '7', 'strunz10ed2': 'A', 'strunz10ed3': 'B', 'strunz10ed4': '05'}).code == '7.AB.05'
+    # A family missing from the tree falls back to the deepest node above it
+    assert tree.classify({'strunz10ed1': '7', 'strunz10ed2': 'A', 'strunz10ed3': 'C', 'strunz10ed4': '15'}).code == '7.A'
+    # The fields after a '0' or an empty field are ignored
+    assert tree.classify({'strunz10ed1': '9', 'strunz10ed2': '0', 'strunz10ed3': 'B'}).code == '9'
+    assert tree.classify({'strunz10ed1': '0'}) is None
+    assert tree.classify({}) is None
+
+
+def test_minerals_are_found_under_any_prefix(tree):
+    records = [
+        {'id': 1, 'strunz10ed1': '7', 'strunz10ed2': 'A', 'strunz10ed3': 'B', 'strunz10ed4': '05'},
+        {'id': 2, 'strunz10ed1': '7', 'strunz10ed2': 'A', 'strunz10ed3': 'D', 'strunz10ed4': '10'},
+        {'id': 3, 'strunz10ed1': '9'},
+        {'id': 4},
+    ]
+    assert tree.add_geomaterials(records) == 3
+    assert tree.get_minerals('7') == [1, 2]
+    assert tree.get_minerals('7.AD.10') == [2]
+    assert tree.get_minerals() == [1, 2, 3]
+    assert tree.get_minerals('8') == []
+
+
+def test_save_and_load(tree, tmp_path):
+    tree.add_geomaterials([{'id': 1, 'strunz10ed1': '7', 'strunz10ed2': 'A', 'strunz10ed3': 'B', 'strunz10ed4': '05'}])
+    path = tmp_path / 'strunz.json.gz'
+    tree.save(path)
+    loaded = StrunzTree.load(path)
+
+    assert len(loaded) == len(tree)
+    assert loaded.get_minerals('7.A') == [1]
+    with pytest.raises(ValueError):
+        DanaTree.load(path)
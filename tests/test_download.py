@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+
+from openmindat.async_api import AsyncMindatApi
+from openmindat.mindat_api import MindatApi, MindatApiKeyManager
+from openmindat.page_size import PageSizeController
+from openmindat.retry import RetryPolicy
+
+BASE_URL = 'https://api.mindat.org/v1/geomaterials/'
+
+
+class FakeResponse:
+    def __init__(self, STATUS_CODE, PAYLOAD = None):
+        self.status_code = STATUS_CODE
+        self.headers = {}
+        self.reason = 'OK' if STATUS_CODE == 200 else 'Service Unavailable'
+        self.reason_phrase = self.reason
+        self.url = BASE_URL
+        self.content = json.dumps(PAYLOAD).encode()
+        self._payload = PAYLOAD
+
+    def json(self):
+        return self._payload
+
+
+class FailingSession:
+    '''
+    Returns the first page of a two-page query, then fails.
+    '''
+
+    def get(self, URL, params = None, headers = None, timeout = None):
+        if 'page=2' in URL:
+            return FakeResponse(503)
+        return FakeResponse(200, {'count': 4, 'next': BASE_URL + '?format=json&page=2&page-size=2', 'results': [{'id': 1}, {'id': 2}]})
+
+
+class FailingAsyncSession(FailingSession):
+    async def get(self, URL, params = None, headers = None, timeout = None):
+        return FailingSession.get(self, URL, params, headers, timeout)
+
+
+@pytest.fixture(autouse=True)
+def api_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(MindatApiKeyManager, 'API_KEY_FILE', str(tmp_path / 'apikey.yaml'))
+    monkeypatch.setenv('MINDAT_API_KEY', 'a' * 32)
+
+
+def _options(SESSION):
+    return dict(SESSION=SESSION, CACHE=False, RETRY_POLICY=RetryPolicy(MAX_ATTEMPTS=1), PAGE_SIZE_CONTROLLER=PageSizeController())
+
+
+def test_failed_download_leaves_no_partial_file(tmp_path):
+    ma = MindatApi(**_options(FailingSession()))
+    with pytest.raises(ValueError, match='503'):
+        ma.download_mindat_json({'format': 'json', 'page-size': 2}, 'v1/geomaterials', tmp_path, 'minerals', 0, 'ndjson')
+
+    assert list(tmp_path.glob('minerals*')) == []
+
+
+def test_failed_resumable_download_keeps_its_partial_file(tmp_path):
+    ma = MindatApi(**_options(FailingSession()))
+    with pytest.raises(ValueError, match='503'):
+        ma.download_mindat_json({'format': 'json', 'page-size': 2}, 'v1/geomaterials', tmp_path, 'minerals', 0, 'ndjson', RESUME=True)
+
+    assert (tmp_path / 'minerals.ndjson.part').read_text().splitlines() == ['{"id":1}', '{"id":2}']
+    assert (tmp_path / 'minerals.ndjson.checkpoint').exists()
+
+
+def test_failed_async_download_leaves_no_partial_file(tmp_path):
+    async def run():
+        ama = AsyncMindatApi(**_options(FailingAsyncSession()))
+        await ama.download_mindat_json({'format': 'json', 'page-size': 2}, 'v1/geomaterials', tmp_path, 'minerals', 0, 'ndjson')
+
+    with pytest.raises(ValueError, match='503'):
+        asyncio.run(run())
+    assert list(tmp_path.glob('minerals*')) == []
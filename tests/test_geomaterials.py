@@ -0,0 +1,49 @@
+import pytest
+
+from openmindat.geomaterials import GeomaterialIdRetriever
+
+
+class FakeApi:
+    def __init__(self):
+        self.end_points = []
+
+    def get_mindat_json(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        self.end_points.append(END_POINT)
+        return []
+
+    def iter_records(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        self.end_points.append(END_POINT)
+        return iter([])
+
+    def get_arrow_table(self, PARAM_DICT, END_POINT, VERBOSE = 2):
+        self.end_points.append(END_POINT)
+
+
+@pytest.mark.parametrize('VARIETIES, END_POINT', [(True, 'v1/geomaterials/5/varieties'), (False, 'v1/geomaterials/5')])
+def test_every_entry_point_follows_varieties(VARIETIES, END_POINT):
+    api = FakeApi()
+    gir = GeomaterialIdRetriever()
+    gir._mindat_api = lambda: api
+
+    gir.id(5).varieties(VARIETIES).get_dict()
+    list(gir.id(5).varieties(VARIETIES).iter_records())
+    gir.id(5).varieties(VARIETIES).to_arrow()
+
+    assert api.end_points == [END_POINT] * 3
+
+
+def test_saveto_is_the_shared_implementation(monkeypatch):
+    from openmindat import retriever_mixin
+    saved = []
+
+    class FakeDownloadApi:
+        def download_mindat_json(self, *ARGS):
+            saved.append(ARGS)
+
+    gir = GeomaterialIdRetriever()
+    gir._mindat_api = lambda: FakeDownloadApi()
+    assert type(gir).saveto is retriever_mixin.RetrieverMixin.saveto
+
+    gir.id(5).varieties(True).saveto('out', 'geo5', FORMAT='ndjson', COMPRESSION='gzip', RESUME=True)
+    assert saved[0][1:] == ('v1/geomaterials/5/varieties', 'out', 'geo5', 2, 'ndjson', 'gzip', True)
+    assert gir.variety is False
@@ -0,0 +1,79 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from openmindat.georegions import GeoRegionIndex
+
+
+def _square(MIN_X, MIN_Y, MAX_X, MAX_Y):
+    return [[MIN_X, MIN_Y], [MAX_X, MIN_Y], [MAX_X, MAX_Y], [MIN_X, MAX_Y], [MIN_X, MIN_Y]]
+
+
+def _feature(ID, TYPE, COORDINATES):
+    return {'type': 'Feature', 'id': ID, 'properties': {'name': 'region ' + str(ID)}, 'geometry': {'type': TYPE, 'coordinates': COORDINATES}}
+
+
+@pytest.fixture
+def index():
+    return GeoRegionIndex.from_features([
+        # A square with a square hole
+        _feature(1, 'Polygon', [_square(0, 0, 10, 10), _square(4, 4, 6, 6)]),
+        # A smaller square overlapping the first one
+        _feature(2, 'Polygon', [_square(8, 8, 12, 12)]),
+        # A region crossing the antimeridian, split in two parts as GeoJSON requires
+        _feature(3, 'MultiPolygon', [[_square(170, -10, 180, 10)], [_square(-180, -10, -170, 10)]]),
+        # A feature without a polygon is skipped
+        {'type': 'Feature', 'id': 4, 'properties': {}, 'geometry': {'type': 'Point', 'coordinates': [1, 1]}},
+    ])
+
+
+def test_points_inside_and_outside(index):
+    assert len(index) == 3
+    assert index.assign([1, 3, 20, -1], [1, 3, 20, 5]) == [1, 1, None, None]
+    assert index.get_properties(2) == {'name': 'region 2'}
+    assert index.get_properties(4) is None
+
+
+def test_holes_are_excluded(index):
+    assert index.assign([5, 4.5, 3.9], [5, 5.5, 5]) == [None, None, 1]
+
+
+def test_overlaps_go_to_the_smallest_region(index):
+    assert index.assign([9, 11, 7], [9, 11, 7]) == [2, 2, 1]
+    assert index.assign([9, 11, 7], [9, 11, 7], ALL=True) == [[1, 2], [2], [1]]
+
+
+def test_antimeridian(index):
+    latitudes = [0, 0, 5, 0, 0, 0]
+    longitudes = [179.5, -179.5, 180, -180, -50, -169]
+    assert index.assign(latitudes, longitudes) == [3, 3, 3, 3, None, None]
+    # Longitudes outside [-180, 180) are wrapped
+    assert index.assign([0, 1], [189.5, 361]) == [3, 1]
+
+
+def test_invalid_points(index):
+    assert index.assign([float('nan'), 1], [1, float('nan')]) == [None, None]
+    assert index.assign([], []) == []
+    with pytest.raises(ValueError):
+        index.assign([1, 2], [1])
+
+
+def test_small_bands_and_chunks_give_the_same_result(index, monkeypatch):
+    latitudes = [lat / 4 for lat in range(-40, 60)] * 3
+    longitudes = [lon for lon in (5, 9, 179.9) for _ in range(100)]
+    expected = index.assign(latitudes, longitudes)
+
+    monkeypatch.setattr(GeoRegionIndex, 'BAND_SIZE', 3)
+    monkeypatch.setattr(GeoRegionIndex, 'CHUNK_SIZE', 2)
+    assert index.assign(latitudes, longitudes) == expected
+    assert 3 in expected and 2 in expected and None in expected
+
+
+def test_save_and_load(index, tmp_path):
+    path = tmp_path / 'regions.npz'
+    index.save(path)
+    loaded = GeoRegionIndex.load(path)
+
+    assert loaded.region_ids == index.region_ids
+    assert loaded.assign([1, 5, 9, 0], [1, 5, 9, -179.5]) == [1, None, 2, 3]
+    assert not (tmp_path / 'regions.npz.part').exists()
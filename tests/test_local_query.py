@@ -0,0 +1,36 @@
+import pytest
+
+from openmindat.local_query import GeomaterialQueryEngine
+from openmindat.sync import LocalStore
+
+
+@pytest.fixture
+def engine(tmp_path):
+    store = LocalStore(tmp_path / 'mirror.sqlite')
+    store.upsert('v1/geomaterials', [
+        {'id': 1, 'name': 'Quartz', 'updttime': '2024-01-02 10:00:00'},
+        {'id': 2, 'name': 'Calcite', 'updttime': '2024-01-02T08:00:00'},
+        {'id': 3, 'name': 'Pyrite', 'updttime': '2024-01-02T11:30:00Z'},
+        {'id': 4, 'name': 'Galena', 'updttime': '2024-01-01 23:59:59'},
+        {'id': 5, 'name': 'Halite'},
+    ])
+    yield GeomaterialQueryEngine(store)
+    store.close()
+
+
+@pytest.mark.parametrize('updated_at', ['2024-01-02T09:00:00', '2024-01-02 09:00:00'])
+def test_updated_at_compares_timestamps_with_either_separator(engine, updated_at):
+    assert engine.query_ids({'updated_at': updated_at}) == [1, 3]
+
+
+def test_updated_at_accepts_a_date(engine):
+    assert engine.query_ids({'updated_at': '2024-01-02'}) == [1, 2, 3]
+
+
+def test_ordering_by_updttime_uses_the_normalized_timestamps(engine):
+    assert engine.query_ids({'updated_at': '2024-01-01', 'ordering': 'updttime'}) == [4, 2, 1, 3]
+
+
+def test_invalid_updated_at(engine):
+    with pytest.raises(ValueError):
+        engine.query_ids({'updated_at': 'yesterday'})
@@ -0,0 +1,82 @@
+import asyncio
+import json
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import pytest
+
+from openmindat.async_api import AsyncMindatApi
+from openmindat.mindat_api import MindatApi, MindatApiKeyManager
+from openmindat.page_size import PageSizeController
+
+BASE_URL = 'https://api.mindat.org/v1/geomaterials/'
+RECORDS = [{'id': id} for id in range(1, 11)]
+
+
+class FakeResponse:
+    def __init__(self, URL, PAYLOAD):
+        self.status_code = 200
+        self.headers = {}
+        self.reason = 'OK'
+        self.url = URL
+        self.content = json.dumps(PAYLOAD).encode()
+        self._payload = PAYLOAD
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    def __init__(self):
+        self.page_sizes = []
+
+    def get(self, URL, params = None, headers = None, timeout = None):
+        query = {name: values[0] for name, values in parse_qs(urlparse(URL).query).items()}
+        query.update({name: str(value) for name, value in dict(params or {}).items()})
+        page, page_size = int(query.get('page', 1)), int(query['page-size'])
+        self.page_sizes.append(page_size)
+
+        start = (page - 1) * page_size
+        next_url = None
+        if start + page_size < len(RECORDS):
+            next_url = BASE_URL + '?' + urlencode({'format': 'json', 'page': page + 1, 'page-size': page_size})
+        url = BASE_URL + '?' + urlencode(query)
+        return FakeResponse(url, {'count': len(RECORDS), 'next': next_url, 'results': RECORDS[start:start + page_size]})
+
+
+class FakeAsyncSession(FakeSession):
+    async def get(self, URL, params = None, headers = None, timeout = None):
+        return FakeSession.get(self, URL, params, headers, timeout)
+
+
+@pytest.fixture(autouse=True)
+def api_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(MindatApiKeyManager, 'API_KEY_FILE', str(tmp_path / 'apikey.yaml'))
+    monkeypatch.setenv('MINDAT_API_KEY', 'a' * 32)
+
+
+def _controller():
+    # Pages of four records are over the payload limit; the controller halves them
+    return PageSizeController(MIN_PAGE_SIZE=1, MAX_PAYLOAD=60, GROWTH=1)
+
+
+def test_sync_pages_follow_the_tuned_page_size():
+    session = FakeSession()
+    ma = MindatApi(SESSION=session, CACHE=False, PAGE_SIZE_CONTROLLER=_controller())
+    pages = list(ma.iter_pages({'format': 'json', 'page-size': 4}, 'v1/geomaterials', 0))
+
+    assert [record for page in pages for record in page] == RECORDS
+    assert session.page_sizes[0] == 4
+    assert max(session.page_sizes[1:]) < 4
+
+
+def test_async_pages_follow_the_tuned_page_size():
+    session = FakeAsyncSession()
+
+    async def run():
+        ama = AsyncMindatApi(SESSION=session, CACHE=False, PAGE_SIZE_CONTROLLER=_controller())
+        return [page async for page in ama.iter_pages({'format': 'json', 'page-size': 4}, 'v1/geomaterials', 0)]
+
+    pages = asyncio.run(run())
+    assert [record for page in pages for record in page] == RECORDS
+    assert session.page_sizes[0] == 4
+    assert max(session.page_sizes[1:]) < 4
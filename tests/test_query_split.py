@@ -0,0 +1,55 @@
+from urllib.parse import urlencode
+
+from openmindat.mindat_api import encode_params
+
+END_POINT = 'v1/geomaterials'
+RECORDS = [{'id': id} for id in range(1, 3001)]
+
+
+def test_short_query_is_not_split(make_api):
+    ma, server = make_api(RECORDS)
+    assert ma._split_oversized_query({'format': 'json', 'id_in': '1,2,3'}, END_POINT) is None
+
+
+def test_id_in_is_split_at_the_url_limit(make_api):
+    ma, server = make_api(RECORDS)
+    ids = [str(id) for id in range(3000, 0, -1)]
+    params = {'format': 'json', 'page-size': 100, 'id_in': ','.join(ids + ids[:10])}
+    queries = ma._split_oversized_query(params, END_POINT)
+
+    assert len(queries) > 1
+    # Room is left for the page number of the `next` links
+    max_url_length = ma.MAX_URL_LENGTH - len(ma.PAGE_PARAM_ROOM)
+    assert all(ma._get_url_length(END_POINT, query) <= max_url_length for query in queries)
+    assert all(query['format'] == 'json' and query['page-size'] == 100 for query in queries)
+    # The ids are sent once each, in ascending order
+    chunks = [[int(id) for id in query['id_in'].split(',')] for query in queries]
+    assert [id for chunk in chunks for id in chunk] == list(range(1, 3001))
+    # Each chunk but the last is as full as the limit allows
+    assert ma._get_url_length(END_POINT, dict(queries[0], id_in=queries[0]['id_in'] + ',' + str(chunks[1][0]))) > max_url_length
+
+
+def test_list_parameter_is_split(make_api):
+    ma, server = make_api(RECORDS)
+    colours = ['colour number ' + str(index) for index in range(400)]
+    queries = ma._split_oversized_query({'format': 'json', 'colour': colours}, END_POINT)
+
+    assert [colour for query in queries for colour in query['colour']] == colours
+    assert all(ma._get_url_length(END_POINT, query) <= ma.MAX_URL_LENGTH for query in queries)
+
+
+def test_unsplittable_queries_are_left_alone(make_api):
+    ma, server = make_api(RECORDS)
+    ids = ','.join(str(id) for id in range(1, 3001))
+    assert ma._split_oversized_query({'format': 'json', 'id_in': ids, 'page': 2}, END_POINT) is None
+    assert ma._split_oversized_query({'format': 'json', 'name': 'x' * 5000}, END_POINT) is None
+
+
+def test_split_query_returns_every_record_once(make_api):
+    ma, server = make_api(RECORDS, CONCURRENCY=4)
+    ids = list(range(2999, 0, -2))
+    pages = ma.iter_pages({'format': 'json', 'page-size': 100, 'id_in': ','.join(map(str, ids))}, END_POINT, 0)
+
+    assert [record['id'] for page in pages for record in page] == sorted(ids)
+    for query in server.requests:
+        assert len(ma.MINDAT_API_URL + '/' + END_POINT + '/?' + urlencode(encode_params(query))) <= ma.MAX_URL_LENGTH
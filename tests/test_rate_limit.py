@@ -0,0 +1,81 @@
+import pytest
+
+from openmindat import rate_limit
+from openmindat.rate_limit import RateLimiter
+
+
+class FakeClock:
+    '''
+    Stands in for the time module: sleep() advances time() instead of waiting.
+    '''
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, SECONDS):
+        self.now += SECONDS
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+
+def _send(LIMITER, CLOCK, COUNT):
+    sent_at = []
+    for _ in range(COUNT):
+        with LIMITER.limit():
+            sent_at.append(CLOCK.now - 1000.0)
+    return sent_at
+
+
+def test_burst_then_steady_rate(clock):
+    limiter = RateLimiter(RATE=2, BURST=2)
+    assert _send(limiter, clock, 5) == pytest.approx([0, 0, 0.5, 1.0, 1.5])
+
+
+def test_idle_time_refills_the_bucket_up_to_the_burst(clock):
+    limiter = RateLimiter(RATE=1, BURST=2)
+    _send(limiter, clock, 2)
+    clock.now += 10
+    assert _send(limiter, clock, 3) == pytest.approx([10, 10, 11])
+
+
+def test_pause_holds_every_request(clock):
+    limiter = RateLimiter(RATE=100, BURST=100)
+    limiter.pause(30)
+    assert _send(limiter, clock, 1) == pytest.approx([30])
+
+
+def test_no_rate_never_waits(clock):
+    assert _send(RateLimiter(), clock, 3) == [0, 0, 0]
+
+
+def test_in_flight_slots_are_capped():
+    limiter = RateLimiter(MAX_IN_FLIGHT=1)
+    with limiter.limit():
+        assert limiter._try_acquire_slot() is None
+    slot = limiter._try_acquire_slot()
+    assert slot is not None
+    limiter._release_slot(slot)
+
+
+def test_state_file_shares_the_budget(tmp_path, clock):
+    pytest.importorskip('fcntl')
+    first = RateLimiter(RATE=1, BURST=1, STATE_FILE=tmp_path / 'limits.json')
+    second = RateLimiter(RATE=1, BURST=1, STATE_FILE=tmp_path / 'limits.json')
+
+    assert first._reserve() == 0
+    assert second._reserve() == pytest.approx(1.0)
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        RateLimiter(RATE=0)
+    with pytest.raises(ValueError):
+        RateLimiter(MAX_IN_FLIGHT=0)
@@ -0,0 +1,98 @@
+import pytest
+
+from openmindat import mindat_api
+from openmindat.mindat_api import MindatApi, MindatApiKeyManager
+from openmindat.page_size import PageSizeController
+from openmindat.retry import RetryPolicy
+
+
+class FakeResponse:
+    def __init__(self, STATUS_CODE, HEADERS = None):
+        self.status_code = STATUS_CODE
+        self.headers = HEADERS or {}
+        self.reason = 'Service Unavailable' if STATUS_CODE == 503 else 'OK'
+        self.url = 'https://api.mindat.org/v1/geomaterials/'
+        self.content = b'{}'
+
+    def json(self):
+        return {'count': 1, 'next': None, 'results': [{'id': 1}]}
+
+
+class FakeSession:
+    def __init__(self, STATUSES):
+        self.statuses = list(STATUSES)
+        self.requests = []
+
+    def get(self, URL, params = None, headers = None, timeout = None):
+        self.requests.append(dict(params or {}))
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return FakeResponse(status)
+
+
+@pytest.fixture
+def sleeps(tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(MindatApiKeyManager, 'API_KEY_FILE', str(tmp_path / 'apikey.yaml'))
+    monkeypatch.setenv('MINDAT_API_KEY', 'a' * 32)
+    monkeypatch.setattr(mindat_api.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def _api(SESSION, POLICY):
+    return MindatApi(SESSION=SESSION, CACHE=False, RETRY_POLICY=POLICY, PAGE_SIZE_CONTROLLER=PageSizeController())
+
+
+def test_backoff_doubles_up_to_the_maximum():
+    policy = RetryPolicy(BACKOFF_FACTOR=1, BACKOFF_MAX=5, JITTER=False)
+    assert [policy.get_backoff(attempt) for attempt in range(5)] == [1, 2, 4, 5, 5]
+
+
+def test_retry_after_takes_precedence():
+    policy = RetryPolicy(BACKOFF_FACTOR=1, JITTER=False)
+    assert policy.get_retry_after(FakeResponse(429, {'Retry-After': '7'})) == 7.0
+    assert policy.get_retry_after(FakeResponse(429, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})) == 0.0
+    assert policy.get_delay(0, 0, FakeResponse(429, {'Retry-After': '7'})) == 7.0
+    assert policy.get_delay(0, 0, FakeResponse(503)) == 1
+
+
+def test_no_retry_past_the_deadline_or_the_last_attempt(monkeypatch):
+    policy = RetryPolicy(MAX_ATTEMPTS=3, BACKOFF_FACTOR=4, JITTER=False, DEADLINE=10)
+    monkeypatch.setattr('openmindat.retry.time.monotonic', lambda: 100.0)
+    assert policy.get_delay(0, 100.0) == 4
+    assert policy.get_delay(0, 93.0) is None
+    assert policy.get_delay(2, 100.0) is None
+    assert policy.get_timeout(95.0) == (5.0, 5.0)
+
+
+def test_send_retries_up_to_max_attempts(sleeps):
+    session = FakeSession([503])
+    ma = _api(session, RetryPolicy(MAX_ATTEMPTS=3, BACKOFF_FACTOR=1, JITTER=False))
+    response = ma._send_with_retries('https://api.mindat.org/v1/geomaterials/', {}, {})
+    assert response.status_code == 503
+    assert len(session.requests) == 3
+    assert sleeps == [1, 2]
+
+
+def test_failing_page_is_not_retried_twice(sleeps):
+    session = FakeSession([503])
+    ma = _api(session, RetryPolicy(MAX_ATTEMPTS=3, JITTER=False))
+    with pytest.raises(ValueError, match='503'):
+        ma._get_page_results('https://api.mindat.org/v1/geomaterials/?page=2')
+    assert len(session.requests) == 3
+
+
+def test_server_error_on_the_first_page_keeps_the_page_size(sleeps):
+    session = FakeSession([503])
+    ma = _api(session, RetryPolicy(MAX_ATTEMPTS=2, JITTER=False))
+    params = {'format': 'json', 'page-size': 1000}
+    with pytest.raises(ValueError, match='503'):
+        ma._get_first_page(params, 'v1/geomaterials')
+    assert params['page-size'] == 1000
+    assert len(session.requests) == 2
+
+
+def test_transient_error_is_recovered(sleeps):
+    session = FakeSession([503, 200])
+    ma = _api(session, RetryPolicy(MAX_ATTEMPTS=3, JITTER=False))
+    assert ma._get_page_results('https://api.mindat.org/v1/geomaterials/?page=2') == [{'id': 1}]
+    assert len(session.requests) == 2
@@ -0,0 +1,44 @@
+# A sparse stretch of the ID space followed by a dense one
+IDS = list(range(1, 101, 5)) + list(range(5000, 5200))
+RECORDS = [{'id': id} for id in IDS]
+
+
+def _ids(PAGES):
+    return [record['id'] for page in PAGES for record in page]
+
+
+def test_id_range_is_found_by_counting(make_api):
+    ma, server = make_api(RECORDS)
+    assert ma._get_id_range({'format': 'json'}, 'v1/geomaterials') == (1, 5199, len(IDS))
+
+
+def test_shards_are_merged_in_id_order(make_api):
+    ma, server = make_api(RECORDS, SHARD_SIZE=20, CONCURRENCY=4)
+    pages = list(ma.iter_pages({'format': 'json', 'page-size': 7}, 'v1/geomaterials', 0))
+
+    assert _ids(pages) == IDS
+    ranges = {(query['id_min'], query['id_max']) for query in server.requests if query.get('page-size') == '7'}
+    assert len(ranges) > 1
+
+
+def test_dense_shard_is_split(make_api):
+    ma, server = make_api(RECORDS)
+    kind, shards = ma._fetch_shard({'format': 'json', 'page-size': 10}, 'v1/geomaterials', 4000, 5199, 20)
+
+    assert kind == 'split'
+    assert shards[0][0] == 4000 and shards[-1][1] == 5199
+    assert all(end + 1 == start for (_, end), (start, _) in zip(shards, shards[1:]))
+
+
+def test_shards_respect_the_id_filters(make_api):
+    ma, server = make_api(RECORDS, SHARD_SIZE=20, CONCURRENCY=2)
+    pages = ma.iter_pages({'format': 'json', 'page-size': 7, 'id_min': 50, 'id_max': 5010}, 'v1/geomaterials', 0)
+    assert _ids(pages) == [id for id in IDS if 50 <= id <= 5010]
+
+
+def test_custom_ordering_is_not_sharded(make_api):
+    ma, server = make_api(RECORDS, SHARD_SIZE=20)
+    pages = list(ma.iter_pages({'format': 'json', 'page-size': 100, 'ordering': 'id'}, 'v1/geomaterials', 0))
+
+    assert _ids(pages) == IDS
+    assert not any('id_min' in query for query in server.requests)
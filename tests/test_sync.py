@@ -0,0 +1,44 @@
+import pytest
+
+from openmindat import sync
+from openmindat.geomaterials import GeomaterialRetriever
+from openmindat.localities import LocalitiesRetriever
+
+
+def _record_syncs(monkeypatch):
+    synced = []
+
+    def fake_sync(self, STORE = None, FULL = False):
+        synced.append((self.__class__.__name__, FULL))
+        return 0
+
+    monkeypatch.setattr(GeomaterialRetriever, 'sync', fake_sync)
+    monkeypatch.setattr(LocalitiesRetriever, 'sync', fake_sync)
+    return synced
+
+
+def test_main_syncs_every_table_by_default(tmp_path, monkeypatch):
+    synced = _record_syncs(monkeypatch)
+    sync.main(['--store', str(tmp_path / 'mirror.sqlite')])
+    assert synced == [('GeomaterialRetriever', False), ('LocalitiesRetriever', False)]
+
+
+def test_main_without_arguments(tmp_path, monkeypatch):
+    synced = _record_syncs(monkeypatch)
+    monkeypatch.chdir(tmp_path)
+    sync.main([])
+    assert [name for name, full in synced] == ['GeomaterialRetriever', 'LocalitiesRetriever']
+
+
+def test_main_syncs_the_given_tables(tmp_path, monkeypatch):
+    synced = _record_syncs(monkeypatch)
+    sync.main(['localities', '--store', str(tmp_path / 'mirror.sqlite'), '--full'])
+    assert synced == [('LocalitiesRetriever', True)]
+
+
+def test_main_rejects_unknown_tables(tmp_path, monkeypatch, capsys):
+    synced = _record_syncs(monkeypatch)
+    with pytest.raises(SystemExit):
+        sync.main(['minerals', '--store', str(tmp_path / 'mirror.sqlite')])
+    assert 'unknown table(s): minerals' in capsys.readouterr().err
+    assert synced == []